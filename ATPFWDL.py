@@ -1,13 +1,26 @@
 #!/usr/bin/env python3
-import time
+from eventlog import traceStep
+from uartsession import UartSession
+from adbsession import closeAdbShellSessions
 from common import (
     sendUartCommand, 
-    checkDeviceConnection, 
-    updateFirmware, 
+    runUartSequence,
+    waitForMaskromDevice, 
+    flashFirmware, 
+    waitForBootReady,
     waitForTestCompletion
 )
 
-def atpfwdlProcess(strComPort, strToolPath, strImgPath, strSerialNumber=None, strDeviceId=None):
+ATPFWDL_STEPS = {  # Device-side steps, replaceable with stubs to run the flow against fixturesim
+    "wait_maskrom": waitForMaskromDevice,
+    "flash": flashFirmware,
+    "wait_boot_ready": waitForBootReady,
+    "wait_test_completion": waitForTestCompletion,
+}
+
+@traceStep("atpfwdl", ["strSerialNumber"])
+def atpfwdlProcess(strComPort, strToolPath, strImgPath, strSerialNumber=None, strDeviceId=None, nTimeoutSeconds=None,
+                   dictSteps=None):
     """
     * Special process for ATPFWDL (ATP Firmware Download) station
     * Handles device boot sequence, firmware update, and test execution
@@ -17,8 +30,11 @@ def atpfwdlProcess(strComPort, strToolPath, strImgPath, strSerialNumber=None, st
     * @param strImgPath Path to firmware image file
     * @param strSerialNumber Device serial number
     * @param strDeviceId ADB device ID if multiple devices connected
+    * @param nTimeoutSeconds Maximum time to wait for test completion, timeouts.test_completion if None
+    * @param dictSteps Optional {name: callable} overriding ATPFWDL_STEPS (upgrade_tool and adb steps)
     * @return Boolean indicating success or failure of the process
     """
+    dictSteps = dict(ATPFWDL_STEPS, **(dictSteps or {}))
     print("\n=== Starting ATPFWDL Process ===")
     strStationName = "ATPFWDL"
     bProcessResult = False
@@ -28,73 +44,54 @@ def atpfwdlProcess(strComPort, strToolPath, strImgPath, strSerialNumber=None, st
         return False
     
     try:
-        print("------Sending boot sequence commands------")
-        if not sendUartCommand(strComPort, "REQ_INIT"):
-            print("Error: REQ_INIT command failed")
-            return False
-        time.sleep(0.5)
-        if not sendUartCommand(strComPort, "REQ_BOOT_ON"):
-            print("Error: REQ_BOOT_ON command failed")
-            return False
-        time.sleep(0.5)
-        if not sendUartCommand(strComPort, "REQ_POWER_ON"):
-            print("Error: REQ_POWER_ON command failed")
-            return False
-        time.sleep(0.5)
-        if not sendUartCommand(strComPort, "REQ_DC_IN"):
-            print("Error: REQ_DC_IN command failed")
-            return False
-        print("Waiting for device to enter Maskrom mode (5 seconds)...")
-        time.sleep(2)
-        print("------Checking device connection------")
-        nRetryCount = 0
-        nMaxRetries = 3
-        bConnectionSuccess = False
-        
-        while not bConnectionSuccess and nRetryCount < nMaxRetries:
-            if checkDeviceConnection(strToolPath):
-                bConnectionSuccess = True
-                break
-            
-            print(f"Retry {nRetryCount+1}/{nMaxRetries} checking device connection...")
-            nRetryCount += 1
-            time.sleep(2)
-        
-        if not bConnectionSuccess:
-            print("Error: Device connection failed after boot sequence")
-            return False
-        print("------Sending REQ_BOOT_OFF command------")
-        if not sendUartCommand(strComPort, "REQ_BOOT_OFF"):
-            print("Warning: REQ_BOOT_OFF command may have failed. Continuing anyway...")
-        time.sleep(1)
-        print("Step 4: Updating firmware")
-        if not updateFirmware(strToolPath, strImgPath):
-            print("Error: Firmware update failed")
-            return False
-        
-        print("Firmware update successful")
-        print("------Waiting for device to reboot (90 seconds)...------")
-        time.sleep(90) 
-        print("------Starting ATP test------")
-        if not waitForTestCompletion(strSerialNumber, strStationName, strDeviceId, nTimeoutSeconds=300):
-            print("Error: ATP test failed or log file not found")
-            return False
-        
-        print("ATPFWDL process completed successfully")
-        bProcessResult = True
-        return True
-        
+        objUartSession = UartSession(strComPort).open()
     except Exception as e:
-        print(f"Error in ATPFWDL process: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        print(f"Error: Cannot open UART session on {strComPort}: {str(e)}")
         return False
-    finally:
-        print("Sending final REQ_INIT command to reset the device")
+    with objUartSession:
         try:
-            if sendUartCommand(strComPort, "REQ_INIT"):
-                print("Device reset completed successfully")
-            else:
-                print("Warning: Device reset may not have completed properly")
+            print("------Sending boot sequence commands------")
+            if not runUartSequence(strComPort, "atpfwdl_boot"):
+                print("Error: Boot sequence failed")
+                return False
+            print("------Checking device connection------")
+            if not dictSteps["wait_maskrom"](strToolPath):
+                print("Error: Device connection failed after boot sequence")
+                return False
+            print("------Sending REQ_BOOT_OFF command------")
+            if not runUartSequence(strComPort, "atpfwdl_boot_off"):
+                print("Warning: REQ_BOOT_OFF command may have failed. Continuing anyway...")
+            print("Step 4: Updating firmware")
+            if not dictSteps["flash"](strToolPath, strImgPath, strSerialNumber):
+                print("Error: Firmware update failed")
+                return False
+        
+            print("Firmware update successful")
+            print("------Waiting for device to reboot------")
+            if not dictSteps["wait_boot_ready"](strDeviceId, "boot_ready_flash", 150):
+                print("Error: Device did not become ready after firmware update")
+                return False
+            print("------Starting ATP test------")
+            if not dictSteps["wait_test_completion"](strSerialNumber, strStationName, strDeviceId, nTimeoutSeconds=nTimeoutSeconds):
+                print("Error: ATP test failed or log file not found")
+                return False
+        
+            print("ATPFWDL process completed successfully")
+            bProcessResult = True
+            return True
+        
         except Exception as e:
-            print(f"Warning: Failed to send final REQ_INIT command: {str(e)}") 
\ No newline at end of file
+            print(f"Error in ATPFWDL process: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return False
+        finally:
+            closeAdbShellSessions()
+            print("Sending final REQ_INIT command to reset the device")
+            try:
+                if sendUartCommand(strComPort, "REQ_INIT"):
+                    print("Device reset completed successfully")
+                else:
+                    print("Warning: Device reset may not have completed properly")
+            except Exception as e:
+                print(f"Warning: Failed to send final REQ_INIT command: {str(e)}") 
\ No newline at end of file
@@ -4,20 +4,30 @@ import os
 import sys
 from datetime import datetime
 
+from eventlog import logEvent, closeEventLog
+from fwimage import getImageInfo
 from common import (
     setupLogging,
     getComPortByNumber,
+    findComPort,
+    getConfigSection,
+    selectAdbDevice,
+    flashAllDevices,
+    stageFirmwareImage,
     waitForTestCompletion
 )
 
 from ATPFWDL import atpfwdlProcess
 from SARF import sarfProcess
 
-def main():
+UPGRADE_TOOL_BINARY = "upgrade_tool.exe" if os.name == "nt" else "upgrade_tool"
+
+def main(lstArgs=None):
     """
     * Main function that handles command-line arguments and executes appropriate station processes
     * Manages the overall workflow of the CT1 Device Management Tool
     *
+    * @param lstArgs Command-line arguments, sys.argv[1:] if None
     * @return Boolean indicating success or failure of the process
     """
     objParser = argparse.ArgumentParser(description="CT1 Device Management Tool")
@@ -25,34 +35,75 @@ def main():
     objParser.add_argument("--StationName", help="Test station name")
     objParser.add_argument("--device", help="ADB device ID (if multiple devices connected)")
     objParser.add_argument("--comport", type=int, help="COM port number (e.g., 3 for COM3)", nargs='?', const=None)
-    objParser.add_argument("--timeout", type=int, default=600, help="Test completion timeout in seconds (default: 300)")
+    objParser.add_argument("--comlocation", help="USB physical location of the fixture port (e.g., 1-1.2:1.0)")
+    objParser.add_argument("--comdevice", help="Serial device path used as-is (e.g., /dev/pts/3 from fixturesim.py)")
+    objParser.add_argument("--flashall", action="store_true", help="Flash every board in Maskrom mode in parallel, then exit")
+    objParser.add_argument("--image", help="Firmware image: a name from image_cache in CT1.yaml or an update.img path, "
+                           "staged to local disk (default: update.img in the upgrade tool directory)")
+    objParser.add_argument("--toolpath", default="upgrade_tool_v2.33_for_window",
+                           help="upgrade_tool directory (default: upgrade_tool_v2.33_for_window)")
+    objParser.add_argument("--timeout", type=int,
+                           help="Test completion timeout in seconds (default: timeouts.test_completion in CT1.yaml, 300)")
     
-    objArgs = objParser.parse_args()
+    objArgs = objParser.parse_args(lstArgs)
+    if lstArgs is None:
+        lstArgs = sys.argv[1:]
     objLogger = setupLogging(objArgs.SerialNumber)
     objStartTime = datetime.now()
     print(f"=== CT1 Device Management Tool ===")
     print(f"Start time: {objStartTime.strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"Parameters: {' '.join(sys.argv[1:])}")
+    print(f"Parameters: {' '.join(lstArgs)}")
+    logEvent("run_start", station=objArgs.StationName, argv=lstArgs)
+    bResult = False
     
     try:
-        strDLToolPath = os.path.abspath("upgrade_tool_v2.33_for_window")
+        strDLToolPath = os.path.abspath(objArgs.toolpath)
         strIQxelPath= os.path.abspath("IQxel")
         strOSImgPath = "update.img"
-        print(f"Upgrade tool path: {strDLToolPath}")
-        if not os.path.exists(os.path.join(strDLToolPath, "upgrade_tool.exe")):
-            print(f"Error: Upgrade tool not found at path {strDLToolPath}")
-            return False
-        if not os.path.exists(os.path.join(strDLToolPath, "update.img")):
-            print(f"Error: Update image not found at path {strDLToolPath}")
-            return False
+        bFlashing = objArgs.StationName == "ATPFWDL" or objArgs.flashall
+        if bFlashing:
+            # Only the flashing flows need upgrade_tool; other stations run without it (e.g. on fixturesim)
+            print(f"Upgrade tool path: {strDLToolPath}")
+            if not os.path.exists(os.path.join(strDLToolPath, UPGRADE_TOOL_BINARY)):
+                print(f"Error: Upgrade tool not found at path {strDLToolPath}")
+                return False
+            if objArgs.image:
+                strOSImgPath = stageFirmwareImage(objArgs.image)
+                if strOSImgPath is None:
+                    return False
+            elif not os.path.exists(os.path.join(strDLToolPath, "update.img")):
+                print(f"Error: Update image not found at path {strDLToolPath}")
+                return False
+            dictImage = getImageInfo(os.path.join(strDLToolPath, strOSImgPath))
+            if dictImage is None:
+                return False
+            print(f"Update image: version {dictImage['version']}, chip {dictImage['chip']}, md5 {dictImage.get('md5')}")
+            logEvent("image", path=strOSImgPath, version=dictImage["version"], md5=dictImage.get("md5"))
         strComPort = None
-        if objArgs.comport is not None:
+        if objArgs.comdevice:
+            strComPort = objArgs.comdevice
+            print(f"Using serial device: {strComPort}")
+        elif objArgs.comport is not None:
             strComPort = getComPortByNumber(objArgs.comport)
             if not strComPort:
                 print(f"Error: COM{objArgs.comport} not found")
                 return False
             print(f"Using COM port: {strComPort}")
-        if objArgs.StationName == "ATPFWDL":
+        else:
+            dictFixturePort = getConfigSection("fixture_port")
+            strLocation = objArgs.comlocation or dictFixturePort.get("location")
+            strUsbSerial = dictFixturePort.get("serial_number")
+            if strLocation or strUsbSerial:
+                strComPort = findComPort(strLocation=strLocation, strSerialNumber=strUsbSerial)
+                if not strComPort:
+                    print(f"Error: Fixture port not found (location: {strLocation}, serial: {strUsbSerial})")
+                    return False
+                print(f"Using COM port: {strComPort} (location: {strLocation}, serial: {strUsbSerial})")
+        if objArgs.device:
+            selectAdbDevice(objArgs.device)
+        if objArgs.flashall:
+            bResult = flashAllDevices(strDLToolPath, strOSImgPath)
+        elif objArgs.StationName == "ATPFWDL":
             if not strComPort:
                 print("Error: ATPFWDL station requires COM port specification")
                 return False
@@ -61,7 +112,8 @@ def main():
                 strToolPath=strDLToolPath,
                 strImgPath=strOSImgPath,
                 strSerialNumber=objArgs.SerialNumber,
-                strDeviceId=objArgs.device
+                strDeviceId=objArgs.device,
+                nTimeoutSeconds=objArgs.timeout
             )
         elif objArgs.StationName == "SARF":
             if not strComPort:
@@ -88,6 +140,8 @@ def main():
             print("For ATPFWDL station: python CT1.py --StationName ATPFWDL --comport 3 --SerialNumber 123456")
             print("For SARF station: python CT1.py --StationName SARF --comport 3 --SerialNumber 123456")
             print("For other stations: python CT1.py --StationName PreUI --SerialNumber 123456")
+            print("To flash all boards in Maskrom mode: python CT1.py --flashall")
+            print("To flash a staged image: python CT1.py --StationName ATPFWDL --comport 3 --image sku_a")
             bResult = False
             
         # Print end time and elapsed time
@@ -100,6 +154,9 @@ def main():
         return bResult
         
     finally:
+        logEvent("run_end", station=objArgs.StationName, ok=bool(bResult),
+                 dur=round((datetime.now() - objStartTime).total_seconds(), 3))
+        closeEventLog()
         # Close logger
         if 'objLogger' in locals():
             objLogger.close()
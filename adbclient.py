@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+import os
+import socket
+import struct
+import subprocess
+import time
+
+ADB_SERVER_HOST = "127.0.0.1"
+ADB_SERVER_PORT = 5037
+SYNC_DATA_MAX = 64 * 1024
+
+SHELL_ID_STDIN = 0
+SHELL_ID_STDOUT = 1
+SHELL_ID_STDERR = 2
+SHELL_ID_EXIT = 3
+SHELL_ID_CLOSE_STDIN = 4
+
+class AdbError(Exception):
+    """
+    * Raised when the adb server or device answers FAIL or breaks the protocol
+    """
+    pass
+
+class AdbClient:
+    """
+    * Client for the local adb server smart-socket protocol (localhost:5037)
+    * Talks to the server that the adb executable starts, so each devices/shell/
+    * push/pull is a socket round-trip instead of a new adb client process
+    * Every request opens its own connection, so one client is safe to share
+    *
+    * Wire format: requests are a 4 hex digit length followed by the service name;
+    * the server answers OKAY or FAIL + 4 hex digit length + message
+    """
+    def __init__(self, strHost=ADB_SERVER_HOST, nPort=ADB_SERVER_PORT, fTimeout=10.0):
+        """
+        * @param strHost adb server host
+        * @param nPort adb server port
+        * @param fTimeout Socket timeout in seconds for connect and each read
+        """
+        self.strHost = strHost
+        self.nPort = nPort
+        self.fTimeout = fTimeout
+        self.dictFeatures = {}
+
+    def connect(self):
+        objSock = socket.create_connection((self.strHost, self.nPort), timeout=self.fTimeout)
+        objSock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return objSock
+
+    def readExact(self, objSock, nLength):
+        """
+        * Read exactly nLength bytes
+        *
+        * @return Bytes read
+        """
+        lstChunks = []
+        nRemaining = nLength
+        while nRemaining > 0:
+            byteChunk = objSock.recv(min(nRemaining, SYNC_DATA_MAX))
+            if not byteChunk:
+                raise AdbError(f"adb connection closed ({nLength - nRemaining} of {nLength} bytes read)")
+            lstChunks.append(byteChunk)
+            nRemaining -= len(byteChunk)
+        return b"".join(lstChunks)
+
+    def readAll(self, objSock):
+        lstChunks = []
+        while True:
+            byteChunk = objSock.recv(SYNC_DATA_MAX)
+            if not byteChunk:
+                return b"".join(lstChunks)
+            lstChunks.append(byteChunk)
+
+    def readHexString(self, objSock):
+        """
+        * Read a 4 hex digit length-prefixed string
+        """
+        nLength = int(self.readExact(objSock, 4), 16)
+        return self.readExact(objSock, nLength).decode("utf-8", errors="replace")
+
+    def sendRequest(self, objSock, strRequest):
+        """
+        * Send one smart-socket request and check the OKAY/FAIL status
+        *
+        * @param objSock Connected socket
+        * @param strRequest Service request, e.g. host:devices or shell:ls
+        """
+        byteRequest = strRequest.encode("utf-8")
+        objSock.sendall(b"%04x" % len(byteRequest) + byteRequest)
+        byteStatus = self.readExact(objSock, 4)
+        if byteStatus == b"OKAY":
+            return
+        if byteStatus == b"FAIL":
+            raise AdbError(f"{strRequest}: {self.readHexString(objSock)}")
+        raise AdbError(f"{strRequest}: unexpected adb status {byteStatus!r}")
+
+    def hostQuery(self, strRequest):
+        """
+        * Run a host service that replies with one length-prefixed string
+        *
+        * @param strRequest Host service, e.g. host:version
+        * @return Reply text
+        """
+        with self.connect() as objSock:
+            self.sendRequest(objSock, strRequest)
+            return self.readHexString(objSock)
+
+    def getVersion(self):
+        """
+        * @return adb server protocol version number
+        """
+        return int(self.hostQuery("host:version"), 16)
+
+    def parseDevices(self, strText):
+        """
+        * Parse a devices listing into (serial, state) tuples
+        """
+        lstDevices = []
+        for strLine in strText.splitlines():
+            lstParts = strLine.split()
+            if len(lstParts) >= 2:
+                lstDevices.append((lstParts[0], lstParts[1]))
+        return lstDevices
+
+    def getDevices(self):
+        """
+        * Same listing as `adb devices`
+        *
+        * @return List of (serial, state) tuples, e.g. [("ABC123", "device")]
+        """
+        return self.parseDevices(self.hostQuery("host:devices"))
+
+    def trackDevices(self, fTimeout=None):
+        """
+        * Follow host:track-devices; the server sends the full listing on connect
+        * and again on every state change. Close the generator to stop tracking
+        *
+        * @param fTimeout Seconds to wait for each update (None blocks)
+        * @return Generator yielding lists of (serial, state) tuples
+        """
+        objSock = self.connect()
+        try:
+            self.sendRequest(objSock, "host:track-devices")
+            objSock.settimeout(fTimeout)
+            while True:
+                yield self.parseDevices(self.readHexString(objSock))
+        finally:
+            objSock.close()
+
+    def transportRequest(self, strSerial):
+        if strSerial:
+            return f"host:transport:{strSerial}"
+        return "host:transport-any"
+
+    def openService(self, strSerial, strService):
+        """
+        * Switch a new connection to a device and open a device service on it
+        *
+        * @param strSerial Device serial, or None for the only attached device
+        * @param strService Device service, e.g. shell,v2,raw:ls or sync:
+        * @return Socket streaming the service
+        """
+        objSock = self.connect()
+        try:
+            self.sendRequest(objSock, self.transportRequest(strSerial))
+            self.sendRequest(objSock, strService)
+        except BaseException:
+            objSock.close()
+            raise
+        return objSock
+
+    def getFeatures(self, strSerial):
+        """
+        * Device features (shell_v2, cmd, ...), cached per serial
+        *
+        * @return Set of feature names
+        """
+        if strSerial not in self.dictFeatures:
+            strRequest = f"host-serial:{strSerial}:features" if strSerial else "host:features"
+            try:
+                setFeatures = set(self.hostQuery(strRequest).split(","))
+            except AdbError:
+                setFeatures = set()
+            self.dictFeatures[strSerial] = setFeatures
+        return self.dictFeatures[strSerial]
+
+    def shell(self, strSerial, strCommand, fTimeout=None):
+        """
+        * Run one shell command, like `adb shell <command>`
+        * Uses the shell v2 protocol for a real exit status; on devices without
+        * shell_v2 the status is echoed after the output instead
+        *
+        * @param strSerial Device serial, or None for the only attached device
+        * @param strCommand Shell command line
+        * @param fTimeout Socket timeout in seconds (client default if None)
+        * @return Tuple (exit status or None if unknown, stdout and stderr text)
+        """
+        if "shell_v2" in self.getFeatures(strSerial):
+            with self.openService(strSerial, f"shell,v2,raw:{strCommand}") as objSock:
+                objSock.settimeout(fTimeout or self.fTimeout)
+                return self.readShellV2(objSock)
+        strMarker = "__CT1_RC__"
+        with self.openService(strSerial, f"shell:{strCommand}; echo {strMarker}$?") as objSock:
+            objSock.settimeout(fTimeout or self.fTimeout)
+            strOutput = self.readAll(objSock).decode("utf-8", errors="replace")
+        nIdx = strOutput.rfind(strMarker)
+        if nIdx < 0:
+            return None, strOutput.rstrip("\r\n")
+        try:
+            nStatus = int(strOutput[nIdx + len(strMarker):].strip())
+        except ValueError:
+            nStatus = None
+        return nStatus, strOutput[:nIdx].rstrip("\r\n")
+
+    def readShellV2(self, objSock):
+        """
+        * Collect shell v2 packets (1 byte id, 32-bit LE length, data) until the exit packet
+        *
+        * @return Tuple (exit status, stdout and stderr text)
+        """
+        lstOutput = []
+        nStatus = None
+        while True:
+            byteId = objSock.recv(1)
+            if not byteId:
+                break
+            nId = byteId[0]
+            nLength = struct.unpack("<I", self.readExact(objSock, 4))[0]
+            byteData = self.readExact(objSock, nLength) if nLength else b""
+            if nId in (SHELL_ID_STDOUT, SHELL_ID_STDERR):
+                lstOutput.append(byteData)
+            elif nId == SHELL_ID_EXIT:
+                nStatus = byteData[0] if byteData else None
+                break
+        return nStatus, b"".join(lstOutput).decode("utf-8", errors="replace").rstrip("\r\n")
+
+    def openShellStream(self, strSerial, strCommand):
+        """
+        * Start a long-running command (e.g. logcat) and return its raw output socket
+        * The command stops when the socket is closed
+        *
+        * @return Socket carrying the command's stdout
+        """
+        return self.openService(strSerial, f"exec:{strCommand}")
+
+    def execOut(self, strSerial, strCommand, objOutput=None):
+        """
+        * Run a command with a binary-safe stdout, like `adb exec-out`
+        *
+        * @param strSerial Device serial, or None for the only attached device
+        * @param strCommand Shell command line
+        * @param objOutput Binary file object to stream into, or None to return the bytes
+        * @return Output bytes, or the number of bytes written to objOutput
+        """
+        with self.openShellStream(strSerial, strCommand) as objSock:
+            if objOutput is None:
+                return self.readAll(objSock)
+            nTotal = 0
+            while True:
+                byteChunk = objSock.recv(SYNC_DATA_MAX)
+                if not byteChunk:
+                    return nTotal
+                objOutput.write(byteChunk)
+                nTotal += len(byteChunk)
+
+    def sendSyncRequest(self, objSock, byteId, strPath):
+        bytePath = strPath.encode("utf-8")
+        objSock.sendall(byteId + struct.pack("<I", len(bytePath)) + bytePath)
+
+    def readSyncHeader(self, objSock):
+        byteHeader = self.readExact(objSock, 8)
+        return byteHeader[:4], struct.unpack("<I", byteHeader[4:])[0]
+
+    def stat(self, strSerial, strRemotePath):
+        """
+        * Stat a device file over the sync protocol
+        *
+        * @return Tuple (mode, size, mtime); mode 0 means the file does not exist
+        """
+        with self.openService(strSerial, "sync:") as objSock:
+            self.sendSyncRequest(objSock, b"STAT", strRemotePath)
+            byteReply = self.readExact(objSock, 16)
+            if byteReply[:4] != b"STAT":
+                raise AdbError(f"stat {strRemotePath}: unexpected sync reply {byteReply[:4]!r}")
+            return struct.unpack("<III", byteReply[4:])
+
+    def push(self, strSerial, strLocalPath, strRemotePath, nMode=0o644):
+        """
+        * Copy a host file to the device, like `adb push`
+        *
+        * @param strSerial Device serial, or None for the only attached device
+        * @param strLocalPath Host file path
+        * @param strRemotePath Device file path, or a directory ending in /
+        * @param nMode Permission bits of the device file
+        * @return Number of bytes transferred
+        """
+        if strRemotePath.endswith("/"):
+            strRemotePath += os.path.basename(strLocalPath)
+        nTotal = 0
+        with self.openService(strSerial, "sync:") as objSock:
+            self.sendSyncRequest(objSock, b"SEND", f"{strRemotePath},{0o100000 | nMode}")
+            with open(strLocalPath, "rb") as objFile:
+                while True:
+                    byteChunk = objFile.read(SYNC_DATA_MAX)
+                    if not byteChunk:
+                        break
+                    objSock.sendall(b"DATA" + struct.pack("<I", len(byteChunk)) + byteChunk)
+                    nTotal += len(byteChunk)
+            objSock.sendall(b"DONE" + struct.pack("<I", int(time.time())))
+            byteId, nLength = self.readSyncHeader(objSock)
+            if byteId == b"FAIL":
+                raise AdbError(f"push {strRemotePath}: {self.readExact(objSock, nLength).decode('utf-8', errors='replace')}")
+            if byteId != b"OKAY":
+                raise AdbError(f"push {strRemotePath}: unexpected sync reply {byteId!r}")
+            objSock.sendall(b"QUIT" + struct.pack("<I", 0))
+        return nTotal
+
+    def pull(self, strSerial, strRemotePath, strLocalPath):
+        """
+        * Copy a device file to the host, like `adb pull`
+        * Data goes to a temporary file that replaces strLocalPath only on success
+        *
+        * @param strSerial Device serial, or None for the only attached device
+        * @param strRemotePath Device file path
+        * @param strLocalPath Host file path
+        * @return Number of bytes transferred
+        """
+        strTempPath = strLocalPath + ".part"
+        nTotal = 0
+        try:
+            with self.openService(strSerial, "sync:") as objSock, open(strTempPath, "wb") as objFile:
+                self.sendSyncRequest(objSock, b"RECV", strRemotePath)
+                while True:
+                    byteId, nLength = self.readSyncHeader(objSock)
+                    if byteId == b"DATA":
+                        objFile.write(self.readExact(objSock, nLength))
+                        nTotal += nLength
+                    elif byteId == b"DONE":
+                        break
+                    elif byteId == b"FAIL":
+                        raise AdbError(f"pull {strRemotePath}: {self.readExact(objSock, nLength).decode('utf-8', errors='replace')}")
+                    else:
+                        raise AdbError(f"pull {strRemotePath}: unexpected sync reply {byteId!r}")
+                objSock.sendall(b"QUIT" + struct.pack("<I", 0))
+            os.replace(strTempPath, strLocalPath)
+        finally:
+            if os.path.exists(strTempPath):
+                os.remove(strTempPath)
+        return nTotal
+
+def getSerialFromPrefix(lstAdbPrefix):
+    """
+    * Device serial selected by an ADB command prefix
+    *
+    * @param lstAdbPrefix ADB command prefix (e.g. ['adb', '-s', 'SERIAL'])
+    * @return Serial string, or None when the prefix targets the only device
+    """
+    if "-s" in lstAdbPrefix:
+        nIdx = lstAdbPrefix.index("-s")
+        if nIdx + 1 < len(lstAdbPrefix):
+            return lstAdbPrefix[nIdx + 1]
+    return None
+
+objAdbClient = None
+bAdbClientChecked = False
+
+def getAdbClient(strAdbPath="adb"):
+    """
+    * Shared client for the local adb server, used behind the adb helpers
+    * Starts the server once with `adb start-server` if nothing answers yet
+    * Honors ANDROID_ADB_SERVER_PORT like the adb executable does
+    *
+    * @param strAdbPath adb executable used to start the server
+    * @return AdbClient, or None when no server can be reached (callers then
+    *         fall back to running the adb executable)
+    """
+    global objAdbClient, bAdbClientChecked
+    if bAdbClientChecked:
+        return objAdbClient
+    objClient = AdbClient(nPort=int(os.environ.get("ANDROID_ADB_SERVER_PORT", ADB_SERVER_PORT)))
+    for nAttempt in range(2):
+        try:
+            objClient.getVersion()
+            objAdbClient = objClient
+            break
+        except (AdbError, OSError):
+            if nAttempt == 0:
+                try:
+                    subprocess.run([strAdbPath, "start-server"], capture_output=True, timeout=30)
+                except (OSError, subprocess.TimeoutExpired):
+                    break
+    if objAdbClient is None:
+        print("Warning: adb server not reachable, using the adb executable for each call", flush=True)
+    bAdbClientChecked = True
+    return objAdbClient
+
+def openExecOut(lstAdbPrefix, strCommand):
+    """
+    * Start `adb exec-out` for a command and return its binary stdout
+    * Uses the adb server client when reachable, otherwise the adb executable
+    * The stream supports read() and read1(), whichever path is taken
+    * The close callable also stops a command that is still running (e.g. logcat)
+    *
+    * @param lstAdbPrefix ADB command prefix
+    * @param strCommand Device command line
+    * @return Tuple (binary readable stream, close callable)
+    """
+    objClient = getAdbClient(lstAdbPrefix[0])
+    if objClient is not None:
+        try:
+            objSock = objClient.openShellStream(getSerialFromPrefix(lstAdbPrefix), strCommand)
+            objSock.settimeout(None)
+            objStream = objSock.makefile("rb")
+
+            def close():
+                try:
+                    objSock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                objStream.close()
+                objSock.close()
+
+            return objStream, close
+        except (AdbError, OSError) as e:
+            print(f"Warning: adb server exec-out failed, falling back to adb: {str(e)}", flush=True)
+    objProcess = subprocess.Popen(lstAdbPrefix + ["exec-out", strCommand], stdout=subprocess.PIPE)
+
+    def closeProcess():
+        if objProcess.poll() is None:
+            objProcess.terminate()
+        objProcess.wait()
+        objProcess.stdout.close()
+
+    return objProcess.stdout, closeProcess
+
+def openExecStream(lstAdbPrefix, strCommand):
+    """
+    * Start a device command with its stdin and stdout both connected to the host
+    * Uses an exec: service on the adb server when reachable, otherwise
+    * `adb shell -T` with piped stdin; both keep a single device process alive
+    * for interactive traffic (e.g. AT commands to a modem tty)
+    *
+    * @param lstAdbPrefix ADB command prefix
+    * @param strCommand Device command line
+    * @return Tuple (binary readable stream, write callable taking bytes, close callable)
+    """
+    objClient = getAdbClient(lstAdbPrefix[0])
+    if objClient is not None:
+        try:
+            objSock = objClient.openShellStream(getSerialFromPrefix(lstAdbPrefix), strCommand)
+            objSock.settimeout(None)
+            objStream = objSock.makefile("rb")
+
+            def close():
+                try:
+                    objSock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                objStream.close()
+                objSock.close()
+
+            return objStream, objSock.sendall, close
+        except (AdbError, OSError) as e:
+            print(f"Warning: adb server exec stream failed, falling back to adb: {str(e)}", flush=True)
+    objProcess = subprocess.Popen(lstAdbPrefix + ["shell", "-T", strCommand], stdin=subprocess.PIPE,
+                                  stdout=subprocess.PIPE, bufsize=0)
+
+    def write(byteData):
+        objProcess.stdin.write(byteData)
+        objProcess.stdin.flush()
+
+    def closeProcess():
+        try:
+            objProcess.stdin.close()
+        except OSError:
+            pass
+        if objProcess.poll() is None:
+            objProcess.terminate()
+        objProcess.wait()
+        objProcess.stdout.close()
+
+    return objProcess.stdout, write, closeProcess
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+import queue
+import socket
+import subprocess
+import threading
+import time
+import uuid
+
+from streamreader import readStreamLines
+from adbclient import AdbError, getAdbClient, getSerialFromPrefix
+
+class AdbShellSession:
+    """
+    * One long-lived `adb shell` used for many device commands
+    * Each command is followed by a unique end-of-command sentinel that carries
+    * its exit status, so output and status come back per command without a new
+    * host process, adb server round-trip and device shell per command
+    """
+    def __init__(self, lstAdbPrefix, fDefaultTimeout=30):
+        """
+        * @param lstAdbPrefix ADB command prefix (e.g. ['adb', '-s', 'SERIAL'])
+        * @param fDefaultTimeout Default per-command timeout in seconds
+        """
+        self.lstAdbPrefix = list(lstAdbPrefix)
+        self.fDefaultTimeout = fDefaultTimeout
+        self.objProcess = None
+        self.objReaderThread = None
+        self.objLines = queue.Queue()
+        self.objLock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, objExcType, objExcValue, objTraceback):
+        self.close()
+        return False
+
+    def isAlive(self):
+        return self.objProcess is not None and self.objProcess.poll() is None
+
+    def start(self):
+        """
+        * Start the interactive shell and its output reader thread
+        *
+        * @return self
+        """
+        if self.isAlive():
+            return self
+        self.objLines = queue.Queue()
+        self.objProcess = subprocess.Popen(
+            self.lstAdbPrefix + ['shell'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0
+        )
+        self.objReaderThread = threading.Thread(target=self.readLoop, args=(self.objProcess, self.objLines))
+        self.objReaderThread.daemon = True
+        self.objReaderThread.start()
+        return self
+
+    def readLoop(self, objProcess, objLines):
+        try:
+            readStreamLines(objProcess.stdout, objLines.put)
+        except Exception:
+            pass
+        objLines.put(None)
+
+    def close(self):
+        """
+        * Exit the shell; kills it if it does not leave within a second
+        """
+        with self.objLock:
+            if self.objProcess is None:
+                return
+            try:
+                if self.objProcess.poll() is None:
+                    self.objProcess.stdin.write(b"exit\n")
+                    self.objProcess.stdin.flush()
+                    self.objProcess.wait(timeout=1.0)
+            except (OSError, subprocess.TimeoutExpired):
+                self.objProcess.kill()
+            self.objProcess = None
+
+    def run(self, strCommand, fTimeout=None):
+        """
+        * Run one shell command in the session
+        * stderr of the command is merged into its output
+        *
+        * @param strCommand Shell command line
+        * @param fTimeout Timeout in seconds (session default if None)
+        * @return Tuple (exit status or None on timeout/broken session, output text)
+        """
+        if fTimeout is None:
+            fTimeout = self.fDefaultTimeout
+        with self.objLock:
+            if not self.isAlive():
+                self.start()
+            strSentinel = f"__CT1_DONE_{uuid.uuid4().hex[:12]}__"
+            strScript = f"{{ {strCommand}\n}} 2>&1; printf '\\n%s %s\\n' {strSentinel} $?\n"
+            lstOutput = []
+            try:
+                self.objProcess.stdin.write(strScript.encode('utf-8'))
+                self.objProcess.stdin.flush()
+            except OSError as e:
+                self.objProcess = None
+                return None, f"adb shell session broken: {str(e)}"
+            fDeadline = time.monotonic() + fTimeout
+            while True:
+                fRemaining = fDeadline - time.monotonic()
+                if fRemaining <= 0:
+                    print(f"Error: adb shell command timed out after {fTimeout} s: {strCommand}", flush=True)
+                    self.objProcess.kill()
+                    self.objProcess = None
+                    return None, "\n".join(lstOutput)
+                try:
+                    strLine = self.objLines.get(timeout=fRemaining)
+                except queue.Empty:
+                    continue
+                if strLine is None:
+                    self.objProcess = None
+                    return None, "\n".join(lstOutput)
+                nIdx = strLine.find(strSentinel)
+                if nIdx < 0:
+                    lstOutput.append(strLine)
+                    continue
+                if nIdx > 0:
+                    lstOutput.append(strLine[:nIdx])
+                try:
+                    nStatus = int(strLine[nIdx + len(strSentinel):].strip())
+                except ValueError:
+                    nStatus = None
+                return nStatus, "\n".join(lstOutput)
+
+class AdbClientShellSession:
+    """
+    * Same run() interface as AdbShellSession, backed by the adb server protocol
+    * client: each command is one socket round-trip with its own exit status
+    """
+    def __init__(self, objClient, strSerial, fDefaultTimeout=30):
+        """
+        * @param objClient AdbClient connected to the local adb server
+        * @param strSerial Device serial, or None for the only attached device
+        * @param fDefaultTimeout Default per-command timeout in seconds
+        """
+        self.objClient = objClient
+        self.strSerial = strSerial
+        self.fDefaultTimeout = fDefaultTimeout
+
+    def start(self):
+        return self
+
+    def close(self):
+        pass
+
+    def run(self, strCommand, fTimeout=None):
+        """
+        * Run one shell command on the device
+        *
+        * @param strCommand Shell command line
+        * @param fTimeout Timeout in seconds without output (session default if None)
+        * @return Tuple (exit status or None on timeout/adb error, output text)
+        """
+        try:
+            return self.objClient.shell(self.strSerial, strCommand, fTimeout or self.fDefaultTimeout)
+        except socket.timeout:
+            print(f"Error: adb shell command timed out after {fTimeout or self.fDefaultTimeout} s: {strCommand}", flush=True)
+            return None, ""
+        except (AdbError, OSError) as e:
+            return None, f"adb shell failed: {str(e)}"
+
+dictAdbShellSessions = {}
+objSessionsLock = threading.Lock()
+
+def getAdbShellSession(lstAdbPrefix):
+    """
+    * Get the shared shell session for an ADB prefix, starting it if needed
+    * Lets all configuration steps of a station run reuse one `adb shell`,
+    * or talk to the adb server directly when it is reachable
+    *
+    * @param lstAdbPrefix ADB command prefix (e.g. ['adb', '-s', 'SERIAL'])
+    * @return Started AdbShellSession or AdbClientShellSession
+    """
+    strKey = " ".join(lstAdbPrefix)
+    with objSessionsLock:
+        objSession = dictAdbShellSessions.get(strKey)
+        if objSession is None:
+            objClient = getAdbClient(lstAdbPrefix[0])
+            if objClient is not None:
+                objSession = AdbClientShellSession(objClient, getSerialFromPrefix(lstAdbPrefix))
+            else:
+                objSession = AdbShellSession(lstAdbPrefix)
+            dictAdbShellSessions[strKey] = objSession
+    return objSession.start()
+
+def closeAdbShellSessions():
+    """
+    * Close every shared shell session (call at the end of a station run
+    * and after `adb root`, which restarts adbd and drops open shells)
+    """
+    with objSessionsLock:
+        lstSessions = list(dictAdbShellSessions.values())
+        dictAdbShellSessions.clear()
+    for objSession in lstSessions:
+        objSession.close()
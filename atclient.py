@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+import codecs
+import queue
+import shlex
+import threading
+import time
+
+from adbclient import openExecStream
+from eventlog import logEvent
+from streamreader import splitLines
+
+AT_RESULT_OK = "OK"
+AT_ERROR_PREFIXES = ("ERROR", "+CME ERROR:", "+CMS ERROR:", "NO CARRIER")
+LTE_MODEM_TTY = "/dev/ttyUSB2"
+
+class AtResponse:
+    """
+    * Outcome of one AT command
+    """
+    def __init__(self, strCommand, strResult, lstLines, lstUnsolicited, fDuration):
+        """
+        * @param strCommand Command as sent, without the line ending
+        * @param strResult Final result line (OK, ERROR, +CME ERROR: ...), None on timeout
+        * @param lstLines Information and expected URC lines belonging to the command
+        * @param lstUnsolicited Lines that arrived before the command or after its result
+        * @param fDuration Seconds from sending to the last line needed
+        """
+        self.strCommand = strCommand
+        self.strResult = strResult
+        self.lstLines = lstLines
+        self.lstUnsolicited = lstUnsolicited
+        self.fDuration = fDuration
+
+    @property
+    def bOk(self):
+        return self.strResult == AT_RESULT_OK
+
+    @property
+    def bTimedOut(self):
+        return self.strResult is None
+
+    def getValues(self, strPrefix):
+        """
+        * Parse response lines such as "+QRXFTM: 0,-58"
+        *
+        * @param strPrefix Line prefix including the colon, e.g. "+QRXFTM:"
+        * @return List of value lists, one per matching line, in arrival order
+        """
+        lstValues = []
+        for strLine in self.lstLines:
+            if strLine.startswith(strPrefix):
+                lstValues.append([strValue.strip().strip('"') for strValue in strLine[len(strPrefix):].split(",")])
+        return lstValues
+
+def isFinalResult(strLine):
+    return strLine == AT_RESULT_OK or strLine.startswith(AT_ERROR_PREFIXES)
+
+class AtClient:
+    """
+    * AT command channel to a modem tty over one long-lived adb exec stream
+    * A device-side cat copies the tty to the stream and a second cat copies the
+    * stream to the tty, so each command is one write and its reply is read as
+    * soon as the modem sends it, with no temporary log file or fixed sleeps
+    * Lines are split by a reader thread; lines that arrive while no command is
+    * waiting are kept as unsolicited and reported with the next response
+    * Once the modem is seen echoing commands, lines before a command's echo
+    * (e.g. the late OK of a timed-out command) are treated as unsolicited too
+    """
+    def __init__(self, lstAdbPrefix, strTty=LTE_MODEM_TTY, fDefaultTimeout=5.0):
+        """
+        * @param lstAdbPrefix ADB command prefix
+        * @param strTty Modem AT port on the device
+        * @param fDefaultTimeout Default seconds to wait for a command's final result
+        """
+        self.lstAdbPrefix = list(lstAdbPrefix)
+        self.strTty = strTty
+        self.fDefaultTimeout = fDefaultTimeout
+        self.objStream = None
+        self.fnWrite = None
+        self.fnClose = None
+        self.objThread = None
+        self.objLines = queue.Queue()
+        self.objLock = threading.Lock()
+        self.bClosed = True
+        self.bModemEchoes = False
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, objExcType, objExcValue, objTraceback):
+        self.close()
+        return False
+
+    def buildCommand(self):
+        """
+        * @return Device command bridging the tty to stdin/stdout; the reader cat
+        *         is stopped when the stream closes and the writer cat exits
+        """
+        strTty = shlex.quote(self.strTty)
+        return (f"stty -F {strTty} raw -echo 2>/dev/null; "
+                f"cat {strTty} & trap 'kill $! 2>/dev/null' EXIT; cat > {strTty}")
+
+    def isAlive(self):
+        return not self.bClosed and self.objThread is not None and self.objThread.is_alive()
+
+    def open(self):
+        """
+        * Start the device-side bridge and the reader thread
+        *
+        * @return self
+        """
+        if self.isAlive():
+            return self
+        self.objLines = queue.Queue()
+        self.objStream, self.fnWrite, self.fnClose = openExecStream(self.lstAdbPrefix, self.buildCommand())
+        self.bClosed = False
+        self.objThread = threading.Thread(target=self.readLoop, name="AtClient")
+        self.objThread.daemon = True
+        self.objThread.start()
+        return self
+
+    def close(self):
+        self.bClosed = True
+        if self.fnClose is not None:
+            fnClose, self.fnClose = self.fnClose, None
+            try:
+                fnClose()
+            except (OSError, ValueError):
+                pass
+        if self.objThread is not None:
+            self.objThread.join(timeout=1.0)
+            self.objThread = None
+
+    def readLoop(self):
+        objDecoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        strPending = ""
+        try:
+            while True:
+                byteChunk = self.objStream.read1(4096)
+                if not byteChunk:
+                    break
+                lstParts = splitLines(strPending + objDecoder.decode(byteChunk))
+                strPending = lstParts.pop()
+                for strLine in lstParts:
+                    strLine = strLine.strip()
+                    if strLine:
+                        self.objLines.put(strLine)
+        except (OSError, ValueError):
+            pass
+        if strPending.strip():
+            self.objLines.put(strPending.strip())
+        self.objLines.put(None)
+
+    def drainUnsolicited(self):
+        """
+        * @return Lines received while no command was waiting
+        """
+        lstLines = []
+        while True:
+            try:
+                strLine = self.objLines.get_nowait()
+            except queue.Empty:
+                return lstLines
+            if strLine is None:
+                self.bClosed = True
+                return lstLines
+            lstLines.append(strLine)
+
+    def command(self, strCommand, fTimeout=None, strExpect=None):
+        """
+        * Send one AT command and wait for its final result
+        * With strExpect the wait continues after OK until a line with that prefix
+        * arrives, for commands whose measurement comes back as a URC
+        *
+        * @param strCommand Command without line ending, e.g. AT+QRFTESTMODE=1
+        * @param fTimeout Seconds to wait (default timeout if None)
+        * @param strExpect Optional response/URC prefix that must be seen, e.g. "+QRXFTM:"
+        * @return AtResponse; strResult is None on timeout or when the stream closed
+        """
+        if fTimeout is None:
+            fTimeout = self.fDefaultTimeout
+        with self.objLock:
+            lstUnsolicited = self.drainUnsolicited()
+            for strLine in lstUnsolicited:
+                print(f"AT unsolicited: {strLine}", flush=True)
+            lstLines = []
+            strResult = None
+            bExpectSeen = strExpect is None
+            bEchoSeen = False
+            fStart = time.monotonic()
+            fDeadline = fStart + fTimeout
+            if not self.bClosed:
+                self.fnWrite((strCommand + "\r\n").encode("ascii"))
+            while not self.bClosed:
+                fRemaining = fDeadline - time.monotonic()
+                if fRemaining <= 0:
+                    break
+                try:
+                    strLine = self.objLines.get(timeout=fRemaining)
+                except queue.Empty:
+                    break
+                if strLine is None:
+                    self.bClosed = True
+                    break
+                if strLine == strCommand:
+                    self.bModemEchoes = bEchoSeen = True
+                    continue
+                if strExpect is not None and strLine.startswith(strExpect):
+                    lstLines.append(strLine)
+                    bExpectSeen = True
+                elif self.bModemEchoes and not bEchoSeen:
+                    lstUnsolicited.append(strLine)
+                elif strResult is None and isFinalResult(strLine):
+                    strResult = strLine
+                elif strResult is None:
+                    lstLines.append(strLine)
+                else:
+                    lstUnsolicited.append(strLine)
+                if strResult is not None and (bExpectSeen or strResult != AT_RESULT_OK):
+                    break
+            fDuration = time.monotonic() - fStart
+            if strResult == AT_RESULT_OK and not bExpectSeen:
+                strResult = None
+        logEvent("at_command", cmd=strCommand, result=strResult, dur=round(fDuration, 3))
+        if strResult is None:
+            print(f"Error: No {strExpect or 'final result'} for {strCommand} within {fTimeout:g} seconds", flush=True)
+        return AtResponse(strCommand, strResult, lstLines, lstUnsolicited, fDuration)
+
+dictAtClients = {}
+objAtClientsLock = threading.Lock()
+
+def getAtClient(lstAdbPrefix, strTty=LTE_MODEM_TTY):
+    """
+    * Get the shared AT client for a device and tty, (re)opening it when needed
+    * (e.g. after `adb root` restarted adbd and dropped the stream)
+    *
+    * @param lstAdbPrefix ADB command prefix
+    * @param strTty Modem AT port on the device
+    * @return Open AtClient
+    """
+    strKey = " ".join(lstAdbPrefix) + " " + strTty
+    with objAtClientsLock:
+        objClient = dictAtClients.get(strKey)
+        if objClient is None:
+            objClient = AtClient(lstAdbPrefix, strTty)
+            dictAtClients[strKey] = objClient
+    return objClient.open()
+
+def closeAtClients():
+    """
+    * Close every shared AT client (call at the end of a station run)
+    """
+    with objAtClientsLock:
+        lstClients = list(dictAtClients.values())
+        dictAtClients.clear()
+    for objClient in lstClients:
+        objClient.close()
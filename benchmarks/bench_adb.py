@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+* Benchmark for adb calls against the fake adb server
+* Compares the smart-socket AdbClient with running the adb executable per call
+* (only when adb is on PATH; it is pointed at the fake server with -P) and with
+* the bare cost of starting a process, which every adb subprocess call pays
+*
+* Usage: python benchmarks/bench_adb.py [--calls N] [--push-kb KB]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from adbclient import AdbClient
+from fakeadbserver import FakeAdbServer
+
+def measure(fnCall, nCalls):
+    """
+    * @param fnCall Callable performing one operation
+    * @param nCalls Number of repetitions
+    * @return List of per-call seconds
+    """
+    lstLatencies = []
+    for _ in range(nCalls):
+        fStart = time.perf_counter()
+        fnCall()
+        lstLatencies.append(time.perf_counter() - fStart)
+    return lstLatencies
+
+def report(strName, lstLatencies):
+    print(f"{strName:<28} {statistics.mean(lstLatencies) * 1000:>9.2f} {statistics.median(lstLatencies) * 1000:>9.2f} "
+          f"{max(lstLatencies) * 1000:>9.2f}")
+
+def main():
+    objParser = argparse.ArgumentParser(description="adb client benchmark")
+    objParser.add_argument("--calls", type=int, default=200, help="Calls per operation (default: 200)")
+    objParser.add_argument("--push-kb", type=int, default=256, help="Size of the pushed/pulled file in KiB")
+    objArgs = objParser.parse_args()
+    dictResponses = {"getprop sys.boot_completed": "1\n", "wl up": ""}
+    with FakeAdbServer(dictShellResponses=dictResponses) as objServer, tempfile.TemporaryDirectory() as strTempDir:
+        objClient = AdbClient(nPort=objServer.nPort)
+        strLocalPath = os.path.join(strTempDir, "payload.bin")
+        with open(strLocalPath, "wb") as objFile:
+            objFile.write(os.urandom(objArgs.push_kb * 1024))
+        strPulledPath = os.path.join(strTempDir, "pulled.bin")
+        print(f"Fake adb server on port {objServer.nPort}, {objArgs.calls} calls per operation")
+        print(f"{'operation':<28} {'mean ms':>9} {'p50 ms':>9} {'max ms':>9}")
+        report("client devices", measure(objClient.getDevices, objArgs.calls))
+        report("client shell", measure(lambda: objClient.shell(None, "getprop sys.boot_completed"), objArgs.calls))
+        report(f"client push {objArgs.push_kb} KiB",
+               measure(lambda: objClient.push(None, strLocalPath, "/data/local/tmp/payload.bin"), objArgs.calls // 4 or 1))
+        report(f"client pull {objArgs.push_kb} KiB",
+               measure(lambda: objClient.pull(None, "/data/local/tmp/payload.bin", strPulledPath), objArgs.calls // 4 or 1))
+        report("process start only", measure(lambda: subprocess.run([sys.executable, "-c", "pass"]), objArgs.calls // 4 or 1))
+        strAdbPath = shutil.which("adb")
+        if strAdbPath:
+            lstAdb = [strAdbPath, "-P", str(objServer.nPort)]
+            report("adb devices (subprocess)", measure(
+                lambda: subprocess.run(lstAdb + ["devices"], capture_output=True), objArgs.calls // 4 or 1))
+            report("adb shell (subprocess)", measure(
+                lambda: subprocess.run(lstAdb + ["shell", "getprop sys.boot_completed"], capture_output=True),
+                objArgs.calls // 4 or 1))
+        else:
+            print("adb not on PATH: subprocess rows skipped, 'process start only' is their lower bound")
+
+if __name__ == "__main__":
+    main()
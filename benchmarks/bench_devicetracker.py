@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+* Benchmark for device-ready detection latency against the fake adb server
+* A device comes online after a random delay; measures how long after that
+* moment the legacy 1 s `adb devices` poll and the track-devices tracker notice it
+*
+* Usage: python benchmarks/bench_devicetracker.py [--rounds N]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from adbclient import AdbClient
+from devicetracker import AdbDeviceTracker
+from fakeadbserver import FakeAdbServer
+
+def pollForDevice(objClient, strSerial, nMaxRetries=30):
+    """
+    * Detection loop as checkAndGetAdbDevice did it: list devices, sleep 1 s
+    """
+    for _ in range(nMaxRetries):
+        if (strSerial, "device") in objClient.getDevices():
+            return True
+        time.sleep(1)
+    return False
+
+def measure(objServer, fnWait, nRounds, objRandom):
+    """
+    * @return List of seconds between the device coming online and fnWait returning
+    """
+    lstLatencies = []
+    for nRound in range(nRounds):
+        strSerial = f"DUT{nRound:04d}"
+        fOnlineAt = []
+        fDelay = objRandom.uniform(0.2, 1.5)
+
+        def attach():
+            fOnlineAt.append(time.perf_counter())
+            objServer.setDeviceState(strSerial, "device")
+
+        objTimer = threading.Timer(fDelay, attach)
+        objTimer.start()
+        fnWait(strSerial)
+        lstLatencies.append(time.perf_counter() - fOnlineAt[0])
+        objTimer.join()
+        objServer.setDeviceState(strSerial, None)
+    return lstLatencies
+
+def main():
+    objParser = argparse.ArgumentParser(description="adb device-ready latency benchmark")
+    objParser.add_argument("--rounds", type=int, default=10, help="Attach events per variant (default: 10)")
+    objArgs = objParser.parse_args()
+    objRandom = random.Random(1)
+    with FakeAdbServer(dictDevices={}) as objServer:
+        objClient = AdbClient(nPort=objServer.nPort)
+        objTracker = AdbDeviceTracker(objClient).start()
+        print(f"{'variant':<10} {'mean ms':>9} {'p50 ms':>9} {'max ms':>9}")
+        for strName, fnWait in (("poll 1 s", lambda strSerial: pollForDevice(objClient, strSerial)),
+                                ("tracker", lambda strSerial: objTracker.waitForDevice(strSerial, 30))):
+            lstLatencies = measure(objServer, fnWait, objArgs.rounds, objRandom)
+            print(f"{strName:<10} {statistics.mean(lstLatencies) * 1000:>9.1f} "
+                  f"{statistics.median(lstLatencies) * 1000:>9.1f} {max(lstLatencies) * 1000:>9.1f}")
+        objTracker.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+* Benchmark for the parallel flash scheduler
+* A fake upgrade_tool prints UF-style stage and percentage lines for a fixed
+* time per board; compares flashing N boards one after another with the
+* FlashScheduler running them concurrently
+*
+* Usage: python benchmarks/bench_flashscheduler.py [--boards N] [--flash-seconds S] [--parallel P]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flashprogress import FlashProgress
+from flashscheduler import FlashScheduler, RockusbDevice, JOB_PASS
+
+FAKE_UPGRADE_TOOL = (
+    "import sys, time\n"
+    "fSeconds = float(sys.argv[1])\n"
+    "for strStage in ('Download Boot', 'Wait For Maskrom', 'Download IDB'):\n"
+    "    print(strStage + ' Start'); print(strStage + ' Success')\n"
+    "print('Download Firmware Start')\n"
+    "for nPercent in range(0, 101, 5):\n"
+    "    sys.stdout.write('\\rDownload Image... (%d%%)' % nPercent); sys.stdout.flush()\n"
+    "    time.sleep(fSeconds / 21)\n"
+    "print('\\r\\nDownload Firmware Success\\r\\nUpgrade firmware ok.')\n"
+)
+
+def flashOne(strScript, fSeconds, objDevice, objProgress):
+    """
+    * Run the fake upgrade_tool for one board and feed its lines to the FlashProgress
+    """
+    objProcess = subprocess.Popen([sys.executable, strScript, str(fSeconds), objDevice.strLocationId],
+                                  stdout=subprocess.PIPE, text=True)
+    bOk = False
+    for strLine in objProcess.stdout:
+        for strPart in strLine.replace("\r", "\n").split("\n"):
+            if strPart:
+                objProgress.feed(strPart)
+                bOk = bOk or "Upgrade firmware ok" in strPart
+    objProcess.wait()
+    return bOk
+
+def main():
+    objParser = argparse.ArgumentParser(description="parallel flash scheduler benchmark")
+    objParser.add_argument("--boards", type=int, default=4, help="Simulated boards in Maskrom (default: 4)")
+    objParser.add_argument("--flash-seconds", type=float, default=2.0, help="Flash time per board (default: 2)")
+    objParser.add_argument("--parallel", type=int, default=4, help="Scheduler concurrency cap (default: 4)")
+    objArgs = objParser.parse_args()
+    lstDevices = [RockusbDevice(nIdx + 1, 0x2207, 0x350a, f"10{nIdx + 1}", "Maskrom") for nIdx in range(objArgs.boards)]
+    with tempfile.TemporaryDirectory() as strTempDir:
+        strScript = os.path.join(strTempDir, "fake_upgrade_tool.py")
+        with open(strScript, "w", encoding="utf-8") as objFile:
+            objFile.write(FAKE_UPGRADE_TOOL)
+        fnFlash = lambda objDevice, objProgress: flashOne(strScript, objArgs.flash_seconds, objDevice, objProgress)
+
+        fStart = time.perf_counter()
+        nSerialPassed = sum(1 for objDevice in lstDevices if fnFlash(objDevice, FlashProgress()))
+        fSerial = time.perf_counter() - fStart
+
+        fStart = time.perf_counter()
+        lstJobs = FlashScheduler(fnFlash, objArgs.parallel, fReportInterval=1.0).run(lstDevices)
+        fParallel = time.perf_counter() - fStart
+        nParallelPassed = sum(1 for objJob in lstJobs if objJob.strState == JOB_PASS)
+
+    print(f"{'variant':<12} {'boards':>7} {'passed':>7} {'wall s':>8} {'per board s':>12}")
+    print(f"{'serial':<12} {objArgs.boards:>7} {nSerialPassed:>7} {fSerial:>8.2f} {fSerial / objArgs.boards:>12.2f}")
+    print(f"{'scheduler':<12} {objArgs.boards:>7} {nParallelPassed:>7} {fParallel:>8.2f} {fParallel / objArgs.boards:>12.2f}")
+    print(f"speedup: {fSerial / fParallel:.2f}x (one board alone: ~{objArgs.flash_seconds:.2f} s)")
+
+if __name__ == "__main__":
+    main()
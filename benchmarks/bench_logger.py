@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+* Benchmark for common.Logger durability modes
+* Feeds the logger the write pattern of a flash (many tiny console writes with
+* periodic flushed status lines) and counts the write syscalls reaching the log file
+*
+* Usage: python benchmarks/bench_logger.py [--writes N]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import Logger, LOG_DURABILITY_SYNC, LOG_DURABILITY_BATCHED
+
+class CountingFileIO(io.FileIO):
+    """
+    * Raw file that counts write() calls; each one is a write syscall
+    """
+    nWriteCalls = 0
+
+    def write(self, byteData):
+        CountingFileIO.nWriteCalls += 1
+        return super().write(byteData)
+
+class CountingLogger(Logger):
+    """
+    * Logger whose log file sits on a CountingFileIO
+    """
+    def openLogFile(self, strLogFilename):
+        return io.TextIOWrapper(io.BufferedWriter(CountingFileIO(strLogFilename, "w")), encoding="utf-8")
+
+def runWorkload(strDurability, nWrites, strLogDir):
+    """
+    * Push the synthetic workload through one logger
+    *
+    * @param strDurability Logger durability mode
+    * @param nWrites Number of small writes
+    * @param strLogDir Directory for the log file
+    * @return Tuple (wall seconds, write syscalls)
+    """
+    CountingFileIO.nWriteCalls = 0
+    with open(os.devnull, "w", encoding="utf-8") as objNull:
+        objSavedStdout = sys.stdout
+        sys.stdout = objNull
+        try:
+            objLogger = CountingLogger("BENCH", strLogDir=strLogDir, strDurability=strDurability)
+            fStart = time.perf_counter()
+            for nIdx in range(nWrites):
+                objLogger.write("#")
+                if nIdx % 1000 == 0:
+                    objLogger.write(f"Download Image... ({nIdx * 100 // nWrites}%)\n")
+                    objLogger.flush()
+            objLogger.close()
+            fElapsed = time.perf_counter() - fStart
+        finally:
+            sys.stdout = objSavedStdout
+    return fElapsed, CountingFileIO.nWriteCalls
+
+def main():
+    objParser = argparse.ArgumentParser(description="Logger write-syscall benchmark")
+    objParser.add_argument("--writes", type=int, default=200000, help="Number of small writes (default: 200000)")
+    objArgs = objParser.parse_args()
+    with tempfile.TemporaryDirectory() as strLogDir:
+        print(f"{'durability':<10} {'wall s':>8} {'write syscalls':>15}")
+        for strDurability in (LOG_DURABILITY_SYNC, LOG_DURABILITY_BATCHED):
+            fElapsed, nWriteCalls = runWorkload(strDurability, objArgs.writes, strLogDir)
+            print(f"{strDurability:<10} {fElapsed:>8.3f} {nWriteCalls:>15}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+* Check and benchmark for the sysfs Maskrom detector against a FakeUsbSysfs tree
+* Plugs a Maskrom board, a Loader board and an unrelated USB device, asserts that
+* scan() classifies them, then measures how long waitForDevices takes to see a
+* board plugged in from another thread with a slow poll interval (notify wakes it)
+*
+* Usage: python benchmarks/bench_maskromdetector.py [--poll S] [--plug-delay S]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from maskromdetector import FakeUsbSysfs, MaskromDetector, MODE_LOADER, MODE_MASKROM
+
+def checkScan():
+    """
+    * Assert that only rockusb devices are listed, each in the mode its bcdUSB reports
+    """
+    with FakeUsbSysfs() as objSysfs:
+        objDetector = MaskromDetector(objSysfs.strRoot, bUseUdev=False)
+        objSysfs.addDevice("1-1.2", strMode=MODE_MASKROM, nDevNum=5)
+        objSysfs.addDevice("1-1.3", strMode=MODE_LOADER, nDevNum=6)
+        objSysfs.addDevice("1-1.4", strMode=MODE_MASKROM, tupInterface=(0xff, 0x42, 0x01))  # Rockchip board in ADB mode
+        lstMaskrom = objDetector.scan(MODE_MASKROM)
+        lstLoader = objDetector.scan(MODE_LOADER)
+        assert [objDevice.strLocation for objDevice in lstMaskrom] == ["1-1.2"], lstMaskrom
+        assert (lstMaskrom[0].nBusNum, lstMaskrom[0].nDevNum, lstMaskrom[0].nPid) == (1, 5, 0x350a), lstMaskrom
+        assert [objDevice.strLocation for objDevice in lstLoader] == ["1-1.3"], lstLoader
+        assert len(objDetector.scan(None)) == 2
+        objSysfs.removeDevice("1-1.2")
+        assert objDetector.scan(MODE_MASKROM) == []
+    print("scan: Maskrom, Loader and non-rockusb devices classified correctly")
+
+def main():
+    objParser = argparse.ArgumentParser(description="sysfs Maskrom detector check and benchmark")
+    objParser.add_argument("--poll", type=float, default=5.0, help="Detector poll interval in seconds (default: 5)")
+    objParser.add_argument("--plug-delay", type=float, default=0.2, help="Seconds before the board appears (default: 0.2)")
+    objArgs = objParser.parse_args()
+    checkScan()
+    objDetector = MaskromDetector(fPollInterval=objArgs.poll, bUseUdev=False)
+    with FakeUsbSysfs(objDetector=objDetector) as objSysfs:
+        objDetector.strSysfsRoot = objSysfs.strRoot
+        objTimer = threading.Timer(objArgs.plug_delay, lambda: objSysfs.addDevice("3-1", nDevNum=2))
+        fStart = time.perf_counter()
+        objTimer.start()
+        lstDevices = objDetector.waitForDevices(1, fTimeout=objArgs.poll * 2)
+        fWait = time.perf_counter() - fStart
+        objTimer.join()
+    assert [objDevice.strLocation for objDevice in lstDevices] == ["3-1"], lstDevices
+    print(f"hotplug seen {fWait - objArgs.plug_delay:.3f} s after the plug (poll interval {objArgs.poll:g} s)")
+
+if __name__ == "__main__":
+    main()
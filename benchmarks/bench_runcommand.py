@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+* Benchmark for the runCommand output reader
+* Replays an upgrade_tool transcript through a child process and compares the
+* legacy byte-at-a-time reader against the chunked readStreamLines engine
+*
+* Usage: python benchmarks/bench_runcommand.py [--transcript FILE] [--size-mb N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from streamreader import readStreamLines
+
+REPLAY_SCRIPT = (
+    "import sys, shutil\n"
+    "with open(sys.argv[1], 'rb') as f:\n"
+    "    shutil.copyfileobj(f, sys.stdout.buffer, 4096)\n"
+)
+
+def writeSyntheticTranscript(strPath, nSizeMb):
+    """
+    * Write an upgrade_tool UF style transcript of roughly the requested size
+    * Mimics the stage banners and CR-redrawn percentage lines of a real flash
+    *
+    * @param strPath Output file path
+    * @param nSizeMb Approximate transcript size in megabytes
+    """
+    lstHeader = [
+        "Loading firmware...",
+        "Support Type:RK3568\tFW Ver:1.0.00\tFW Time:2024-05-20 10:11:12",
+        "Loader ver:1.01\tLoader Time:2024-05-20 10:00:00",
+        "Start to upgrade firmware...",
+        "Download Boot Start", "Download Boot Success",
+        "Wait For Maskrom Start", "Wait For Maskrom Success",
+        "Test Device Start", "Test Device Success",
+        "Check Chip Start", "Check Chip Success",
+        "Get FlashInfo Start", "Get FlashInfo Success",
+        "Prepare IDB Start", "Prepare IDB Success",
+        "Download IDB Start", "Download IDB Success",
+        "Download Firmware Start",
+    ]
+    nTarget = nSizeMb * 1024 * 1024
+    with open(strPath, "wb") as objFile:
+        objFile.write(("\r\n".join(lstHeader) + "\r\n").encode("utf-8"))
+        nWritten = 0
+        nStep = 0
+        while nWritten < nTarget:
+            nPercent = (nStep // 50) % 101
+            strStage = "Download Image" if (nStep // 5050) % 2 == 0 else "Check Download Image"
+            byteLine = f"\r{strStage}... ({nPercent}%)".encode("utf-8")
+            objFile.write(byteLine)
+            nWritten += len(byteLine)
+            nStep += 1
+        objFile.write(b"\r\nDownload Firmware Success\r\nUpgrade firmware ok.\r\n")
+
+def legacyReadStream(objStream, lstOutputLines, objEcho):
+    """
+    * Byte-at-a-time reader as used by runCommand before the chunked engine
+    """
+    strCurrentLine = ""
+    while True:
+        byteChar = objStream.read(1)
+        if not byteChar:
+            break
+        strChar = byteChar.decode('utf-8', errors='replace')
+        objEcho.write(strChar)
+        objEcho.flush()
+        if strChar == '\n':
+            if strCurrentLine:
+                lstOutputLines.append(strCurrentLine)
+                strCurrentLine = ""
+        else:
+            strCurrentLine += strChar
+    if strCurrentLine:
+        lstOutputLines.append(strCurrentLine)
+
+def chunkedReadStream(objStream, lstOutputLines, objEcho):
+    """
+    * Chunked reader used by runCommand today
+    """
+    strRemainder = readStreamLines(objStream, lstOutputLines.append, objEcho)
+    if strRemainder:
+        lstOutputLines.append(strRemainder)
+
+def replay(strTranscript, fnReader):
+    """
+    * Replay the transcript through a child process and read it with fnReader
+    *
+    * @param strTranscript Transcript file path
+    * @param fnReader Reader function (stream, output list, echo stream)
+    * @return Tuple (wall seconds, CPU seconds, line count)
+    """
+    with open(os.devnull, "w", encoding="utf-8") as objEcho:
+        lstOutputLines = []
+        fWallStart = time.perf_counter()
+        fCpuStart = time.process_time()
+        objProcess = subprocess.Popen(
+            [sys.executable, "-c", REPLAY_SCRIPT, strTranscript],
+            stdout=subprocess.PIPE,
+            bufsize=0
+        )
+        objThread = threading.Thread(target=fnReader, args=(objProcess.stdout, lstOutputLines, objEcho))
+        objThread.start()
+        objProcess.wait()
+        objThread.join()
+        objProcess.stdout.close()
+        return time.perf_counter() - fWallStart, time.process_time() - fCpuStart, len(lstOutputLines)
+
+def main():
+    objParser = argparse.ArgumentParser(description="runCommand reader benchmark")
+    objParser.add_argument("--transcript", help="Recorded upgrade_tool output to replay")
+    objParser.add_argument("--size-mb", type=int, default=4, help="Size of the synthetic transcript (default: 4)")
+    objArgs = objParser.parse_args()
+
+    strTranscript = objArgs.transcript
+    strTempPath = None
+    if not strTranscript:
+        objTemp = tempfile.NamedTemporaryFile(suffix=".log", delete=False)
+        objTemp.close()
+        strTempPath = strTranscript = objTemp.name
+        writeSyntheticTranscript(strTranscript, objArgs.size_mb)
+    try:
+        fSizeMb = os.path.getsize(strTranscript) / (1024 * 1024)
+        print(f"Transcript: {strTranscript} ({fSizeMb:.2f} MB)")
+        print(f"{'reader':<10} {'wall s':>8} {'MB/s':>9} {'CPU s/MB':>9} {'lines':>8}")
+        for strName, fnReader in (("legacy", legacyReadStream), ("chunked", chunkedReadStream)):
+            fWall, fCpu, nLines = replay(strTranscript, fnReader)
+            print(f"{strName:<10} {fWall:>8.3f} {fSizeMb / fWall:>9.2f} {fCpu / fSizeMb:>9.4f} {nLines:>8}")
+    finally:
+        if strTempPath:
+            os.remove(strTempPath)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+* Benchmark for partition-selective reflash
+* Builds two update.img files that differ only in the boot partition and
+* simulates upgrade_tool writing at a fixed USB rate; compares the full UF of
+* the new image with the selective path (loader + changed partitions + reset)
+*
+* Usage: python benchmarks/bench_selectiveflash.py [--system-mb N] [--rate-mbps R]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fwimage import getImageInfo, getPartitionHashes, writeUpdateImage
+from selectiveflash import buildFlashRecord, planSelectiveFlash, runSelectiveFlash
+
+def buildImage(strPath, nSystemBytes, byteBootFill):
+    def writeSystem(fnWrite):
+        byteChunk = b"S" * (1024 * 1024)
+        for nOffset in range(0, nSystemBytes, len(byteChunk)):
+            fnWrite(byteChunk[:min(len(byteChunk), nSystemBytes - nOffset)])
+    writeUpdateImage(strPath, [
+        ("parameter", b"FIRMWARE_VER:1.0\n" * 64, 17 * 64),
+        ("uboot", b"U" * (4 * 1024 * 1024), 4 * 1024 * 1024),
+        ("boot", byteBootFill * (32 * 1024 * 1024), 32 * 1024 * 1024),
+        ("system", writeSystem, nSystemBytes),
+    ])
+
+def main():
+    objParser = argparse.ArgumentParser(description="selective reflash benchmark")
+    objParser.add_argument("--system-mb", type=int, default=256, help="System partition size in MB (default: 256)")
+    objParser.add_argument("--rate-mbps", type=float, default=40.0,
+                           help="Simulated USB write rate in MB/s (default: 40, USB 2.0 Maskrom)")
+    objArgs = objParser.parse_args()
+    fRate = objArgs.rate_mbps * 1024 * 1024
+    with tempfile.TemporaryDirectory() as strTempDir:
+        strOldPath = os.path.join(strTempDir, "old.img")
+        strNewPath = os.path.join(strTempDir, "new.img")
+        buildImage(strOldPath, objArgs.system_mb * 1024 * 1024, b"A")
+        buildImage(strNewPath, objArgs.system_mb * 1024 * 1024, b"B")
+
+        fStart = time.perf_counter()
+        dictOld = getImageInfo(strOldPath)
+        dictNew = getImageInfo(strNewPath)
+        getPartitionHashes(strOldPath)
+        dictHashes = getPartitionHashes(strNewPath)
+        fIndex = time.perf_counter() - fStart
+        dictRecord = buildFlashRecord(strOldPath, dictOld, getPartitionHashes(strOldPath))
+
+        fStart = time.perf_counter()
+        time.sleep(dictNew["image_length"] / fRate)
+        fFull = time.perf_counter() - fStart
+
+        def runTool(strStep, strArguments):
+            if strStep != "reset":
+                time.sleep(os.path.getsize(strArguments.split()[-1]) / fRate)
+            return True
+        fStart = time.perf_counter()
+        lstChanged, strReason = planSelectiveFlash(dictNew, dictHashes, dictRecord)
+        bOk = runSelectiveFlash(strNewPath, dictNew, lstChanged, runTool,
+                                {"loader": "DB {file}", "partition": "DI -{name} {file}", "reset": "RD"}, strTempDir)
+        fSelective = time.perf_counter() - fStart
+
+    print(f"image {dictNew['image_length'] / 1e6:.0f} MB, {strReason}: {', '.join(lstChanged)}, ok={bOk}")
+    print(f"first-use index + hashing of both images: {fIndex:.2f} s (cached afterwards)")
+    print(f"{'variant':<12} {'flash s':>8}")
+    print(f"{'full UF':<12} {fFull:>8.2f}")
+    print(f"{'selective':<12} {fSelective:>8.2f}")
+    print(f"speedup: {fFull / fSelective:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+* Benchmark for fixture UART round trips against the pty fixture simulator
+* Compares the legacy open/poll/quiet-period transaction with a persistent
+* UartSession that returns on the expected token
+*
+* Usage: python benchmarks/bench_uart.py [--rounds N] [--latency S] [--jitter S]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import serial
+from fixturesim import FixtureSimulator
+from uartsession import UartSession, UART_RESPONSES
+
+BOOT_COMMANDS = ["REQ_INIT", "REQ_BOOT_ON", "REQ_POWER_ON", "REQ_DC_IN", "REQ_BOOT_OFF", "REQ_INIT"]
+
+def legacyTransact(strComPort, strCommand, nTimeout=5):
+    """
+    * Transaction as sendUartCommand did it before the session manager
+    * Opens the port, polls every 10 ms and waits for a 0.5 s quiet period
+    """
+    objSer = serial.Serial(strComPort, 115200, timeout=nTimeout)
+    objSer.reset_input_buffer()
+    objSer.write(strCommand.encode('utf-8'))
+    strResponse = ""
+    fStartTime = time.time()
+    while (time.time() - fStartTime) < nTimeout:
+        if objSer.in_waiting:
+            strResponse += objSer.read(objSer.in_waiting).decode('utf-8', errors='replace')
+        if strResponse and (time.time() - fStartTime) > 0.5:
+            time.sleep(0.5)
+            if not objSer.in_waiting:
+                break
+        time.sleep(0.01)
+    objSer.close()
+    return UART_RESPONSES[strCommand] in strResponse
+
+def measure(fnSend, nRounds):
+    """
+    * Send the ATPFWDL command list nRounds times
+    *
+    * @param fnSend Callable (command) -> success
+    * @param nRounds Number of sequence repetitions
+    * @return Tuple (list of per-command seconds, failures)
+    """
+    lstLatencies = []
+    nFailures = 0
+    for _ in range(nRounds):
+        for strCommand in BOOT_COMMANDS:
+            fStart = time.perf_counter()
+            if not fnSend(strCommand):
+                nFailures += 1
+            lstLatencies.append(time.perf_counter() - fStart)
+    return lstLatencies, nFailures
+
+def report(strName, lstLatencies, nFailures):
+    lstSorted = sorted(lstLatencies)
+    fP95 = lstSorted[int(len(lstSorted) * 0.95) - 1] if len(lstSorted) >= 20 else lstSorted[-1]
+    print(f"{strName:<10} {statistics.mean(lstLatencies) * 1000:>9.1f} {statistics.median(lstLatencies) * 1000:>9.1f} "
+          f"{fP95 * 1000:>9.1f} {sum(lstLatencies) / (len(lstLatencies) / len(BOOT_COMMANDS)):>10.3f} {nFailures:>5}")
+
+def main():
+    objParser = argparse.ArgumentParser(description="UART round-trip benchmark")
+    objParser.add_argument("--rounds", type=int, default=5, help="ATPFWDL command sequences per variant (default: 5)")
+    objParser.add_argument("--latency", type=float, default=0.005, help="Simulated fixture latency in seconds")
+    objParser.add_argument("--jitter", type=float, default=0.002, help="Simulated fixture jitter in seconds")
+    objArgs = objParser.parse_args()
+    with FixtureSimulator(objArgs.latency, objArgs.jitter, nSeed=1) as objSimulator:
+        strPort = objSimulator.strPortName
+        print(f"Simulator on {strPort}, {len(BOOT_COMMANDS)} commands per sequence")
+        print(f"{'variant':<10} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'s/sequence':>10} {'fail':>5}")
+        objNull = open(os.devnull, "w")
+        objSavedStdout = sys.stdout
+        try:
+            sys.stdout = objNull
+            lstLegacy = measure(lambda strCommand: legacyTransact(strPort, strCommand), objArgs.rounds)
+            with UartSession(strPort) as objSession:
+                lstSession = measure(
+                    lambda strCommand: UART_RESPONSES[strCommand] in objSession.sendCommand(strCommand),
+                    objArgs.rounds
+                )
+        finally:
+            sys.stdout = objSavedStdout
+            objNull.close()
+        report("legacy", *lstLegacy)
+        report("session", *lstSession)
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,55 @@
 #!/usr/bin/env python3
 import subprocess
+import hashlib
 import os
 import time
 import sys
+import signal
 import threading
+import atexit
 import serial
 import serial.tools.list_ports
 from datetime import datetime
 import re
 import pyvisa  # 添加 PyVISA 库用于 GPIB 控制
+from streamreader import readStreamLines, OutputMatcher, OutputCapture
+from uartsession import UartSession, getActiveSession, runUartMacro, UART_RESPONSES, UART_SEQUENCES
+from portregistry import objPortRegistry
+from adbsession import getAdbShellSession, closeAdbShellSessions
+from adbclient import AdbError, getAdbClient, getSerialFromPrefix
+from devicetracker import getDeviceTracker
+from scriptcache import DeviceScriptCache, buildScript, getFailedCommands
+from devicelog import fetchDeviceFile, fetchDeviceDir, archiveContains
+from logcatmonitor import LogcatMonitor, LOGCAT_FINISH, LOGCAT_ERROR, LOGCAT_TIMEOUT
+from maskromdetector import MaskromDetector
+from atclient import getAtClient
+from flashscheduler import FlashScheduler, parseDeviceList, JOB_PASS
+from fwimage import getImageInfo, getPartitionHashes
+from imagestage import getImageStagingCache
+from selectiveflash import getFlashRecordStore, planSelectiveFlash, runSelectiveFlash, buildFlashRecord
+from flashprogress import FlashProgress
+from eventlog import openEventLog, logEvent, traceStep
+
+OUTPUT_TAIL_LINES = 500  # Recent output lines kept in memory for long upgrade_tool / IQxel runs
+TIMEOUT_TOTAL = "total"  # CommandResult.strTimeout when the overall deadline expired
+TIMEOUT_IDLE = "idle"    # CommandResult.strTimeout when the command stopped producing output
+TIMEOUT_STALL = "stall"  # CommandResult.strTimeout when fnCheckAbort saw no progress
+UPGRADE_FIRMWARE_FAILURES = [  # Terminal UF failure lines; retry/info lines mentioning "fail" must not end the flash
+    r"(?i)Upgrade firmware fail",
+    r"(?i)Download (Boot|IDB|Image|Firmware) Fail",
+]
+LOG_DURABILITY_SYNC = "sync"        # Logger writes and flushes the log file on every call
+LOG_DURABILITY_BATCHED = "batched"  # Logger hands file writes to a background writer thread
 
 class Logger:
     """
     * Custom logger that outputs to both console and file
     * Handles standard output and error redirection
+    * In batched mode a background thread coalesces file writes into large blocks
+    * and flushes on a time or size threshold, on error lines and at close()
     """
-    def __init__(self, strSerialNumber=None, strLogDir="CT1_LOG"):
+    def __init__(self, strSerialNumber=None, strLogDir="CT1_LOG", strDurability=LOG_DURABILITY_BATCHED,
+                 fFlushInterval=0.5, nFlushBytes=65536):
         self.objTerminal = sys.stdout
         self.objStderrTerminal = sys.stderr
         if not os.path.exists(strLogDir):
@@ -25,39 +59,148 @@ class Logger:
             self.strLogFilename = os.path.join(strLogDir, f"CT1-{strTimestamp}-{strSerialNumber}.log")
         else:
             self.strLogFilename = os.path.join(strLogDir, f"CT1_DL_{strTimestamp}.log")
-        self.objLogFile = open(self.strLogFilename, "w", encoding="utf-8")
+        self.objLogFile = self.openLogFile(self.strLogFilename)
+        self.strDurability = strDurability
+        self.fFlushInterval = fFlushInterval
+        self.nFlushBytes = nFlushBytes
+        self.lstPending = []
+        self.nPendingBytes = 0
+        self.objPendingLock = threading.Lock()
+        self.objWakeEvent = threading.Event()
+        self.bStopping = False
+        self.objWriterThread = None
+        if strDurability == LOG_DURABILITY_BATCHED:
+            self.objWriterThread = threading.Thread(target=self.writerLoop, name="LoggerWriter")
+            self.objWriterThread.daemon = True
+            self.objWriterThread.start()
+            atexit.register(self.close)
         print(f"Logging to file: {self.strLogFilename}")
-        
+
+    def openLogFile(self, strLogFilename):
+        """
+        * Open the log file; separated so tools can wrap the file object
+        *
+        * @param strLogFilename Path of the log file
+        * @return Writable text file object
+        """
+        return open(strLogFilename, "w", encoding="utf-8")
+
+    def writeLog(self, strMessage, bUrgent=False):
+        """
+        * Send text to the log file according to the durability setting
+        * Batched mode only appends to the pending list on the caller's thread;
+        * the writer is woken early for urgent text or a full block
+        *
+        * @param strMessage Text to log
+        * @param bUrgent Flush the batch as soon as this text is written
+        """
+        if self.objWriterThread is not None:
+            with self.objPendingLock:
+                bBatched = self.objWriterThread is not None
+                if bBatched:
+                    self.lstPending.append(strMessage)
+                    self.nPendingBytes += len(strMessage)
+                    bWake = bUrgent or self.nPendingBytes >= self.nFlushBytes
+            if bBatched:
+                if bWake:
+                    self.objWakeEvent.set()
+                return
+        if not self.objLogFile.closed:
+            self.objLogFile.write(strMessage)
+            self.objLogFile.flush()
+
+    def takePending(self):
+        """
+        * Swap the pending list out
+        *
+        * @return Tuple (pending text joined, stop requested)
+        """
+        with self.objPendingLock:
+            lstPending = self.lstPending
+            self.lstPending = []
+            self.nPendingBytes = 0
+            return "".join(lstPending), self.bStopping
+
+    def writerLoop(self):
+        """
+        * Background writer: every flush interval, or when woken, write the pending text as one block
+        """
+        while True:
+            self.objWakeEvent.wait(self.fFlushInterval)
+            self.objWakeEvent.clear()
+            strBlock, bStop = self.takePending()
+            if strBlock:
+                try:
+                    self.objLogFile.write(strBlock)
+                    self.objLogFile.flush()
+                except Exception as e:
+                    self.objStderrTerminal.write(f"Error writing log file: {str(e)}\n")
+            if bStop:
+                return
+
     def write(self, strMessage):
         self.objTerminal.write(strMessage)
-        self.objLogFile.write(strMessage)
-        self.objLogFile.flush()
+        self.writeLog(strMessage, strMessage.lstrip().startswith("Error"))
         
     def flush(self):
         self.objTerminal.flush()
-        self.objLogFile.flush()
+        if self.objWriterThread is None and not self.objLogFile.closed:
+            self.objLogFile.flush()
     
     def stderrWrite(self, strMessage):
         self.objStderrTerminal.write(strMessage)
-        self.objLogFile.write(f"ERROR: {strMessage}")
-        self.objLogFile.flush()
+        self.writeLog(f"ERROR: {strMessage}", True)
         
     def stderrFlush(self):
         self.objStderrTerminal.flush()
-        self.objLogFile.flush()
+        if self.objWriterThread is None and not self.objLogFile.closed:
+            self.objLogFile.flush()
     
     def close(self):
-        self.objLogFile.close()
+        if self.objWriterThread is not None:
+            with self.objPendingLock:
+                self.bStopping = True
+            self.objWakeEvent.set()
+            self.objWriterThread.join()
+            # Later writes (atexit handlers, late threads) go straight to the file
+            with self.objPendingLock:
+                self.objWriterThread = None
+                strBlock = "".join(self.lstPending)
+                self.lstPending = []
+            if strBlock:
+                self.writeLog(strBlock)
+        if not self.objLogFile.closed:
+            self.objLogFile.close()
+
+strTranscriptBase = None  # Station log path without extension, set by setupLogging
 
-def setupLogging(strSerialNumber=None):
+def getTranscriptPath(strName):
+    """
+    * Spill file for the full output of one long command, next to the station log
+    * The in-memory capture keeps only the last OUTPUT_TAIL_LINES lines
+    *
+    * @param strName Short name of the command, e.g. "upgrade_tool" or "iqxel_WiFi"
+    * @return File path, or None when logging has not been set up
+    """
+    if strTranscriptBase is None:
+        return None
+    return f"{strTranscriptBase}-{strName}.txt"
+
+def setupLogging(strSerialNumber=None, strDurability=LOG_DURABILITY_BATCHED):
     """
     * Set up logging to both console and file
     * Configures stdout and stderr redirection
+    * Opens the structured JSONL event log next to the text log
     *
     * @param strSerialNumber Device serial number for log filename
+    * @param strDurability LOG_DURABILITY_BATCHED (background writer, default) or
+    *        LOG_DURABILITY_SYNC (write and flush on every call)
     * @return Logger object
     """
-    objLogger = Logger(strSerialNumber)
+    global strTranscriptBase
+    objLogger = Logger(strSerialNumber, strDurability=strDurability)
+    strTranscriptBase = os.path.splitext(objLogger.strLogFilename)[0]
+    openEventLog(os.path.splitext(objLogger.strLogFilename)[0] + ".jsonl", strSerialNumber)
     sys.stdout = objLogger
     class StderrLogger:
         def write(self, strMessage):
@@ -68,17 +211,76 @@ def setupLogging(strSerialNumber=None):
     sys.stderr = StderrLogger()
     return objLogger
 
-def runCommand(strCommand, strCwd=None):
+class CommandResult:
+    """
+    * Result of runCommand
+    * Unpacks as (lstOutputLines, nReturncode) so existing callers keep working
+    * Carries the streaming matcher verdict and extracted values when a matcher is used
+    * strTimeout is TIMEOUT_TOTAL or TIMEOUT_IDLE when a deadline killed the command
     """
-    * Run command and return results with real-time character output
+    def __init__(self, lstOutputLines, nReturncode, objMatcher=None, bKilled=False, fDuration=0.0, nTotalLines=None,
+                 strTimeout=None):
+        self.lstOutputLines = lstOutputLines
+        self.nTotalLines = len(lstOutputLines) if nTotalLines is None else nTotalLines
+        self.nReturncode = nReturncode
+        self.strVerdict = objMatcher.strVerdict if objMatcher else None
+        self.strVerdictLine = objMatcher.strVerdictLine if objMatcher else None
+        self.dictValues = dict(objMatcher.dictValues) if objMatcher else {}
+        self.bKilled = bKilled
+        self.fDuration = fDuration
+        self.strTimeout = strTimeout
+
+    @property
+    def bTimedOut(self):
+        return self.strTimeout is not None
+
+    def __iter__(self):
+        return iter((self.lstOutputLines, self.nReturncode))
+
+def killProcessTree(objProcess):
+    """
+    * Kill a process started by runCommand together with all of its children
+    * shell=True puts the real tool under a shell, so killing only the shell is not enough
+    *
+    * @param objProcess Popen object to kill
+    """
+    if objProcess.poll() is not None:
+        return
+    try:
+        if os.name == 'nt':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(objProcess.pid)], capture_output=True)
+        else:
+            os.killpg(objProcess.pid, signal.SIGKILL)
+    except Exception as e:
+        print(f"Warning: Failed to kill process tree {objProcess.pid}: {str(e)}", flush=True)
+        objProcess.kill()
+
+def runCommand(strCommand, strCwd=None, objMatcher=None, objCapture=None, fnOnLine=None,
+               fTimeoutSeconds=None, fIdleTimeoutSeconds=None, bEcho=True, fnCheckAbort=None):
+    """
+    * Run command and return results with real-time console output
     * Creates separate threads for stdout and stderr processing
+    * Each thread reads output in bulk chunks through readStreamLines
+    * When a matcher is given, every line is checked as it arrives and the command
+    * returns as soon as a success or failure line is seen (after the matcher's grace period)
+    * Output is kept in an OutputCapture; pass a bounded one to cap memory on long runs
+    * A total deadline and an inactivity deadline kill the whole process tree when hit
     *
     * @param strCommand Command to execute
     * @param strCwd Working directory for command execution
-    * @return Tuple containing output lines and return code
+    * @param objMatcher Optional OutputMatcher with success/failure/extract patterns
+    * @param objCapture Optional OutputCapture (ring buffer / spill file), unbounded by default
+    * @param fnOnLine Optional callback invoked once with every line as it arrives
+    * @param fTimeoutSeconds Total time limit in seconds, None for no limit
+    * @param fIdleTimeoutSeconds Time limit without any output in seconds, None for no limit
+    * @param bEcho Echo the output to the console (off when several commands run in parallel)
+    * @param fnCheckAbort Optional callable polled with the deadlines; a non-None return
+    *        (e.g. TIMEOUT_STALL) kills the command and becomes CommandResult.strTimeout
+    * @return CommandResult (unpacks as output lines and return code)
     """
     print(f"Executing command: {strCommand}", end='', flush=True)
     print() 
+    fStartTime = time.monotonic()
     objProcess = subprocess.Popen(
         strCommand,
         stdout=subprocess.PIPE,
@@ -86,47 +288,110 @@ def runCommand(strCommand, strCwd=None):
         shell=True,
         cwd=strCwd,
         bufsize=0,  
-        universal_newlines=False  
+        universal_newlines=False,
+        start_new_session=(os.name != 'nt')
     )
-    lstOutputLines = []
-    strCurrentLine = ""
+    if objCapture is None:
+        objCapture = OutputCapture()
+    fLastOutputTime = fStartTime
+    def onChunk(nBytes):
+        nonlocal fLastOutputTime
+        fLastOutputTime = time.monotonic()
+    def onLine(strLine):
+        objCapture.append(strLine)
+        if objMatcher is not None:
+            objMatcher.feed(strLine)
+        if fnOnLine is not None:
+            fnOnLine(strLine)
     def readStream(objStream, bIsError=False):
-        while True:
-            byteChar = objStream.read(1)
-            if not byteChar:
-                break
-                
-            try:
-                strChar = byteChar.decode('utf-8', errors='replace')
-                if bIsError:
-                    sys.stderr.write(strChar)
-                    sys.stderr.flush()
-                else:
-                    sys.stdout.write(strChar)
-                    sys.stdout.flush()
-                nonlocal strCurrentLine
-                if strChar == '\n':
-                    if strCurrentLine:
-                        lstOutputLines.append(strCurrentLine)
-                        strCurrentLine = ""
-                else:
-                    strCurrentLine += strChar
-            except Exception as e:
-                print(f"\nError processing output: {str(e)}", flush=True)
+        objEcho = (sys.stderr if bIsError else sys.stdout) if bEcho else None
+        try:
+            strRemainder = readStreamLines(objStream, onLine, objEcho, fnOnChunk=onChunk)
+            if strRemainder:
+                onLine(strRemainder)
+        except Exception as e:
+            print(f"\nError processing output: {str(e)}", flush=True)
+    def checkDeadline():
+        fNow = time.monotonic()
+        if fTimeoutSeconds is not None and fNow - fStartTime > fTimeoutSeconds:
+            return TIMEOUT_TOTAL
+        if fIdleTimeoutSeconds is not None and fNow - fLastOutputTime > fIdleTimeoutSeconds:
+            return TIMEOUT_IDLE
+        if fnCheckAbort is not None:
+            return fnCheckAbort()
+        return None
     objStdoutThread = threading.Thread(target=readStream, args=(objProcess.stdout, False))
     objStderrThread = threading.Thread(target=readStream, args=(objProcess.stderr, True))
     objStdoutThread.daemon = True
     objStderrThread.daemon = True
     objStdoutThread.start()
     objStderrThread.start()
-    nReturncode = objProcess.wait()
+    bKilled = False
+    strTimeout = None
+    if objMatcher is None and fTimeoutSeconds is None and fIdleTimeoutSeconds is None and fnCheckAbort is None:
+        nReturncode = objProcess.wait()
+    else:
+        def killOnDeadline():
+            nonlocal strTimeout, bKilled
+            strTimeout = checkDeadline()
+            if strTimeout is None:
+                return False
+            if strTimeout == TIMEOUT_TOTAL:
+                print(f"\nError: Command exceeded its {fTimeoutSeconds} s time limit, killing it", flush=True)
+            elif strTimeout == TIMEOUT_IDLE:
+                print(f"\nError: Command produced no output for {fIdleTimeoutSeconds} s, killing it", flush=True)
+            else:
+                print(f"\nError: Command aborted ({strTimeout}), killing it", flush=True)
+            killProcessTree(objProcess)
+            bKilled = True
+            return True
+        while objProcess.poll() is None:
+            if objMatcher is not None:
+                if objMatcher.waitVerdict(0.05):
+                    break
+            else:
+                try:
+                    objProcess.wait(timeout=0.05)
+                except subprocess.TimeoutExpired:
+                    pass
+            if killOnDeadline():
+                break
+        if strTimeout is None and objMatcher is not None and objMatcher.strVerdict is not None:
+            print(f"\nMatched {objMatcher.strVerdict} line: {objMatcher.strVerdictLine}", flush=True)
+            fVerdictTime = time.monotonic()
+            # Without a grace period the command may run to its own exit, but the deadlines still apply
+            while objProcess.poll() is None and not killOnDeadline():
+                if objMatcher.fKillGraceSeconds is not None \
+                        and time.monotonic() - fVerdictTime >= objMatcher.fKillGraceSeconds:
+                    print("Stopping command after early verdict", flush=True)
+                    killProcessTree(objProcess)
+                    bKilled = True
+                    break
+                try:
+                    objProcess.wait(timeout=0.05)
+                except subprocess.TimeoutExpired:
+                    pass
+        nReturncode = objProcess.wait()
     objStdoutThread.join(timeout=1.0)
     objStderrThread.join(timeout=1.0)
-    if strCurrentLine:
-        lstOutputLines.append(strCurrentLine)
+    objCapture.close()
+    fDuration = time.monotonic() - fStartTime
+    logEvent(
+        "cmd",
+        cmd=strCommand,
+        rc=nReturncode,
+        dur=round(fDuration, 4),
+        verdict=objMatcher.strVerdict if objMatcher else None,
+        values=dict(objMatcher.dictValues) if objMatcher and objMatcher.dictValues else None,
+        timeout=strTimeout,
+        killed=bKilled or None,
+        lines=objCapture.nTotalLines
+    )
     
-    return lstOutputLines, nReturncode
+    return CommandResult(objCapture.getLines(), nReturncode, objMatcher, bKilled,
+                         fDuration, objCapture.nTotalLines, strTimeout)
 
+@traceStep("device_check")
 def checkDeviceConnection(strToolPath):
     """
     * Check device connection status in Maskrom mode
@@ -137,12 +402,15 @@ def checkDeviceConnection(strToolPath):
     """
     print("=== Checking Device Connection ===", flush=True)
     strCommand = f"{os.path.join(strToolPath, 'upgrade_tool')} LD"
-    lstOutputLines, nReturnCode = runCommand(strCommand, cwd=strToolPath)
-    bDeviceConnected = False
-    for strLine in lstOutputLines:
-        if "DevNo=" in strLine and "Mode=Maskrom" in strLine:
-            bDeviceConnected = True
-            break
+    objMatcher = OutputMatcher(lstSuccess=[r"DevNo=.*Mode=Maskrom"])
+    objResult = runCommand(
+        strCommand,
+        strCwd=strToolPath,
+        objMatcher=objMatcher,
+        fTimeoutSeconds=getStepTimeout("device_check", 20),
+        fIdleTimeoutSeconds=getStepTimeout("device_check_idle", 10)
+    )
+    bDeviceConnected = objResult.strVerdict == "success"
     
     if not bDeviceConnected:
         print("Error: No device detected or device not in Maskrom mode", flush=True)
@@ -151,33 +419,319 @@ def checkDeviceConnection(strToolPath):
     print("Device connection normal, ready for firmware update", flush=True)
     return True
 
-def updateFirmware(strToolPath, strImgPath):
+objMaskromDetector = MaskromDetector()
+
+@traceStep("maskrom_detect")
+def waitForMaskromDevice(strToolPath, nCount=1, objDetector=None):
+    """
+    * Wait for boards to enter Maskrom mode after the boot sequence
+    * On Linux the USB sysfs tree is watched and the wait ends on the hotplug
+    * event; upgrade_tool LD then runs once to confirm the tool sees the board
+    * Hosts without sysfs retry upgrade_tool LD until the deadline
+    *
+    * @param strToolPath Path to the upgrade tool directory
+    * @param nCount Number of boards expected in Maskrom mode
+    * @param objDetector MaskromDetector to use (a fake sysfs tree in tests)
+    * @return Boolean indicating the boards are ready for firmware update
+    """
+    if objDetector is None:
+        objDetector = objMaskromDetector
+    fTimeout = getStepTimeout("maskrom_detect", 10)
+    fStart = time.monotonic()
+    if not objDetector.isAvailable():
+        fDeadline = fStart + fTimeout
+        while not checkDeviceConnection(strToolPath):
+            if time.monotonic() >= fDeadline:
+                return False
+            time.sleep(1)
+        return True
+    print(f"Waiting up to {fTimeout:g} seconds for {nCount} device(s) in Maskrom mode...", flush=True)
+    lstDevices = objDetector.waitForDevices(nCount, fTimeout)
+    fDuration = time.monotonic() - fStart
+    logEvent("maskrom_usb", count=len(lstDevices), locations=[objDevice.strLocation for objDevice in lstDevices],
+             dur=round(fDuration, 3))
+    if len(lstDevices) < nCount:
+        print(f"Error: {len(lstDevices)}/{nCount} device(s) in Maskrom mode after {fTimeout:g} seconds", flush=True)
+        return False
+    print(f"{len(lstDevices)} device(s) in Maskrom mode after {fDuration:.2f} s:", flush=True)
+    for objDevice in lstDevices:
+        print(f"  {objDevice.strLocation} Vid=0x{objDevice.nVid:04x},Pid=0x{objDevice.nPid:04x} "
+              f"Bus={objDevice.nBusNum} Dev={objDevice.nDevNum}", flush=True)
+    return checkDeviceConnection(strToolPath)
+
+def buildUpgradeToolCommand(strToolPath, strArguments, strLocationId=None):
+    """
+    * Build an upgrade_tool command line, addressed to one board when a LocationID is given
+    *
+    * @param strToolPath Path to the upgrade tool directory
+    * @param strArguments upgrade_tool command and its arguments, e.g. "UF update.img"
+    * @param strLocationId upgrade_tool LocationID of the board, None for the only board
+    * @return Command string for runCommand
+    """
+    strCommand = os.path.join(strToolPath, 'upgrade_tool')
+    if strLocationId:
+        strDeviceOption = getConfigSection("flash_scheduler").get("device_option") or "-s {location}"
+        strCommand += " " + strDeviceOption.format(location=strLocationId)
+    return f"{strCommand} {strArguments}"
+
+@traceStep("firmware_update", ["strLocationId"])
+def updateFirmware(strToolPath, strImgPath, strLocationId=None, fnOnLine=None, bEcho=True, objProgress=None):
     """
     * Update device firmware using upgrade tool
     * Flashes the firmware image to the connected device
     *
     * @param strToolPath Path to the upgrade tool directory
     * @param strImgPath Path to the firmware image file
+    * @param strLocationId upgrade_tool LocationID of the board to flash, None for the only board
+    * @param fnOnLine Optional callback invoked with every upgrade_tool output line
+    * @param bEcho Echo the upgrade_tool output to the console
+    * @param objProgress FlashProgress fed with the output, a new one if None; a stalled
+    *        percentage stage (firmware_flash_stall seconds) aborts the flash early
     * @return Boolean indicating firmware update success
     """
-    print("=== Starting Firmware Update ===", flush=True)
+    strPrefix = f"[{strLocationId}] " if strLocationId else ""
+    print(f"=== {strPrefix}Starting Firmware Update ===", flush=True)
     if not os.path.isabs(strImgPath):
         strImgPath = os.path.join(strToolPath, strImgPath)
+    dictImage = getImageInfo(strImgPath)
+    if dictImage is None:
+        print(f"Error: {strPrefix}Refusing to flash an invalid image", flush=True)
+        return False
+    print(f"{strPrefix}Firmware image: version {dictImage['version']}, chip {dictImage['chip']}", flush=True)
     
-    strCommand = f"{os.path.join(strToolPath, 'upgrade_tool')} UF {strImgPath}"
-    lstOutputLines, nReturnCode = runCommand(strCommand, cwd=strToolPath)
-    bUpdateSuccess = False
-    for strLine in lstOutputLines:
-        if "Upgrade firmware ok" in strLine:
-            bUpdateSuccess = True
-            break
-    
-    if bUpdateSuccess:
-        print("Firmware update successful!", flush=True)
-        return True
+    strCommand = buildUpgradeToolCommand(strToolPath, f"UF {strImgPath}", strLocationId)
+    objMatcher = OutputMatcher(
+        lstSuccess=[r"Upgrade firmware ok"],
+        lstFailure=getConfigSection("flash_scheduler").get("uf_failure") or UPGRADE_FIRMWARE_FAILURES,
+        fKillGraceSeconds=5
+    )
+    objCapture = OutputCapture(nMaxLines=OUTPUT_TAIL_LINES,
+                               strSpillPath=getTranscriptPath(f"upgrade_tool-{strLocationId}" if strLocationId
+                                                              else "upgrade_tool"))
+    if objProgress is None:
+        objProgress = FlashProgress(strLocationId=strLocationId)
+    if objProgress.nTotalBytes is None:
+        objProgress.nTotalBytes = dictImage["image_length"]
+    if objProgress.fStallSeconds is None:
+        objProgress.fStallSeconds = getStepTimeout("firmware_flash_stall", 45)
+    def onLine(strLine):
+        objProgress.feed(strLine)
+        if fnOnLine is not None:
+            fnOnLine(strLine)
+    objResult = runCommand(
+        strCommand,
+        strCwd=strToolPath,
+        objMatcher=objMatcher,
+        objCapture=objCapture,
+        fnOnLine=onLine,
+        fTimeoutSeconds=getStepTimeout("firmware_flash", 900),
+        fIdleTimeoutSeconds=getStepTimeout("firmware_flash_idle", 60),
+        bEcho=bEcho,
+        fnCheckAbort=lambda: TIMEOUT_STALL if objProgress.isStalled() else None
+    )
+    bSuccess = False
+    if objResult.strTimeout == TIMEOUT_STALL:
+        print(f"Error: {strPrefix}Firmware update stalled at {objProgress.describe()} "
+              f"for {objProgress.fStallSeconds:g} s, aborted", flush=True)
+    elif objResult.bTimedOut:
+        print(f"Error: {strPrefix}Firmware update timed out ({objResult.strTimeout})", flush=True)
+    elif objResult.strVerdict == "success":
+        print(f"{strPrefix}Firmware update successful!", flush=True)
+        bSuccess = True
+    elif objResult.strVerdict == "failure":
+        print(f"Error: {strPrefix}Firmware update failed: {objResult.strVerdictLine}", flush=True)
     else:
-        print("Error: Firmware update failed", flush=True)
+        print(f"Error: {strPrefix}Firmware update failed", flush=True)
+        if not bEcho:
+            for strLine in objResult.lstOutputLines[-10:]:
+                print(f"{strPrefix}{strLine}", flush=True)
+    objProgress.finish(bSuccess)
+    print(f"{strPrefix}Stage timings:", flush=True)
+    for strLine in objProgress.formatStageTimes():
+        print(f"{strPrefix}  {strLine}", flush=True)
+    logEvent("flash_result", image=os.path.basename(strImgPath), version=dictImage["version"],
+             md5=dictImage.get("md5"), loc=strLocationId, ok=bSuccess, dur=round(objResult.fDuration, 3))
+    return bSuccess
+
+def runUpgradeToolStep(strToolPath, strArguments, strSuccessPattern, strFailurePattern, strLocationId=None):
+    """
+    * Run one short upgrade_tool command (DB/DI/RD) of a selective flash
+    *
+    * @param strToolPath Path to the upgrade tool directory
+    * @param strArguments upgrade_tool command and its arguments
+    * @param strSuccessPattern Regex of the line the tool prints when this command is done
+    * @param strFailurePattern Regex of the line the tool prints when this command has failed
+    * @param strLocationId upgrade_tool LocationID of the board, None for the only board
+    * @return Boolean indicating the tool reported success and exited with code 0
+    """
+    objResult = runCommand(
+        buildUpgradeToolCommand(strToolPath, strArguments, strLocationId),
+        strCwd=strToolPath,
+        objMatcher=OutputMatcher(lstSuccess=[strSuccessPattern], lstFailure=[strFailurePattern], fKillGraceSeconds=5),
+        objCapture=OutputCapture(nMaxLines=OUTPUT_TAIL_LINES),
+        fTimeoutSeconds=getStepTimeout("firmware_flash", 900),
+        fIdleTimeoutSeconds=getStepTimeout("firmware_flash_idle", 60)
+    )
+    return not objResult.bTimedOut and objResult.strVerdict == "success" and objResult.nReturncode == 0
+
+@traceStep("firmware_flash", ["strSerialNumber"])
+def flashFirmware(strToolPath, strImgPath, strSerialNumber=None, strLocationId=None):
+    """
+    * Flash the firmware, writing only the partitions that changed when possible
+    * With selective_flash enabled and a known serial, the partition hashes of the
+    * image are compared with the record of what the board last received; unchanged
+    * partitions are skipped. A new loader, chip or partition table, a missing record
+    * or a failed selective write fall back to the full updateFirmware
+    *
+    * @param strToolPath Path to the upgrade tool directory
+    * @param strImgPath Path to the firmware image file
+    * @param strSerialNumber Device serial number the flash record is kept under
+    * @param strLocationId upgrade_tool LocationID of the board to flash, None for the only board
+    * @return Boolean indicating firmware update success
+    """
+    dictConfig = getConfigSection("selective_flash")
+    if not dictConfig.get("enabled") or not strSerialNumber:
+        return updateFirmware(strToolPath, strImgPath, strLocationId)
+    if not os.path.isabs(strImgPath):
+        strImgPath = os.path.join(strToolPath, strImgPath)
+    dictImage = getImageInfo(strImgPath)
+    if dictImage is None:
+        print("Error: Refusing to flash an invalid image", flush=True)
         return False
+    dictHashes = getPartitionHashes(strImgPath)
+    objStore = getFlashRecordStore(dictConfig.get("record_file") or "./ct1_flash_records.json")
+    if dictHashes is not None:
+        lstChanged, strReason = planSelectiveFlash(dictImage, dictHashes, objStore.get(strSerialNumber))
+        if lstChanged is None:
+            print(f"Full flash of {strSerialNumber}: {strReason}", flush=True)
+        else:
+            print(f"=== Selective flash of {strSerialNumber}: {strReason} "
+                  f"({', '.join(lstChanged) or 'nothing to write'}) ===", flush=True)
+            dictCommands = {
+                "loader": dictConfig.get("loader_command") or "DB {file}",
+                "partition": dictConfig.get("partition_command") or "DI -{name} {file}",
+                "reset": dictConfig.get("reset_command") or "RD",
+            }
+            dictSuccess = {
+                "loader": dictConfig.get("loader_success") or r"(?i)download boot ok",
+                "partition": dictConfig.get("partition_success") or r"(?i)download image ok",
+                "reset": dictConfig.get("reset_success") or r"(?i)reset device ok",
+            }
+            dictFailure = {
+                "loader": dictConfig.get("loader_failure") or r"(?i)download boot fail",
+                "partition": dictConfig.get("partition_failure") or r"(?i)download image fail",
+                "reset": dictConfig.get("reset_failure") or r"(?i)reset device fail",
+            }
+            fStart = time.monotonic()
+            bSuccess = runSelectiveFlash(
+                strImgPath, dictImage, lstChanged,
+                lambda strStep, strArguments: runUpgradeToolStep(strToolPath, strArguments, dictSuccess[strStep],
+                                                                 dictFailure[strStep], strLocationId),
+                dictCommands, dictConfig.get("work_dir")
+            )
+            logEvent("flash_result", image=os.path.basename(strImgPath), version=dictImage["version"],
+                     md5=dictImage.get("md5"), loc=strLocationId, ok=bSuccess, mode="selective",
+                     partitions=lstChanged, dur=round(time.monotonic() - fStart, 3))
+            if bSuccess:
+                print(f"Selective flash successful in {time.monotonic() - fStart:.1f} s", flush=True)
+                objStore.put(strSerialNumber, buildFlashRecord(strImgPath, dictImage, dictHashes))
+                return True
+            print("Warning: Selective flash failed, falling back to a full flash", flush=True)
+    objStore.put(strSerialNumber, None)
+    if not updateFirmware(strToolPath, strImgPath, strLocationId):
+        return False
+    if dictHashes is not None:
+        objStore.put(strSerialNumber, buildFlashRecord(strImgPath, dictImage, dictHashes))
+    return True
+
+@traceStep("image_stage", ["strImage"])
+def stageFirmwareImage(strImage):
+    """
+    * Resolve --image to a verified local copy in the staging cache (image_cache section)
+    * A configured name is staged from its source path; any other value is taken as
+    * an image path and staged as <directory name>-<hash of the absolute path>
+    *
+    * @param strImage Image name from image_cache.images, or a path to an update.img
+    * @return Local image path, or None on failure
+    """
+    dictConfig = getConfigSection("image_cache")
+    dictImages = dictConfig.get("images") or {}
+    # An image staged or reused this recently may still be on its way through another station's flash
+    fInUseSeconds = getStepTimeout("maskrom_detect", 10) + getStepTimeout("firmware_flash", 900)
+    objCache = getImageStagingCache(dictConfig.get("dir") or "./image_cache",
+                                    int(float(dictConfig.get("max_gb") or 40) * 1024 ** 3), fInUseSeconds)
+    if strImage in dictImages:
+        return objCache.stage(strImage, dictImages[strImage])
+    if os.path.isfile(strImage):
+        # Every build is called update.img, so the name also carries its directory and a hash of the full path
+        strAbsPath = os.path.abspath(strImage)
+        strDirName = re.sub(r"[^\w.-]", "_", os.path.basename(os.path.dirname(strAbsPath))) or "image"
+        strName = f"{strDirName}-{hashlib.sha1(strAbsPath.encode('utf-8')).hexdigest()[:8]}"
+        return objCache.stage(strName, strImage)
+    strLocalPath = objCache.stage(strImage)
+    if strLocalPath is None:
+        print(f"Configured images: {', '.join(sorted(dictImages)) or 'none'}", flush=True)
+        for strName, dictEntry in objCache.listImages():
+            print(f"  staged {strName}: version {dictEntry.get('version')}, {dictEntry['size'] / 1e9:.2f} GB", flush=True)
+    return strLocalPath
+
+def listRockusbDevices(strToolPath):
+    """
+    * List the boards upgrade_tool can see
+    *
+    * @param strToolPath Path to the upgrade tool directory
+    * @return List of RockusbDevice (empty when none or when LD fails)
+    """
+    objResult = runCommand(
+        buildUpgradeToolCommand(strToolPath, "LD"),
+        strCwd=strToolPath,
+        fTimeoutSeconds=getStepTimeout("device_check", 20),
+        fIdleTimeoutSeconds=getStepTimeout("device_check_idle", 10)
+    )
+    return parseDeviceList(objResult.lstOutputLines)
+
+@traceStep("flash_all")
+def flashAllDevices(strToolPath, strImgPath, nMaxParallel=None):
+    """
+    * Flash every board that upgrade_tool lists in Maskrom mode, in parallel
+    * Each board is addressed by its LocationID; at most max_parallel flashes
+    * (flash_scheduler section) run at once and progress is reported per board
+    *
+    * @param strToolPath Path to the upgrade tool directory
+    * @param strImgPath Path to the firmware image file
+    * @param nMaxParallel Concurrency cap, the configured max_parallel if None
+    * @return Boolean indicating every board flashed successfully
+    """
+    dictConfig = getConfigSection("flash_scheduler")
+    dictImage = getImageInfo(strImgPath if os.path.isabs(strImgPath) else os.path.join(strToolPath, strImgPath))
+    if dictImage is None:
+        return False
+    if nMaxParallel is None:
+        nMaxParallel = dictConfig.get("max_parallel") or 4
+    lstDevices = [objDevice for objDevice in listRockusbDevices(strToolPath) if objDevice.strMode == "Maskrom"]
+    if not lstDevices:
+        print("Error: No device in Maskrom mode", flush=True)
+        return False
+    print(f"=== Flashing {len(lstDevices)} device(s) with version {dictImage['version']}, "
+          f"up to {nMaxParallel} at a time ===", flush=True)
+    for objDevice in lstDevices:
+        print(f"  DevNo={objDevice.nDevNo} LocationID={objDevice.strLocationId} Pid=0x{objDevice.nPid:04x}", flush=True)
+    objScheduler = FlashScheduler(
+        lambda objDevice, objProgress: updateFirmware(strToolPath, strImgPath, objDevice.strLocationId,
+                                                      bEcho=False, objProgress=objProgress),
+        nMaxParallel,
+        float(dictConfig.get("report_interval") or 5.0)
+    )
+    fStart = time.monotonic()
+    lstJobs = objScheduler.run(lstDevices)
+    fWall = time.monotonic() - fStart
+    print("=== Flash Summary ===", flush=True)
+    for objJob in lstJobs:
+        print(f"  {objJob.objDevice.strLocationId}: {objJob.strState.upper()} ({objJob.fDuration:.1f} s)", flush=True)
+    nPassed = sum(1 for objJob in lstJobs if objJob.strState == JOB_PASS)
+    fSerial = sum(objJob.fDuration for objJob in lstJobs)
+    print(f"{nPassed}/{len(lstJobs)} passed in {fWall:.1f} s wall time ({fSerial:.1f} s of flashing)", flush=True)
+    return nPassed == len(lstJobs)
 
 def listComPorts():
     """
@@ -187,14 +741,14 @@ def listComPorts():
     * @return List of available COM ports
     """
     print("=== Available COM Ports ===", flush=True)
-    lstPorts = list(serial.tools.list_ports.comports())
+    lstPorts = objPortRegistry.refresh()
     
     if not lstPorts:
         print("No COM ports available", flush=True)
         return []
     
     for nIdx, objPort in enumerate(lstPorts):
-        print(f"{nIdx+1}. {objPort.device} - {objPort.description}", flush=True)
+        print(f"{nIdx+1}. {objPort.device} - {objPort.description} (location: {objPort.location})", flush=True)
     
     return lstPorts
 
@@ -202,24 +756,52 @@ def getComPortByNumber(nComNumber):
     """
     * Get COM port from port number
     * Converts number (e.g., 3) to device name (e.g., COM3)
+    * Served from the cached port registry instead of enumerating every call
     *
     * @param nComNumber COM port number
     * @return COM port device name or None if not found
     """
     strPortName = f"COM{nComNumber}"
-    lstPorts = list(serial.tools.list_ports.comports())
+    objPort = objPortRegistry.getByDevice(strPortName)
+    if objPort is not None:
+        return objPort.device
     
-    for objPort in lstPorts:
-        if objPort.device.upper() == strPortName.upper():
-            return objPort.device
+    return None
+
+def findComPort(strLocation=None, strSerialNumber=None, nVid=None, nPid=None):
+    """
+    * Find a fixture serial port by a stable USB identity instead of its COM number
+    * Criteria are tried in order: physical location, USB serial number, VID/PID
+    *
+    * @param strLocation USB physical location (e.g. 1-1.2:1.0)
+    * @param strSerialNumber USB serial number of the adapter
+    * @param nVid USB vendor id (used together with nPid)
+    * @param nPid USB product id
+    * @return Device name or None if not found or the VID/PID is ambiguous
+    """
+    objPort = None
+    if strLocation:
+        objPort = objPortRegistry.getByLocation(strLocation)
+    elif strSerialNumber:
+        objPort = objPortRegistry.getBySerialNumber(strSerialNumber)
+    elif nVid is not None and nPid is not None:
+        lstPorts = objPortRegistry.getByVidPid(nVid, nPid)
+        if len(lstPorts) > 1:
+            print(f"Error: {len(lstPorts)} ports match VID:PID {nVid:04X}:{nPid:04X}, bind by location instead", flush=True)
+            return None
+        objPort = lstPorts[0] if lstPorts else None
+    if objPort is not None:
+        return objPort.device
     
     return None
 
+@traceStep("uart", ["strCommand"])
 def sendUartCommand(strComPort, strCommand, nBaudrate=115200, nTimeout=5, bWaitForResponse=True):
     """
     * Send a single command via UART and return success status
     * Manages serial port communication with the device
     * Automatically checks if response matches expected value
+    * Reuses the station's open UartSession for the port, otherwise opens the port for this command
     *
     * @param strComPort COM port device name
     * @param strCommand Command to send
@@ -229,48 +811,15 @@ def sendUartCommand(strComPort, strCommand, nBaudrate=115200, nTimeout=5, bWaitF
     * @return Boolean indicating success or failure of command
     """
     print(f"Sending UART command: {strCommand}", flush=True)
-    strExpectedResponse = None
-    if strCommand == "REQ_DC_IN":
-        strExpectedResponse = "RES_DC_IN_OK"
-    elif strCommand == "REQ_DC_OUT":
-        strExpectedResponse = "RES_DC_OUT_OK"
-    elif strCommand == "REQ_POWER_ON":
-        strExpectedResponse = "RES_POWER_ON_OK"
-    elif strCommand == "REQ_POWER_OFF":
-        strExpectedResponse = "RES_POWER_OFF_OK"
-    elif strCommand == "REQ_BOOT_ON":
-        strExpectedResponse = "RES_BOOT_ON_OK"
-    elif strCommand == "REQ_BOOT_OFF":
-        strExpectedResponse = "RES_BOOT_OFF_OK"
-    elif strCommand == "REQ_INIT":
-        strExpectedResponse = "RES_INIT_OK"
+    strExpectedResponse = UART_RESPONSES.get(strCommand)
     
     try:
-        objSer = serial.Serial(strComPort, nBaudrate, timeout=nTimeout)
-        objSer.reset_input_buffer()
-        objSer.write((strCommand).encode('utf-8'))
-        
-        strResponse = ""
-        if bWaitForResponse:
-            fStartTime = time.time()
-            while (time.time() - fStartTime) < nTimeout:
-                if objSer.in_waiting:
-                    objData = objSer.read(objSer.in_waiting)
-                    try:
-                        strDataStr = objData.decode('utf-8', errors='replace')
-                        strResponse += strDataStr
-                        sys.stdout.write(strDataStr)
-                        sys.stdout.flush()
-                    except Exception as e:
-                        print(f"\nError decoding data: {str(e)}", flush=True)
-                if strResponse and (time.time() - fStartTime) > 0.5:
-                    time.sleep(0.5)
-                    if not objSer.in_waiting:
-                        break
-                
-                time.sleep(0.01)
-    
-        objSer.close()
+        objSession = getActiveSession(strComPort)
+        if objSession is not None:
+            strResponse = objSession.sendCommand(strCommand, nTimeout, bWaitForResponse, strExpectedResponse)
+        else:
+            with UartSession(strComPort, nBaudrate, nTimeout) as objSession:
+                strResponse = objSession.sendCommand(strCommand, nTimeout, bWaitForResponse, strExpectedResponse)
         if strExpectedResponse:
             if strExpectedResponse in strResponse:
                 print(f"Success: Received expected response: {strExpectedResponse}", flush=True)
@@ -283,58 +832,273 @@ def sendUartCommand(strComPort, strCommand, nBaudrate=115200, nTimeout=5, bWaitF
         print(f"Error in UART communication: {str(e)}", flush=True)
         return False
 
+@traceStep("uart_sequence", ["strSequenceName"])
+def runUartSequence(strComPort, strSequenceName, nTimeout=5):
+    """
+    * Run a named fixture command sequence with per-step acknowledgement
+    * Steps come from the uart_sequences section of CT1.yaml, falling back to UART_SEQUENCES
+    *
+    * @param strComPort COM port device name
+    * @param strSequenceName Sequence name (e.g. "atpfwdl_boot")
+    * @param nTimeout Per-step response timeout in seconds
+    * @return Boolean indicating every step was acknowledged
+    """
+    lstEntries = getConfigSection("uart_sequences").get(strSequenceName) or UART_SEQUENCES.get(strSequenceName)
+    if not lstEntries:
+        print(f"Error: Unknown UART sequence: {strSequenceName}", flush=True)
+        return False
+    print(f"Running UART sequence: {strSequenceName}", flush=True)
+    try:
+        objSession = getActiveSession(strComPort)
+        if objSession is not None:
+            bOk, lstTimings = runUartMacro(objSession, lstEntries, nTimeout)
+        else:
+            with UartSession(strComPort, nTimeout=nTimeout) as objSession:
+                bOk, lstTimings = runUartMacro(objSession, lstEntries, nTimeout)
+    except serial.SerialException as e:
+        print(f"Error in UART communication: {str(e)}", flush=True)
+        return False
+    strSummary = ", ".join(f"{d['command']} {d['latency'] * 1000:.0f} ms" for d in lstTimings)
+    print(f"UART sequence {strSequenceName}: {strSummary}", flush=True)
+    return bOk
+
+def adbRoot(lstAdbPrefix):
+    """
+    * Restart adbd with root permissions if it is not running as root yet
+    * adbd restarts drop open shell sessions, so those are closed and the
+    * device is awaited before the next command
+    *
+    * @param lstAdbPrefix ADB command prefix
+    * @return Boolean indicating the root command succeeded
+    """
+    objResult = subprocess.run(lstAdbPrefix + ["root"], capture_output=True, text=True)
+    if "already running as root" not in objResult.stdout + objResult.stderr:
+        print("Wait for a while to get root access...")
+        closeAdbShellSessions()
+        objTracker = getDeviceTracker(getAdbClient(lstAdbPrefix[0]))
+        if objTracker is not None:
+            objTracker.waitForReconnect(getSerialFromPrefix(lstAdbPrefix))
+        else:
+            time.sleep(1)
+            subprocess.run(lstAdbPrefix + ["wait-for-device"], capture_output=True, text=True)
+    return objResult.returncode == 0
+
+def listAdbDevices():
+    """
+    * List attached ADB devices, like `adb devices`
+    * Asks the adb server directly when it is reachable, otherwise runs adb
+    *
+    * @return List of (serial, state) tuples
+    """
+    objClient = getAdbClient()
+    if objClient is not None:
+        try:
+            return objClient.getDevices()
+        except (AdbError, OSError) as e:
+            print(f"Warning: adb server query failed, falling back to adb: {str(e)}")
+    strDevicesOutput = subprocess.run(['adb', 'devices'], capture_output=True, text=True).stdout
+    lstDevices = []
+    for strLine in strDevicesOutput.strip().split('\n')[1:]:
+        lstParts = strLine.split()
+        if len(lstParts) >= 2:
+            lstDevices.append((lstParts[0], lstParts[1]))
+    return lstDevices
+
+def adbPush(lstAdbPrefix, strLocalPath, strRemotePath):
+    """
+    * Copy a host file to the device, like `adb push`
+    *
+    * @param lstAdbPrefix ADB command prefix
+    * @param strLocalPath Host file path
+    * @param strRemotePath Device file path, or a directory ending in /
+    * @return Boolean indicating success
+    """
+    objClient = getAdbClient(lstAdbPrefix[0])
+    if objClient is not None:
+        try:
+            objClient.push(getSerialFromPrefix(lstAdbPrefix), strLocalPath, strRemotePath)
+            return True
+        except (AdbError, OSError) as e:
+            print(f"Error: push {strLocalPath} failed: {str(e)}")
+            return False
+    objResult = subprocess.run(lstAdbPrefix + ["push", strLocalPath, strRemotePath], capture_output=True, text=True)
+    if objResult.returncode != 0:
+        print(f"Error: push {strLocalPath} failed: {objResult.stderr}")
+    return objResult.returncode == 0
+
+def adbPull(lstAdbPrefix, strRemotePath, strLocalPath):
+    """
+    * Copy a device file to the host, like `adb pull`
+    *
+    * @param lstAdbPrefix ADB command prefix
+    * @param strRemotePath Device file path
+    * @param strLocalPath Host file path
+    * @return Boolean indicating success
+    """
+    objClient = getAdbClient(lstAdbPrefix[0])
+    if objClient is not None:
+        try:
+            objClient.pull(getSerialFromPrefix(lstAdbPrefix), strRemotePath, strLocalPath)
+            return True
+        except (AdbError, OSError) as e:
+            print(f"Error: pull {strRemotePath} failed: {str(e)}")
+            return False
+    objResult = subprocess.run(lstAdbPrefix + ["pull", strRemotePath, strLocalPath], capture_output=True, text=True)
+    if "1 file pulled" not in objResult.stderr + objResult.stdout:
+        print(f"Error: pull {strRemotePath} failed: {objResult.stderr}")
+        return False
+    return True
+
+def getScriptCache(lstAdbPrefix):
+    """
+    * Device script cache for an ADB prefix, running over the shared shell session
+    *
+    * @param lstAdbPrefix ADB command prefix
+    * @return DeviceScriptCache
+    """
+    return DeviceScriptCache(
+        getAdbShellSession(lstAdbPrefix),
+        lambda strLocalPath, strRemotePath: adbPush(lstAdbPrefix, strLocalPath, strRemotePath)
+    )
+
+strSelectedAdbDevice = None
+
+def selectAdbDevice(strDeviceId):
+    """
+    * Pin the ADB device that every step of this run talks to
+    *
+    * @param strDeviceId ADB device ID, or None to auto-detect on the next check
+    """
+    global strSelectedAdbDevice
+    strSelectedAdbDevice = strDeviceId
+
+def waitForAdbDeviceByCommand(strDeviceId, fTimeout):
+    """
+    * Fallback device wait when the adb server cannot be tracked: blocks in
+    * `adb wait-for-device`, then reads the device list once
+    *
+    * @param strDeviceId Device ID to wait for, or None for any device
+    * @param fTimeout Maximum seconds to wait
+    * @return Device ID of the online device, or None
+    """
+    lstWaitCmd = ['adb'] + (['-s', strDeviceId] if strDeviceId else []) + ['wait-for-device']
+    try:
+        subprocess.run(lstWaitCmd, capture_output=True, text=True, timeout=fTimeout)
+    except subprocess.TimeoutExpired:
+        return None
+    for strSerial, strState in listAdbDevices():
+        if strState != 'device':
+            continue
+        if strSerial == strDeviceId or (not strDeviceId and 'emulator' not in strSerial):
+            return strSerial
+    return None
+
+@traceStep("adb_device")
 def checkAndGetAdbDevice(strDeviceId=None, nMaxRetries=30):
     """
     * Check for available ADB devices and select one to use
     * Attempts to detect the specified device or auto-detect an available one
+    * Waits on adb server device events, so a device is picked up as soon as it
+    * comes online; the chosen device is reused by later calls in the same run
     *
     * @param strDeviceId Specific device ID to look for (optional)
-    * @param nMaxRetries Maximum number of retry attempts
+    * @param nMaxRetries Maximum seconds to wait for the device
     * @return Tuple (success status, device ID if found, ADB command prefix)
     """
-    print("Waiting for device to be available on ADB...")
-    bAdbDeviceReady = False
-    nRetryCount = 0
-    
-    while not bAdbDeviceReady and nRetryCount < nMaxRetries:
-        try:
-            lstAdbDevicesCmd = ['adb', 'devices']
-            strDevicesOutput = subprocess.run(lstAdbDevicesCmd, capture_output=True, text=True).stdout
-            if strDeviceId:
-                bAdbDeviceReady = strDeviceId in strDevicesOutput
-            else:
-                lstLines = strDevicesOutput.strip().split('\n')
-                for strLine in lstLines[1:]: 
-                    if strLine and 'device' in strLine and 'emulator' not in strLine:
-                        bAdbDeviceReady = True
-                        if not strDeviceId:
-                            strDeviceId = strLine.split()[0]
-                            print(f"Auto-detected device: {strDeviceId}")
-                            break
-            
-            if bAdbDeviceReady:
-                print("Device is available on ADB")
-                break
-                
-            print(".", end="", flush=True)
-            time.sleep(1)
-            nRetryCount += 1
-            
-        except Exception as e:
-            print(f"Error checking ADB device: {str(e)}")
-            time.sleep(1)
-            nRetryCount += 1
+    global strSelectedAdbDevice
+    if not strDeviceId:
+        strDeviceId = strSelectedAdbDevice
+    try:
+        objTracker = getDeviceTracker(getAdbClient())
+        if objTracker is not None:
+            strReadyDevice = objTracker.waitForDevice(strDeviceId, 0)
+            if not strReadyDevice:
+                print("Waiting for device to be available on ADB...")
+                strReadyDevice = objTracker.waitForDevice(strDeviceId, nMaxRetries)
+        else:
+            print("Waiting for device to be available on ADB...")
+            strReadyDevice = waitForAdbDeviceByCommand(strDeviceId, nMaxRetries)
+    except Exception as e:
+        print(f"Error checking ADB device: {str(e)}")
+        strReadyDevice = None
     
-    if not bAdbDeviceReady:
+    if not strReadyDevice:
         print("\nError: Device not available on ADB after waiting")
         return False, None, None
-    lstAdbPrefix = ['adb']
-    if strDeviceId:
-        lstAdbPrefix.extend(['-s', strDeviceId])
+    if strReadyDevice != strSelectedAdbDevice:
+        if not strDeviceId:
+            print(f"Auto-detected device: {strReadyDevice}")
+        print("Device is available on ADB")
+        strSelectedAdbDevice = strReadyDevice
+    lstAdbPrefix = ['adb', '-s', strReadyDevice]
     
-    return True, strDeviceId, lstAdbPrefix
+    return True, strReadyDevice, lstAdbPrefix
+
+ATP_PACKAGE = "com.rtk.ct1atptest"
+ATP_RECEIVER = "com.rtk.ct1atptest/.domain.TestControlReceiver"
+ATP_ACTION = "com.rtk.ct1atptest.PCATP"
+ATP_FAILURE_PATTERNS = [  # Logcat lines that end the completion wait as failed instead of running into the timeout
+    r"ATP Test Fail",
+    r"Process: com\.rtk\.ct1atptest, PID",  # line after "FATAL EXCEPTION" when the ATP app itself crashes
+    r"ANR in com\.rtk\.ct1atptest",
+]
+
+@traceStep("boot_ready", ["strTimeoutKey"])
+def waitForBootReady(strDeviceId=None, strTimeoutKey="boot_ready_power_on", fDefaultTimeout=90,
+                     fInitialPoll=0.25, fMaxPoll=2.0):
+    """
+    * Wait until the DUT has booted far enough to run the ATP test
+    * Replaces fixed post-flash/post-power-on sleeps: waits for the ADB device,
+    * then polls sys.boot_completed, the package manager and the ATP test receiver
+    * in one shell round-trip per poll, with the poll interval backing off
+    *
+    * @param strDeviceId ADB device ID if multiple devices connected
+    * @param strTimeoutKey Key in the timeouts section holding the upper bound in seconds
+    * @param fDefaultTimeout Upper bound used when the key is missing
+    * @param fInitialPoll First poll interval in seconds
+    * @param fMaxPoll Largest poll interval in seconds
+    * @return Boolean indicating the device is ready
+    """
+    fTimeout = getStepTimeout(strTimeoutKey, fDefaultTimeout)
+    fStart = time.monotonic()
+    fDeadline = fStart + fTimeout
+    print(f"Waiting up to {fTimeout:g} seconds for the device to be ready...", flush=True)
+    bAdbDeviceReady, strDeviceId, lstAdbPrefix = checkAndGetAdbDevice(strDeviceId, nMaxRetries=fTimeout)
+    if not bAdbDeviceReady:
+        print("Error: Device did not appear on ADB", flush=True)
+        return False
+    fAdbTime = time.monotonic() - fStart
+    strProbe = (
+        f'if [ "$(getprop sys.boot_completed)" != "1" ]; then echo READY=boot; '
+        f'elif ! pm path {ATP_PACKAGE} 2>/dev/null | grep -q package:; then echo READY=pm; '
+        f'elif ! {{ cmd package query-receivers --brief -a {ATP_ACTION} 2>/dev/null | grep -q TestControlReceiver || '
+        f'dumpsys package {ATP_PACKAGE} 2>/dev/null | grep -q TestControlReceiver; }}; then echo READY=receiver; '
+        f'else echo READY=ok; fi'
+    )
+    objShell = getAdbShellSession(lstAdbPrefix)
+    fPoll = fInitialPoll
+    strStage = None
+    while True:
+        nStatus, strOutput = objShell.run(strProbe, max(1.0, min(10.0, fDeadline - time.monotonic())))
+        objMatch = re.search(r"READY=(\w+)", strOutput or "")
+        strNewStage = objMatch.group(1) if objMatch else "adb"
+        if strNewStage != strStage:
+            strStage = strNewStage
+            print(f"Boot readiness: {strStage} ({time.monotonic() - fStart:.1f} s)", flush=True)
+        if strStage == "ok":
+            fTotal = time.monotonic() - fStart
+            logEvent("boot_ready", adb=round(fAdbTime, 3), dur=round(fTotal, 3), timeout=fTimeout)
+            print(f"Device ready after {fTotal:.1f} s", flush=True)
+            return True
+        fRemaining = fDeadline - time.monotonic()
+        if fRemaining <= 0:
+            print(f"Error: Device not ready after {fTimeout:g} seconds (waiting on: {strStage})", flush=True)
+            return False
+        time.sleep(min(fPoll, fRemaining))
+        fPoll = min(fPoll * 1.5, fMaxPoll)
 
-def waitForTestCompletion(strSerialNumber, strStationName, strDeviceId=None, nTimeoutSeconds=300):
+@traceStep("test_completion", ["strStationName"])
+def waitForTestCompletion(strSerialNumber, strStationName, strDeviceId=None, nTimeoutSeconds=None):
     """
     * Wait for test completion and pull log files from device
     * Monitors device via ADB and retrieves test result logs
@@ -342,14 +1106,16 @@ def waitForTestCompletion(strSerialNumber, strStationName, strDeviceId=None, nTi
     * @param strSerialNumber Device serial number
     * @param strStationName Test station name
     * @param strDeviceId ADB device ID if multiple devices connected
-    * @param nTimeoutSeconds Maximum time to wait for test completion
+    * @param nTimeoutSeconds Maximum time to wait for test completion, timeouts.test_completion if None
     * @return Boolean indicating test success
     """
     if not strSerialNumber:
         strSerialNumber = "00000000000"
+    if nTimeoutSeconds is None:
+        nTimeoutSeconds = getStepTimeout("test_completion", 300)
     
     print(f"Waiting for test completion... (Serial: {strSerialNumber}, Station: {strStationName})")
-    print(f"Timeout set to {nTimeoutSeconds} seconds")
+    print(f"Timeout set to {nTimeoutSeconds:g} seconds")
     strLogDir = os.path.join(os.getcwd(), "CT1_LOG")
     if not os.path.exists(strLogDir):
         os.makedirs(strLogDir)
@@ -357,89 +1123,74 @@ def waitForTestCompletion(strSerialNumber, strStationName, strDeviceId=None, nTi
     bAdbDeviceReady, strDeviceId, lstAdbPrefix = checkAndGetAdbDevice(strDeviceId)
     if not bAdbDeviceReady:
         return False
-    subprocess.run(lstAdbPrefix + ["shell", f"svc wifi enable"], capture_output=True, text=True)
-    subprocess.run(lstAdbPrefix + ["shell", f"svc bluetooth enable"], capture_output=True, text=True)
+    objShell = getAdbShellSession(lstAdbPrefix)
+    objShell.run("svc wifi enable")
+    objShell.run("svc bluetooth enable")
     try:
         print("Setting up logcat monitoring...")
-        subprocess.run(lstAdbPrefix + ['logcat', '-c'], check=True)
-        lstLogcatCmd = lstAdbPrefix + ['logcat', '-v', 'time', 'CT1Broadcast:D', '*:S']
-        objProcess = subprocess.Popen(
-            lstLogcatCmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
+        objShell.run('logcat -c')
+        dictLogcat = getConfigSection("logcat")
+        objMonitor = LogcatMonitor(
+            lstAdbPrefix,
+            ['CT1Broadcast:D', 'AndroidRuntime:E', 'ActivityManager:E', '*:S'],
+            bDeviceFilter=dictLogcat.get("device_filter", True)
         )
+        objMonitor.addPattern(r"ATP Test Finish!!", LOGCAT_FINISH)
+        for strPattern in dictLogcat.get("failure_patterns") or ATP_FAILURE_PATTERNS:
+            objMonitor.addPattern(strPattern, LOGCAT_ERROR)
+        objMonitor.start()
         
         print("Logcat monitoring started.")
         print("Sending test broadcast command...")
-        lstBroadcastCmd = lstAdbPrefix + [
-            'shell', 
-            'am', 'broadcast', 
-            '-n', 'com.rtk.ct1atptest/.domain.TestControlReceiver', 
-            '-a', 'com.rtk.ct1atptest.PCATP', 
-            '--es', 'SerialNumber', strSerialNumber, 
-            '--es', 'StationName', strStationName
-        ]
-        
-        objBroadcastResult = subprocess.run(lstBroadcastCmd, capture_output=True, text=True)
-        if "Broadcast completed" not in objBroadcastResult.stdout:
+        strBroadcastCmd = (
+            "am broadcast"
+            f" -n {ATP_RECEIVER}"
+            f" -a {ATP_ACTION}"
+            f" --es SerialNumber {strSerialNumber}"
+            f" --es StationName {strStationName}"
+        )
+        nStatus, strBroadcastOutput = objShell.run(strBroadcastCmd)
+        if "Broadcast completed" not in strBroadcastOutput:
             print(f"Error: Broadcast command may not have been successfully sent")
-            print(f"Output: {objBroadcastResult.stdout}")
-            print(f"Error: {objBroadcastResult.stderr}")
+            print(f"Output: {strBroadcastOutput}")
             return False
         
         print("Broadcast command sent successfully, waiting for test completion...")
         print("Monitoring logcat output, waiting for 'ATP Test Finish!!' message...")
-        bTestSuccess = False
-        fStartTime = time.time()
-        objProcess.stdout.flush()
-        while True:
-            fElapsedTime = time.time() - fStartTime
-            if fElapsedTime > nTimeoutSeconds:
-                print(f"Error: Timeout after waiting {nTimeoutSeconds} seconds for test completion")
-                return False
-            if objProcess.poll() is not None:
-                print("Error: Logcat process terminated unexpectedly")
-                break
-                
-            strLine = objProcess.stdout.readline()
-            if strLine:
-                if "ATP Test Finish!!" in strLine:
-                    print(f"\nDetected test completion message: {strLine.strip()}")
-                    print("Waiting for log files to complete writing...")
-                    time.sleep(2)
-                    strLogPath = f"/storage/emulated/0/Android/data/com.rtk.ct1atptest/files/Logs/{strStationName}.txt"
-                    print(f"Checking log file: {strLogPath}")
-                    lstCheckCmd = lstAdbPrefix + ['shell', f'test -e "{strLogPath}" && echo "EXISTS" || echo "NOT_FOUND"']
-                    objCheckResult = subprocess.run(lstCheckCmd, capture_output=True, text=True)
-                    
-                    if "EXISTS" not in objCheckResult.stdout:
-                        print(f"Error: Log file not found: {strLogPath}")
-                        return False
-                    
-                    print(f"Found log file: {strLogPath}")
-                    strFilename = f"{strStationName}.txt"
-                    strOutputPath = os.path.join(strLogDir, strFilename)
-                    print(f"Downloading log file...")
-                    lstPullCmd = lstAdbPrefix + ['pull', strLogPath, strOutputPath]
-                    objPullResult = subprocess.run(lstPullCmd, capture_output=True, text=True)
-                    
-                    if "1 file pulled" in objPullResult.stderr:
-                        print(f"Success! Log file saved to: {strOutputPath}")
-                        bTestSuccess = True
-                    else:
-                        print(f"Error: Could not download log file")
-                        print(f"Error message: {objPullResult.stderr}")
-                    
-                    break
-            else:
-                time.sleep(0.1)
-            if int(fElapsedTime) % 30 == 0 and int(fElapsedTime) > 0:
-                fRemaining = nTimeoutSeconds - fElapsedTime
-                print(f"Still waiting... {int(fRemaining)} seconds remaining", flush=True)
-        
-        return bTestSuccess
+        strVerdict, strLine = objMonitor.wait(nTimeoutSeconds)
+        if strVerdict == LOGCAT_TIMEOUT:
+            print(f"Error: Timeout after waiting {nTimeoutSeconds:g} seconds for test completion")
+            return False
+        if strVerdict == LOGCAT_ERROR:
+            print(f"Error: Test failed on the device: {strLine.strip()}")
+            return False
+        if strVerdict != LOGCAT_FINISH:
+            print("Error: Logcat process terminated unexpectedly")
+            return False
+        objMonitor.stop()
+        print(f"\nDetected test completion message: {strLine.strip()}")
+        dictLogRetrieval = getConfigSection("log_retrieval")
+        strCompression = dictLogRetrieval.get("compression")
+        if strCompression in ("", "none"):
+            strCompression = None
+        strRemoteLogDir = "/storage/emulated/0/Android/data/com.rtk.ct1atptest/files/Logs"
+        if dictLogRetrieval.get("pull_directory"):
+            strOutputPath = os.path.join(strLogDir, f"{strStationName}_Logs_{strSerialNumber}.tar")
+            print(f"Downloading log directory: {strRemoteLogDir}")
+            strSavedPath = fetchDeviceDir(lstAdbPrefix, strRemoteLogDir, strOutputPath, strCompression)
+            if strSavedPath and not archiveContains(strSavedPath, f"{strStationName}.txt"):
+                print(f"Error: Log file not found in archive: {strStationName}.txt")
+                strSavedPath = None
+        else:
+            strLogPath = f"{strRemoteLogDir}/{strStationName}.txt"
+            strOutputPath = os.path.join(strLogDir, f"{strStationName}.txt")
+            print(f"Downloading log file: {strLogPath}")
+            strSavedPath = fetchDeviceFile(lstAdbPrefix, strLogPath, strOutputPath, strCompression)
+        if not strSavedPath:
+            print(f"Error: Could not download log file")
+            return False
+        print(f"Success! Log file saved to: {strSavedPath}")
+        return True
     
     except KeyboardInterrupt:
         print("\nOperation interrupted by user")
@@ -448,9 +1199,10 @@ def waitForTestCompletion(strSerialNumber, strStationName, strDeviceId=None, nTi
         print(f"Error: {str(e)}")
         return False
     finally:
-        if 'objProcess' in locals():
-            objProcess.terminate()
+        if 'objMonitor' in locals():
+            objMonitor.stop()
 
+@traceStep("wifi_setup")
 def settingWiFi11Gchannel7():
     """
     * Configure WiFi settings for 11G channel 7 using low-level wl commands
@@ -466,37 +1218,34 @@ def settingWiFi11Gchannel7():
     
     try:
         print("Configuring WiFi test settings using wl commands...")
+        adbRoot(lstAdbPrefix)
         lstWifiCommands = [
-            ['root'],
-            ['shell', 'svc', 'wifi', 'enable'],
-            ['sleep', '2'],
-            ['shell', 'ifconfig', 'wlan0', 'up'],
-            ['shell', 'wl', 'down'],
-            ['shell', 'wl', 'mpc', '0'],
-            ['shell', 'wl', 'country', 'ALL'],
-            ['shell', 'wl', 'band', 'b'],  
-            ['shell', 'wl', 'up'],
-            ['shell', 'wl', '2g_rate', '-h', '7', '-b', '20'],
-            ['shell', 'wl', 'chanspec', '7/20'],
-            ['shell', 'wl', 'phy_watchdog', '0'],
-            ['shell', 'wl', 'scansuppress', '1'],
-            ['shell', 'wl', 'phy_watchdog', '0'],
-            ['shell', 'wl', 'phy_forcecal', '1'],
-            ['shell', 'wl', 'phy_txpwrctrl', '1'],
-            ['shell', 'wl', 'txpwr1', '-1'],
-            ['shell', 'wl', 'pkteng_start', '00:90:4c:14:43:19', 'tx', '100', '1000', '0']
+            'svc wifi enable',
+            ('sleep', 2),
+            'ifconfig wlan0 up',
+            'wl down',
+            'wl mpc 0',
+            'wl country ALL',
+            'wl band b',  
+            'wl up',
+            'wl 2g_rate -h 7 -b 20',
+            'wl chanspec 7/20',
+            'wl phy_watchdog 0',
+            'wl scansuppress 1',
+            'wl phy_watchdog 0',
+            'wl phy_forcecal 1',
+            'wl phy_txpwrctrl 1',
+            'wl txpwr1 -1',
+            'wl pkteng_start 00:90:4c:14:43:19 tx 100 1000 0'
         ]
-        for lstCmd in lstWifiCommands:
-            if lstCmd[0] == 'sleep':
-                time.sleep(int(lstCmd[1]))
-                continue
-            strCmdDesc = ' '.join(lstCmd)
-            print(f"Executing: {strCmdDesc}")
-            lstFullCmd = lstAdbPrefix + lstCmd
-            objResult = subprocess.run(lstFullCmd, capture_output=True, text=True)
-            if objResult.returncode != 0:
-                print(f"Warning: Command may have failed: {strCmdDesc}")
-                print(f"Error output: {objResult.stderr}")
+        nStatus, strOutput = getScriptCache(lstAdbPrefix).runScript(
+            "wifi_11g_ch7", buildScript(lstWifiCommands, "WiFi 11G channel 7 TX test mode")
+        )
+        if nStatus is None:
+            print(f"Error: WiFi configuration script did not complete: {strOutput}")
+            return False
+        for strCmd in getFailedCommands(strOutput):
+            print(f"Warning: Command may have failed: shell {strCmd}")
         
         print("WiFi 2.4GHz Channel 7 test mode configuration completed")
         return True
@@ -505,6 +1254,7 @@ def settingWiFi11Gchannel7():
         print(f"Error configuring WiFi test mode: {str(e)}")
         return False
 
+@traceStep("bt_setup")
 def settingBTTXTest():
     """
     * Configure Bluetooth for TX test mode using ADB commands
@@ -520,32 +1270,17 @@ def settingBTTXTest():
     
     try:
         print("Configuring Bluetooth test settings...")
-        rootCmd = lstAdbPrefix + ["root"]
-        objResult = subprocess.run(rootCmd, capture_output=True, text=True)
-        print("Wait for a while to get root access...")
-        time.sleep(1)
-        closeBTCmd = lstAdbPrefix +['shell', 'svc', 'bluetooth', 'disable']
-        objResult = subprocess.run(closeBTCmd, capture_output=True, text=True)
-        closeWiFiCmd = lstAdbPrefix +['shell', 'wl', 'down']
-        objResult = subprocess.run(closeWiFiCmd, capture_output=True, text=True)
-        pushCmd = lstAdbPrefix + ["push", "./bt_script.sh", "/data/local/tmp/"]
-        objResult = subprocess.run(pushCmd, capture_output=True, text=True)
-        if objResult.returncode != 0:
-            print(f"Error: Failed to push script to device")
-            print(f"Error output: {objResult.stderr}")
-            return False
+        adbRoot(lstAdbPrefix)
+        objShell = getAdbShellSession(lstAdbPrefix)
+        objShell.run('svc bluetooth disable; wl down')
         print("Executing Bluetooth commands...")
-        chmodCmd = lstAdbPrefix + ["shell", "chmod 777 /data/local/tmp/bt_script.sh"]
-        subprocess.run(chmodCmd, capture_output=True, text=True)
-                
-        runCmd = lstAdbPrefix + ["shell", "/data/local/tmp/bt_script.sh"]
-        objResult = subprocess.run(runCmd, capture_output=True, text=True)
-        print(objResult.stdout)
-        if objResult.stderr:
-            print(f"Warning: Bluetooth script execution may have issues:")
-            print(f"Error output: {objResult.stderr}")
-        cleanupCmd = lstAdbPrefix + ["shell", "rm /data/local/tmp/bt_script.sh"]
-        subprocess.run(cleanupCmd, capture_output=True, text=True)
+        nStatus, strOutput = getScriptCache(lstAdbPrefix).runScriptFile("./bt_script.sh")
+        print(strOutput)
+        if nStatus is None:
+            print(f"Error: Failed to run Bluetooth script on device")
+            return False
+        if nStatus != 0:
+            print(f"Warning: Bluetooth script execution may have issues (exit status {nStatus})")
         print("Bluetooth TX test mode configuration completed")
         return True
             
@@ -555,6 +1290,7 @@ def settingBTTXTest():
         traceback.print_exc()
         return False
     
+@traceStep("iqxel_measure", ["strModel"])
 def getIQxelValue(strIQxelPath,strModel="WiFi"):
     """
     * Get IQxel test result and extract signal power value
@@ -569,30 +1305,38 @@ def getIQxelValue(strIQxelPath,strModel="WiFi"):
         strCommand = f"{os.path.join(strIQxelPath, 'Console.exe')} -isWiFiTest true"
     elif(strModel == "BT"):
         strCommand = f"{os.path.join(strIQxelPath, 'Console.exe')} -isWiFiTest false"
+    objMatcher = OutputMatcher(
+        lstSuccess=[r"Signal power:"],
+        dictExtract={"signal_power": r"Signal power:\s*(\S+?)\s*(?:dBm)?\s*$"},
+        fKillGraceSeconds=5
+    )
     try:
-        original_dir = os.getcwd()
-        try:
-            os.chdir(strIQxelPath)
-            lstOutputLines, nReturnCode = runCommand(strCommand)
-        finally:
-            os.chdir(original_dir)
-        if nReturnCode != 0:
-            print(f"Warning: IQxel command returned non-zero code: {nReturnCode}")
+        objCapture = OutputCapture(nMaxLines=OUTPUT_TAIL_LINES, strSpillPath=getTranscriptPath(f"iqxel_{strModel}"))
+        objResult = runCommand(
+            strCommand,
+            strCwd=strIQxelPath,
+            objMatcher=objMatcher,
+            objCapture=objCapture,
+            fTimeoutSeconds=getStepTimeout("iqxel_measure", 120),
+            fIdleTimeoutSeconds=getStepTimeout("iqxel_measure_idle", 60)
+        )
+        if objResult.bTimedOut:
+            print(f"Error: IQxel command timed out ({objResult.strTimeout})")
+            return None
+        if objResult.nReturncode != 0 and not objResult.bKilled:
+            print(f"Warning: IQxel command returned non-zero code: {objResult.nReturncode}")
     except Exception as e:
             print(f"Error executing IQxel command: {str(e)}")
             return None
     
     fSignalPower = None
-    for strLine in lstOutputLines:
-        if "Signal power:" in strLine:
-            try:
-                strValue = strLine.split("Signal power:")[1].strip()
-                fSignalPower = float(strValue.replace("dBm", "").strip())
-                print(f"Found signal power: {fSignalPower} dBm")
-                break
-            except (ValueError, IndexError) as e:
-                print(f"Error parsing signal power value: {str(e)}")
-                return None
+    if objResult.strVerdict == "success":
+        try:
+            fSignalPower = float(objResult.dictValues["signal_power"])
+            print(f"Found signal power: {fSignalPower} dBm")
+        except (ValueError, KeyError) as e:
+            print(f"Error parsing signal power value: {str(e)}")
+            return None
     
     return fSignalPower
 
@@ -641,6 +1385,7 @@ def connectGPIB(rm, address):
         print(f"Error connecting to GPIB device {address}: {str(e)}", flush=True)
         return None
 
+@traceStep("gpib_write", ["command"])
 def sendGPIBCommand(instrument, command):
     """
     * Send command to GPIB instrument without expecting response
@@ -658,6 +1403,7 @@ def sendGPIBCommand(instrument, command):
         print(f"Error sending GPIB command: {str(e)}", flush=True)
         return False
 
+@traceStep("gpib_query", ["query"])
 def queryGPIB(instrument, query):
     """
     * Send query to GPIB instrument and return response
@@ -692,6 +1438,12 @@ def closeGPIB(instrument):
         print(f"Error closing GPIB connection: {str(e)}", flush=True)
         return False
 
+LTE_BAND_COMMANDS = {  # band -> (RF test setup, RX measurement) AT commands
+    1: ('AT+QRFTEST="LTE BAND1",18300,"ON",70,1', "AT+QRXFTM=1,1,300,0,0,3"),
+    26: ('AT+QRFTEST="LTE BAND26",26865,"ON",70,1', "AT+QRXFTM=1,18,8865,0,0,3"),
+}
+
+@traceStep("lte_tx_setup", ["iLteBand"])
 def settingLTETXTest(iLteBand):
     """
     * Configure LTE for TX test mode using AT commands
@@ -707,41 +1459,21 @@ def settingLTETXTest(iLteBand):
         return False
     
     try:
-        
-        subprocess.run(lstAdbPrefix + ["root"], capture_output=True, text=True)
-        time.sleep(1)
-        logPath = "/data/local/tmp/rxlog.txt"
-        subprocess.run(lstAdbPrefix + ["shell", f"rm -f {logPath}"], capture_output=True, text=True)
-        subprocess.run(lstAdbPrefix + ["shell", f"nohup cat /dev/ttyUSB2 > {logPath} 2>&1 &"], capture_output=True, text=True)
-        time.sleep(1)
-        print("Configuring LTE test settings...")
-        rootCmd = lstAdbPrefix + ["root"]
-        objResult = subprocess.run(rootCmd, capture_output=True, text=True)
-        print("Wait for a while to get root access...")
-        time.sleep(1)
-        print("Entering RF test mode...")
-        rfTestCmd = lstAdbPrefix + ['shell', 'echo "AT+QRFTESTMODE=1\\r\\n" > /dev/ttyUSB2']
-        objResult = subprocess.run(rfTestCmd, capture_output=True, text=True)
-        if objResult.returncode != 0:
-            print(f"Error: Failed to enter RF test mode")
-            print(f"Error output: {objResult.stderr}")
-            return False  
-        time.sleep(1)
-        if iLteBand == 1:
-            print("Configuring LTE Band 1...")
-            lteCmd = lstAdbPrefix + ['shell', 'echo "AT+QRFTEST=\\"LTE BAND1\\",18300,\\"ON\\",70,1\\r\\n" > /dev/ttyUSB2']
-        elif iLteBand == 26:
-            print("Configuring LTE Band 26...")
-            lteCmd = lstAdbPrefix + ['shell', 'echo "AT+QRFTEST=\\"LTE BAND26\\",26865,\\"ON\\",70,1\\r\\n" > /dev/ttyUSB2']
-        else:
+        if iLteBand not in LTE_BAND_COMMANDS:
             print(f"Error: Unsupported LTE band {iLteBand}")
             return False
-            
-        objResult = subprocess.run(lteCmd, capture_output=True, text=True)
-        if objResult.returncode != 0:
-            print(f"Error: Failed to configure LTE Band {iLteBand}")
-            print(f"Error output: {objResult.stderr}")
-            return False
+        print(f"Configuring LTE Band {iLteBand}...")
+        adbRoot(lstAdbPrefix)
+        objAtClient = getAtClient(lstAdbPrefix)
+        fTimeout = getStepTimeout("lte_at_command", 5)
+        print("Configuring LTE test settings...")
+        print("Entering RF test mode...")
+        for strAtCommand in ("AT+QRFTESTMODE=1", LTE_BAND_COMMANDS[iLteBand][0]):
+            objResponse = objAtClient.command(strAtCommand, fTimeout)
+            if not objResponse.bOk:
+                print(f"Error: Failed to configure LTE Band {iLteBand}")
+                print(f"Error output: {strAtCommand} -> {objResponse.strResult}")
+                return False
             
         print(f"LTE Band {iLteBand} TX test mode configuration completed")
         return True
@@ -752,6 +1484,7 @@ def settingLTETXTest(iLteBand):
         traceback.print_exc()
         return False
 
+@traceStep("lte_rx_measure", ["iLteBand"])
 def getLTERXResult(iLteBand,fRxThreshold):
     """
     * Get LTE RX test result using AT commands
@@ -768,32 +1501,23 @@ def getLTERXResult(iLteBand,fRxThreshold):
     
     maxRetry = 3
     retryCount = 0
-    logPath = "/data/local/tmp/rxlog.txt"
-    try:
-        while retryCount < maxRetry:
-            if iLteBand == 1:
-                lteCmd = lstAdbPrefix + ['shell', 'echo "AT+QRFTEST=\\"LTE BAND1\\",18300,\\"ON\\",70,1\\r\\n" > /dev/ttyUSB2']
-            elif iLteBand == 26:
-                lteCmd = lstAdbPrefix + ['shell', 'echo "AT+QRFTEST=\\"LTE BAND26\\",26865,\\"ON\\",70,1\\r\\n" > /dev/ttyUSB2']
-            else:
-                print(f"Error: Unsupported LTE band {iLteBand}")
-                return None
-            subprocess.run(lteCmd, capture_output=True, text=True)
-            time.sleep(1)
-            if iLteBand == 1:
-                atCommand = 'printf "AT+QRXFTM=1,1,300,0,0,3\\r\\n" > /dev/ttyUSB2'
-            elif iLteBand == 26:
-                atCommand = 'printf "AT+QRXFTM=1,18,8865,0,0,3\\r\\n" > /dev/ttyUSB2'
-            else:
-                return None
-            subprocess.run(lstAdbPrefix + ['shell', atCommand], capture_output=True, text=True)
-            time.sleep(2)
-            objReadResult = subprocess.run(lstAdbPrefix + ['shell', f'cat {logPath}'], capture_output=True, text=True)
-            print(f"Captured output:\n{objReadResult.stdout}")
-            matches = re.findall(r'\+QRXFTM:\s*(-?\d+),\s*(-?\d+)', objReadResult.stdout)
-            if matches:
-                lastMatch = matches[-1]
-                fMeasured = float(lastMatch[1])  
+    if iLteBand not in LTE_BAND_COMMANDS:
+        print(f"Error: Unsupported LTE band {iLteBand}")
+        return None
+    strBandCommand, strRxCommand = LTE_BAND_COMMANDS[iLteBand]
+    fTimeout = getStepTimeout("lte_at_command", 5)
+    fRxTimeout = getStepTimeout("lte_rx_measure", 10)
+    while retryCount < maxRetry:
+        retryCount += 1
+        try:
+            objAtClient = getAtClient(lstAdbPrefix)
+            objAtClient.command(strBandCommand, fTimeout)
+            objResponse = objAtClient.command(strRxCommand, fRxTimeout, strExpect="+QRXFTM:")
+            print(f"Captured output:\n" + "\n".join(objResponse.lstLines + [objResponse.strResult or ""]))
+            lstValues = [lstRow for lstRow in objResponse.getValues("+QRXFTM:")
+                         if len(lstRow) >= 2 and re.fullmatch(r"-?\d+(\.\d+)?", lstRow[1])]
+            if lstValues:
+                fMeasured = float(lstValues[-1][1])
                 print(f"Parsed LTE RX value (latest): {fMeasured} dBm")
 
                 if fMeasured >= fRxThreshold:
@@ -803,19 +1527,10 @@ def getLTERXResult(iLteBand,fRxThreshold):
                     print(f"RETRY: {fMeasured} < {fRxThreshold}")
             else:
                 print("No valid +QRXFTM result found")
-            
-            retryCount += 1
-            time.sleep(1)
-
-    except Exception as e:
-        print(f"Exception occurred: {e}")
-        import traceback
-        traceback.print_exc()
-
-    finally:
-        subprocess.run(lstAdbPrefix + ['shell', 'pkill -f "cat /dev/ttyUSB2"'], capture_output=True, text=True)
-        subprocess.run(lstAdbPrefix + ["shell", f"rm -f {logPath}"], capture_output=True, text=True)
-
+        except Exception as e:
+            print(f"Exception occurred on attempt {retryCount}/{maxRetry}: {e}")
+            import traceback
+            traceback.print_exc()
 
     print(f"FAILED: Exceeded maximum retries ({maxRetry}) without valid result.")
     return None
@@ -849,3 +1564,32 @@ def loadConfigFile(strConfigFile="./CT1.yaml"):
         print(f"Error loading config file: {str(e)}")
         print("Using default configuration values")
         return None
+
+objConfigCache = {}
+
+def getConfigSection(strSection, strConfigFile="./CT1.yaml"):
+    """
+    * Get one top-level section of the configuration file
+    * The configuration file is loaded once and cached for later lookups
+    *
+    * @param strSection Section name (e.g. "timeouts")
+    * @param strConfigFile Path to the YAML configuration file
+    * @return Dictionary with the section contents, empty if missing
+    """
+    if strConfigFile not in objConfigCache:
+        objConfigCache[strConfigFile] = loadConfigFile(strConfigFile) or {}
+    return objConfigCache[strConfigFile].get(strSection) or {}
+
+def getStepTimeout(strStep, fDefault=None, strConfigFile="./CT1.yaml"):
+    """
+    * Look up a per-step timeout from the timeouts section of the configuration file
+    *
+    * @param strStep Key inside the timeouts section (e.g. "firmware_flash")
+    * @param fDefault Value used when the file or key is missing
+    * @param strConfigFile Path to the YAML configuration file
+    * @return Timeout in seconds as float, or None if neither config nor default provide one
+    """
+    objValue = getConfigSection("timeouts", strConfigFile).get(strStep, fDefault)
+    if objValue is None:
+        return None
+    return float(objValue)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+import gzip
+import hashlib
+import os
+import shlex
+import tarfile
+
+from adbclient import openExecOut
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+LOG_HEADER_TAG = b"CT1LOG"
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+def buildFetchCommand(strRemotePath, fSettleTimeout):
+    """
+    * Device command that waits for the file size to settle, snapshots the file and
+    * prints one header line (CT1LOG OK <size> <md5> or CT1LOG MISSING) followed by
+    * the snapshot bytes, so existence, size and checksum travel with the data
+    *
+    * @param strRemotePath Device file path
+    * @param fSettleTimeout Maximum seconds to wait for the file to stop growing
+    * @return Shell command line
+    """
+    nChecks = max(1, int(fSettleTimeout / 0.1))
+    return (
+        f"f={shlex.quote(strRemotePath)}; "
+        f"if [ ! -f \"$f\" ]; then echo CT1LOG MISSING; exit 0; fi; "
+        f"n=0; s=$(stat -c %s \"$f\"); "
+        f"while [ $n -lt {nChecks} ]; do sleep 0.1; t=$(stat -c %s \"$f\"); [ \"$t\" = \"$s\" ] && break; s=$t; n=$((n+1)); done; "
+        f"tmp=${{TMPDIR:-/data/local/tmp}}/ct1_fetch.$$; cp \"$f\" \"$tmp\" || exit 1; "
+        f"echo \"CT1LOG OK $(stat -c %s \"$tmp\") $(md5sum \"$tmp\" | cut -d' ' -f1)\"; "
+        f"cat \"$tmp\"; rm -f \"$tmp\""
+    )
+
+def buildTarCommand(strRemoteDir):
+    """
+    * Device command printing a header line (CT1LOG DIR or CT1LOG MISSING)
+    * followed by a tar stream of the directory
+    """
+    return (
+        f"d={shlex.quote(strRemoteDir)}; "
+        f"if [ ! -d \"$d\" ]; then echo CT1LOG MISSING; exit 0; fi; "
+        f"echo CT1LOG DIR; tar -cf - -C \"$d\" ."
+    )
+
+def openOutputFile(strPath, strCompression):
+    """
+    * @param strCompression None, "gzip" or "zstd"
+    * @return Writable binary file object compressing on the fly
+    """
+    if strCompression == "gzip":
+        return gzip.open(strPath, "wb", compresslevel=6)
+    if strCompression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        return zstandard.ZstdCompressor().stream_writer(open(strPath, "wb"), closefd=True)
+    return open(strPath, "wb")
+
+def streamToFile(objStream, strLocalPath, strCompression, nChunkSize=65536):
+    """
+    * Copy the rest of a stream into a (compressed) host file via a temporary name
+    *
+    * @return Tuple (byte count, md5 hex digest) of the uncompressed data
+    """
+    strTempPath = strLocalPath + ".part"
+    objMd5 = hashlib.md5()
+    nTotal = 0
+    try:
+        with openOutputFile(strTempPath, strCompression) as objOutput:
+            while True:
+                byteChunk = objStream.read(nChunkSize)
+                if not byteChunk:
+                    break
+                objMd5.update(byteChunk)
+                objOutput.write(byteChunk)
+                nTotal += len(byteChunk)
+        os.replace(strTempPath, strLocalPath)
+    finally:
+        if os.path.exists(strTempPath):
+            os.remove(strTempPath)
+    return nTotal, objMd5.hexdigest()
+
+def fetchDeviceFile(lstAdbPrefix, strRemotePath, strLocalPath, strCompression=None, fSettleTimeout=2.0):
+    """
+    * Retrieve one device file with a single exec-out round-trip
+    * Existence, size and MD5 are reported by the device in the same stream and
+    * checked against the received bytes; the file is written compressed if asked
+    *
+    * @param lstAdbPrefix ADB command prefix
+    * @param strRemotePath Device file path
+    * @param strLocalPath Host file path; the compression suffix is appended
+    * @param strCompression None, "gzip" or "zstd"
+    * @param fSettleTimeout Maximum seconds to wait for the file to stop growing
+    * @return Host path of the saved file, or None on failure
+    """
+    strLocalPath += COMPRESSION_SUFFIXES.get(strCompression, "")
+    objStream, fnClose = openExecOut(lstAdbPrefix, buildFetchCommand(strRemotePath, fSettleTimeout))
+    try:
+        lstHeader = objStream.readline().split()
+        if lstHeader[:2] != [LOG_HEADER_TAG, b"OK"] or len(lstHeader) < 4:
+            if lstHeader[:2] == [LOG_HEADER_TAG, b"MISSING"]:
+                print(f"Error: Log file not found: {strRemotePath}", flush=True)
+            else:
+                print(f"Error: Unexpected reply while fetching {strRemotePath}: {b' '.join(lstHeader)[:200]!r}", flush=True)
+            return None
+        nExpectedSize = int(lstHeader[2])
+        strExpectedMd5 = lstHeader[3].decode("ascii", errors="replace")
+        nSize, strMd5 = streamToFile(objStream, strLocalPath, strCompression)
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not fetch {strRemotePath}: {str(e)}", flush=True)
+        return None
+    finally:
+        fnClose()
+    if nSize != nExpectedSize or strMd5 != strExpectedMd5:
+        print(f"Error: {strRemotePath} arrived corrupted ({nSize}/{nExpectedSize} bytes, md5 {strMd5} != {strExpectedMd5})", flush=True)
+        os.remove(strLocalPath)
+        return None
+    print(f"Fetched {strRemotePath}: {nSize} bytes, md5 {strMd5}", flush=True)
+    return strLocalPath
+
+def fetchDeviceDir(lstAdbPrefix, strRemoteDir, strLocalPath, strCompression=None):
+    """
+    * Retrieve a whole device directory as one tar stream over a single exec-out
+    *
+    * @param lstAdbPrefix ADB command prefix
+    * @param strRemoteDir Device directory
+    * @param strLocalPath Host path of the tar file; the compression suffix is appended
+    * @param strCompression None, "gzip" or "zstd"
+    * @return Host path of the saved archive, or None on failure
+    """
+    strLocalPath += COMPRESSION_SUFFIXES.get(strCompression, "")
+    objStream, fnClose = openExecOut(lstAdbPrefix, buildTarCommand(strRemoteDir))
+    try:
+        lstHeader = objStream.readline().split()
+        if lstHeader != [LOG_HEADER_TAG, b"DIR"]:
+            print(f"Error: Log directory not found: {strRemoteDir}", flush=True)
+            return None
+        nSize, strMd5 = streamToFile(objStream, strLocalPath, strCompression)
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not fetch {strRemoteDir}: {str(e)}", flush=True)
+        return None
+    finally:
+        fnClose()
+    if nSize == 0 or nSize % 512 != 0:
+        print(f"Error: Truncated tar stream for {strRemoteDir} ({nSize} bytes)", flush=True)
+        os.remove(strLocalPath)
+        return None
+    print(f"Fetched {strRemoteDir} as tar: {nSize} bytes, md5 {strMd5}", flush=True)
+    return strLocalPath
+
+def archiveContains(strArchivePath, strName):
+    """
+    * Check that a fetched tar (plain or gzip) holds a file; zstd archives are not inspected
+    *
+    * @param strArchivePath Host path of the archive
+    * @param strName File name relative to the archived directory
+    * @return Boolean indicating the file is present
+    """
+    if strArchivePath.endswith(COMPRESSION_SUFFIXES["zstd"]):
+        return True
+    try:
+        with tarfile.open(strArchivePath, "r:*") as objTar:
+            return any(os.path.normpath(strMember) == strName for strMember in objTar.getnames())
+    except (tarfile.TarError, OSError) as e:
+        print(f"Error: Could not read {strArchivePath}: {str(e)}", flush=True)
+        return False
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+import threading
+import time
+
+from adbclient import AdbError
+
+class AdbDeviceTracker:
+    """
+    * Live view of the attached ADB devices fed by host:track-devices
+    * A background thread holds one track-devices connection; the adb server
+    * pushes the full device list on every change and waiters are woken at once
+    * instead of polling `adb devices` every second
+    """
+    def __init__(self, objClient, fReconnectDelay=0.5):
+        """
+        * @param objClient AdbClient connected to the local adb server
+        * @param fReconnectDelay Seconds between reconnects when the adb server goes away
+        """
+        self.objClient = objClient
+        self.fReconnectDelay = fReconnectDelay
+        self.dictStates = {}
+        self.bConnected = False
+        self.nGeneration = 0
+        self.objCondition = threading.Condition()
+        self.objStopEvent = threading.Event()
+        self.objThread = None
+
+    def start(self):
+        """
+        * Start tracking and wait briefly for the first device list
+        *
+        * @return self
+        """
+        if self.objThread is None:
+            self.objStopEvent.clear()
+            self.objThread = threading.Thread(target=self.trackLoop, name="AdbDeviceTracker")
+            self.objThread.daemon = True
+            self.objThread.start()
+            with self.objCondition:
+                self.objCondition.wait_for(lambda: self.nGeneration > 0, timeout=2.0)
+        return self
+
+    def stop(self):
+        self.objStopEvent.set()
+        self.objThread = None
+
+    def trackLoop(self):
+        while not self.objStopEvent.is_set():
+            objTracker = None
+            try:
+                objTracker = self.objClient.trackDevices()
+                for lstDevices in objTracker:
+                    self.update(dict(lstDevices), True)
+                    if self.objStopEvent.is_set():
+                        break
+            except (AdbError, OSError) as e:
+                if not self.objStopEvent.is_set():
+                    print(f"Warning: adb device tracking interrupted: {str(e)}", flush=True)
+            finally:
+                if objTracker is not None:
+                    objTracker.close()
+            self.update({}, False)
+            self.objStopEvent.wait(self.fReconnectDelay)
+
+    def update(self, dictStates, bConnected):
+        with self.objCondition:
+            self.dictStates = dictStates
+            self.bConnected = bConnected
+            self.nGeneration += 1
+            self.objCondition.notify_all()
+
+    def getDevices(self):
+        """
+        * @return Dict of serial to state from the latest update
+        """
+        with self.objCondition:
+            return dict(self.dictStates)
+
+    def findReady(self, strSerial):
+        if strSerial:
+            return strSerial if self.dictStates.get(strSerial) == "device" else None
+        for strCandidate, strState in self.dictStates.items():
+            if strState == "device" and "emulator" not in strCandidate:
+                return strCandidate
+        return None
+
+    def waitForDevice(self, strSerial=None, fTimeout=30.0):
+        """
+        * Wait until a device is online, returning as soon as the server reports it
+        *
+        * @param strSerial Serial to wait for, or None for the first non-emulator device
+        * @param fTimeout Maximum seconds to wait
+        * @return Serial of the online device, or None on timeout
+        """
+        fDeadline = time.monotonic() + fTimeout
+        with self.objCondition:
+            while True:
+                strReady = self.findReady(strSerial)
+                if strReady:
+                    return strReady
+                fRemaining = fDeadline - time.monotonic()
+                if fRemaining <= 0:
+                    return None
+                self.objCondition.wait(fRemaining)
+
+    def waitForReconnect(self, strSerial, fDropTimeout=1.0, fTimeout=30.0):
+        """
+        * Wait for a device to drop off and come back (adbd restart after `adb root`)
+        * If no drop is seen within fDropTimeout the device is taken as already back
+        *
+        * @param strSerial Serial of the restarting device, or None for the first device
+        * @param fDropTimeout Maximum seconds to wait for the device to go away
+        * @param fTimeout Maximum seconds to wait for it to come back
+        * @return Serial of the online device, or None on timeout
+        """
+        fDropDeadline = time.monotonic() + fDropTimeout
+        with self.objCondition:
+            while self.findReady(strSerial):
+                fRemaining = fDropDeadline - time.monotonic()
+                if fRemaining <= 0:
+                    break
+                self.objCondition.wait(fRemaining)
+        return self.waitForDevice(strSerial, fTimeout)
+
+objDeviceTracker = None
+objTrackerLock = threading.Lock()
+
+def getDeviceTracker(objClient):
+    """
+    * Shared tracker for the process, started on first use
+    *
+    * @param objClient AdbClient, or None when the adb server is not reachable
+    * @return Started AdbDeviceTracker, or None without a client
+    """
+    global objDeviceTracker
+    if objClient is None:
+        return None
+    with objTrackerLock:
+        if objDeviceTracker is None:
+            objDeviceTracker = AdbDeviceTracker(objClient).start()
+        return objDeviceTracker
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+class EventLog:
+    """
+    * Append-only JSONL event stream written next to the text log
+    * One compact JSON object per line with a fixed set of common keys:
+    *   ts   wall clock (epoch seconds), for correlating runs
+    *   mono monotonic clock seconds, for durations and ordering
+    *   sn   DUT serial number
+    *   run  run id shared by every event of one process run
+    *   ev   event type (run_start, run_end, step_start, step_end, cmd, ...)
+    * Event specific keys (step, cmd, rc, dur, ok, values, ...) follow
+    """
+    def __init__(self, strPath, strSerialNumber=None, strRunId=None):
+        """
+        * @param strPath JSONL file path (opened in append mode)
+        * @param strSerialNumber DUT serial number stamped on every event
+        * @param strRunId Identifier shared by all events of this run
+        """
+        strDir = os.path.dirname(strPath)
+        if strDir and not os.path.exists(strDir):
+            os.makedirs(strDir)
+        self.strPath = strPath
+        self.strSerialNumber = strSerialNumber
+        self.strRunId = strRunId or time.strftime("%Y%m%d_%H%M%S")
+        self.objLock = threading.Lock()
+        self.objFile = open(strPath, "a", encoding="utf-8")
+
+    def emit(self, strEvent, **dictFields):
+        """
+        * Append one event line; safe to call from several threads
+        *
+        * @param strEvent Event type
+        * @param dictFields Event specific keys; None values are dropped
+        """
+        dictRecord = {
+            "ts": round(time.time(), 3),
+            "mono": round(time.monotonic(), 4),
+            "sn": self.strSerialNumber,
+            "run": self.strRunId,
+            "ev": strEvent,
+        }
+        for strKey, objValue in dictFields.items():
+            if objValue is not None:
+                dictRecord[strKey] = objValue
+        strLine = json.dumps(dictRecord, separators=(",", ":"), ensure_ascii=False, default=str)
+        with self.objLock:
+            if self.objFile is not None:
+                self.objFile.write(strLine + "\n")
+                self.objFile.flush()
+
+    def close(self):
+        with self.objLock:
+            if self.objFile is not None:
+                self.objFile.close()
+                self.objFile = None
+
+objActiveEventLog = None
+
+def openEventLog(strPath, strSerialNumber=None, strRunId=None):
+    """
+    * Open the process-wide event log used by logEvent and traceStep
+    *
+    * @param strPath JSONL file path
+    * @param strSerialNumber DUT serial number
+    * @param strRunId Identifier shared by all events of this run
+    * @return EventLog object
+    """
+    global objActiveEventLog
+    closeEventLog()
+    objActiveEventLog = EventLog(strPath, strSerialNumber, strRunId)
+    return objActiveEventLog
+
+def closeEventLog():
+    """
+    * Close the process-wide event log if one is open
+    """
+    global objActiveEventLog
+    if objActiveEventLog is not None:
+        objActiveEventLog.close()
+        objActiveEventLog = None
+
+def logEvent(strEvent, **dictFields):
+    """
+    * Emit an event to the process-wide event log; no-op when none is open
+    *
+    * @param strEvent Event type
+    * @param dictFields Event specific keys
+    """
+    if objActiveEventLog is not None:
+        objActiveEventLog.emit(strEvent, **dictFields)
+
+def traceStep(strStep, lstArgNames=()):
+    """
+    * Decorator that records step_start/step_end events around a station step
+    * step_end carries the duration on the monotonic clock, ok and a scalar result
+    * Boolean results (or tuples led by a boolean) map to ok; numeric results are kept as the step value
+    *
+    * @param strStep Step name used in the events
+    * @param lstArgNames Names of call arguments to copy into both events
+    * @return Decorator
+    """
+    def decorator(fnStep):
+        objSignature = inspect.signature(fnStep)
+        @functools.wraps(fnStep)
+        def wrapper(*args, **kwargs):
+            if objActiveEventLog is None:
+                return fnStep(*args, **kwargs)
+            dictArgs = {}
+            if lstArgNames:
+                objBound = objSignature.bind_partial(*args, **kwargs)
+                objBound.apply_defaults()
+                dictArgs = {strName: objBound.arguments.get(strName) for strName in lstArgNames}
+            logEvent("step_start", step=strStep, args=dictArgs or None)
+            fStart = time.monotonic()
+            try:
+                objResult = fnStep(*args, **kwargs)
+            except Exception as e:
+                logEvent("step_end", step=strStep, args=dictArgs or None, ok=False,
+                         dur=round(time.monotonic() - fStart, 4), error=str(e))
+                raise
+            objValue = None
+            if isinstance(objResult, tuple) and objResult and isinstance(objResult[0], bool):
+                bOk = objResult[0]
+            elif isinstance(objResult, bool):
+                bOk = objResult
+            elif isinstance(objResult, (int, float)):
+                bOk = True
+                objValue = objResult
+            else:
+                bOk = objResult is not None
+            logEvent("step_end", step=strStep, args=dictArgs or None, ok=bOk, value=objValue,
+                     dur=round(time.monotonic() - fStart, 4))
+            return objResult
+        return wrapper
+    return decorator
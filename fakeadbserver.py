@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+import argparse
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+from adbclient import SYNC_DATA_MAX, SHELL_ID_STDOUT, SHELL_ID_EXIT
+
+ADB_SERVER_VERSION = 41
+
+class FakeAdbServer:
+    """
+    * In-process adb server speaking the smart-socket protocol on a local port
+    * Serves host:version/devices/track-devices/features, shell (v1 and v2), exec
+    * and the sync STAT/SEND/RECV requests, so AdbClient and the station helpers
+    * can be exercised and benchmarked without a device
+    * Device files live in an in-memory dict keyed by path
+    """
+    def __init__(self, nPort=0, dictDevices=None, dictShellResponses=None, fnShell=None, dictFiles=None,
+                 bShellV2=True, fLatency=0.0, fnExec=None):
+        """
+        * @param nPort TCP port on 127.0.0.1 (0 picks a free port)
+        * @param dictDevices Serial to state mapping, {"FAKE0001": "device"} by default
+        * @param dictShellResponses Command to (exit status, output) or output mapping
+        * @param fnShell Callable (serial, command) -> (exit status, output) for commands not
+        *        in dictShellResponses, where output is bytes, text or an iterable of chunks
+        *        sent as they are produced (e.g. logcat); None runs them with the local sh
+        * @param dictFiles Device path to bytes mapping used by the sync protocol and cat
+        * @param bShellV2 Whether the devices advertise the shell_v2 feature
+        * @param fLatency Seconds added before every device service reply (USB round-trip)
+        * @param fnExec Callable (serial, command, socket) -> handled, serving an interactive
+        *        exec: stream itself (e.g. FakeAtModem); returns False to fall back to fnShell
+        """
+        self.nPort = nPort
+        self.dictDevices = dict(dictDevices if dictDevices is not None else {"FAKE0001": "device"})
+        self.dictShellResponses = dict(dictShellResponses or {})
+        self.fnShell = fnShell
+        self.dictFiles = dict(dictFiles or {})
+        self.bShellV2 = bShellV2
+        self.fLatency = fLatency
+        self.fnExec = fnExec
+        self.objLock = threading.Lock()
+        self.lstTrackers = []
+        self.lstRequests = []
+        self.objServer = None
+        self.objThread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, objExcType, objExcValue, objTraceback):
+        self.stop()
+        return False
+
+    def start(self):
+        """
+        * Start serving in a background thread
+        *
+        * @return Port the server listens on
+        """
+        objOwner = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                objOwner.serveConnection(self.request)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.objServer = socketserver.ThreadingTCPServer(("127.0.0.1", self.nPort), Handler)
+        self.objServer.daemon_threads = True
+        self.nPort = self.objServer.server_address[1]
+        self.objThread = threading.Thread(target=self.objServer.serve_forever, name="FakeAdbServer")
+        self.objThread.daemon = True
+        self.objThread.start()
+        return self.nPort
+
+    def stop(self):
+        if self.objServer is not None:
+            self.objServer.shutdown()
+            self.objServer.server_close()
+            self.objServer = None
+        with self.objLock:
+            for objSock in self.lstTrackers:
+                try:
+                    objSock.close()
+                except OSError:
+                    pass
+            self.lstTrackers = []
+
+    def devicesText(self):
+        with self.objLock:
+            return "".join(f"{strSerial}\t{strState}\n" for strSerial, strState in self.dictDevices.items())
+
+    def setDeviceState(self, strSerial, strState):
+        """
+        * Attach, detach or change a device and notify track-devices clients
+        *
+        * @param strSerial Device serial
+        * @param strState State such as device, offline, unauthorized, or None to detach
+        """
+        with self.objLock:
+            if strState is None:
+                self.dictDevices.pop(strSerial, None)
+            else:
+                self.dictDevices[strSerial] = strState
+            lstTrackers = list(self.lstTrackers)
+        byteUpdate = self.encodeHex(self.devicesText())
+        for objSock in lstTrackers:
+            try:
+                objSock.sendall(byteUpdate)
+            except OSError:
+                with self.objLock:
+                    if objSock in self.lstTrackers:
+                        self.lstTrackers.remove(objSock)
+
+    def encodeHex(self, strText):
+        byteText = strText.encode("utf-8")
+        return b"%04x" % len(byteText) + byteText
+
+    def readExact(self, objSock, nLength):
+        byteData = b""
+        while len(byteData) < nLength:
+            byteChunk = objSock.recv(nLength - len(byteData))
+            if not byteChunk:
+                raise EOFError
+            byteData += byteChunk
+        return byteData
+
+    def readRequest(self, objSock):
+        nLength = int(self.readExact(objSock, 4), 16)
+        return self.readExact(objSock, nLength).decode("utf-8")
+
+    def fail(self, objSock, strMessage):
+        objSock.sendall(b"FAIL" + self.encodeHex(strMessage))
+
+    def serveConnection(self, objSock):
+        """
+        * Answer host requests until a transport switch, then run one device service
+        """
+        strSerial = None
+        try:
+            while True:
+                strRequest = self.readRequest(objSock)
+                self.lstRequests.append(strRequest)
+                if strRequest == "host:version":
+                    objSock.sendall(b"OKAY" + self.encodeHex("%04x" % ADB_SERVER_VERSION))
+                    return
+                if strRequest in ("host:devices", "host:devices-l"):
+                    objSock.sendall(b"OKAY" + self.encodeHex(self.devicesText()))
+                    return
+                if strRequest == "host:track-devices":
+                    with self.objLock:
+                        self.lstTrackers.append(objSock)
+                    objSock.sendall(b"OKAY" + self.encodeHex(self.devicesText()))
+                    while objSock.recv(1024):
+                        pass
+                    return
+                if strRequest == "host:kill":
+                    objSock.sendall(b"OKAY")
+                    return
+                if strRequest == "host:features" or (strRequest.startswith("host-serial:") and strRequest.endswith(":features")):
+                    strFeatures = "shell_v2,cmd" if self.bShellV2 else "cmd"
+                    objSock.sendall(b"OKAY" + self.encodeHex(strFeatures))
+                    return
+                if strRequest.startswith("host:transport"):
+                    with self.objLock:
+                        lstReady = [s for s, st in self.dictDevices.items() if st == "device"]
+                    if strRequest == "host:transport-any":
+                        if len(lstReady) != 1:
+                            self.fail(objSock, "no devices/emulators found" if not lstReady else "more than one device/emulator")
+                            return
+                        strSerial = lstReady[0]
+                    else:
+                        strSerial = strRequest.split(":", 2)[2]
+                        if strSerial not in lstReady:
+                            self.fail(objSock, f"device '{strSerial}' not found")
+                            return
+                    objSock.sendall(b"OKAY")
+                    continue
+                if strSerial is None:
+                    self.fail(objSock, f"unknown host service {strRequest}")
+                    return
+                if self.fLatency > 0:
+                    time.sleep(self.fLatency)
+                self.serveDeviceService(objSock, strSerial, strRequest)
+                return
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self.objLock:
+                if objSock in self.lstTrackers:
+                    self.lstTrackers.remove(objSock)
+
+    def runShell(self, strSerial, strCommand):
+        """
+        * @return Tuple (exit status, output bytes/text or iterable of chunks) for one device command
+        """
+        if strCommand in self.dictShellResponses:
+            objResponse = self.dictShellResponses[strCommand]
+            nStatus, objOutput = objResponse if isinstance(objResponse, tuple) else (0, objResponse)
+        elif strCommand.startswith("cat ") and strCommand[4:].strip() in self.dictFiles:
+            nStatus, objOutput = 0, self.dictFiles[strCommand[4:].strip()]
+        elif self.fnShell is not None:
+            nStatus, objOutput = self.fnShell(strSerial, strCommand)
+        else:
+            objResult = subprocess.run(["sh", "-c", strCommand], capture_output=True)
+            nStatus, objOutput = objResult.returncode, objResult.stdout + objResult.stderr
+        return nStatus, objOutput
+
+    def iterChunks(self, objOutput):
+        """
+        * @param objOutput Output bytes/text, or an iterable of chunks for streamed output
+        * @return Iterator of byte chunks
+        """
+        if isinstance(objOutput, (bytes, str)):
+            objOutput = [objOutput]
+        for objChunk in objOutput:
+            yield objChunk.encode("utf-8") if isinstance(objChunk, str) else objChunk
+
+    def serveDeviceService(self, objSock, strSerial, strRequest):
+        if strRequest.startswith("shell,v2,") or strRequest.startswith("shell,raw,v2"):
+            objSock.sendall(b"OKAY")
+            nStatus, objOutput = self.runShell(strSerial, strRequest.split(":", 1)[1])
+            for byteChunk in self.iterChunks(objOutput):
+                if byteChunk:
+                    objSock.sendall(struct.pack("<BI", SHELL_ID_STDOUT, len(byteChunk)) + byteChunk)
+            objSock.sendall(struct.pack("<BIB", SHELL_ID_EXIT, 1, nStatus & 0xff))
+        elif strRequest.startswith("shell:") or strRequest.startswith("exec:"):
+            objSock.sendall(b"OKAY")
+            if self.fnExec is not None and self.fnExec(strSerial, strRequest.split(":", 1)[1], objSock):
+                return
+            nStatus, objOutput = self.runShell(strSerial, strRequest.split(":", 1)[1])
+            for byteChunk in self.iterChunks(objOutput):
+                objSock.sendall(byteChunk)
+        elif strRequest == "root:":
+            objSock.sendall(b"OKAY" + b"adbd is already running as root\n")
+        elif strRequest == "sync:":
+            objSock.sendall(b"OKAY")
+            self.serveSync(objSock)
+        else:
+            self.fail(objSock, f"unknown device service {strRequest}")
+
+    def serveSync(self, objSock):
+        while True:
+            byteHeader = self.readExact(objSock, 8)
+            byteId, nLength = byteHeader[:4], struct.unpack("<I", byteHeader[4:])[0]
+            if byteId == b"QUIT":
+                return
+            strPath = self.readExact(objSock, nLength).decode("utf-8")
+            if byteId == b"STAT":
+                byteData = self.dictFiles.get(strPath)
+                if byteData is None:
+                    objSock.sendall(b"STAT" + struct.pack("<III", 0, 0, 0))
+                else:
+                    objSock.sendall(b"STAT" + struct.pack("<III", 0o100644, len(byteData), int(time.time())))
+            elif byteId == b"SEND":
+                strPath = strPath.rsplit(",", 1)[0]
+                lstChunks = []
+                while True:
+                    byteChunkHeader = self.readExact(objSock, 8)
+                    nChunkLength = struct.unpack("<I", byteChunkHeader[4:])[0]
+                    if byteChunkHeader[:4] == b"DONE":
+                        break
+                    lstChunks.append(self.readExact(objSock, nChunkLength))
+                self.dictFiles[strPath] = b"".join(lstChunks)
+                objSock.sendall(b"OKAY" + struct.pack("<I", 0))
+            elif byteId == b"RECV":
+                byteData = self.dictFiles.get(strPath)
+                if byteData is None:
+                    byteMessage = b"No such file or directory"
+                    objSock.sendall(b"FAIL" + struct.pack("<I", len(byteMessage)) + byteMessage)
+                    continue
+                for nOffset in range(0, len(byteData), SYNC_DATA_MAX):
+                    byteChunk = byteData[nOffset:nOffset + SYNC_DATA_MAX]
+                    objSock.sendall(b"DATA" + struct.pack("<I", len(byteChunk)) + byteChunk)
+                objSock.sendall(b"DONE" + struct.pack("<I", 0))
+            else:
+                byteMessage = b"unknown sync request"
+                objSock.sendall(b"FAIL" + struct.pack("<I", len(byteMessage)) + byteMessage)
+                return
+
+class FakeAtModem:
+    """
+    * Modem AT port behind the AtClient tty bridge, for FakeAdbServer(fnExec=...)
+    * Answers each received command line from a response table; unknown
+    * commands get ERROR. A response is a list of lines sent after the echo,
+    * entries ('sleep', seconds) pause like a measurement in progress
+    """
+    def __init__(self, dictResponses=None, bEcho=True, lstUnsolicited=None, strTty="/dev/ttyUSB2"):
+        """
+        * @param dictResponses Command to list of reply lines, e.g. {"AT": ["OK"]}
+        * @param bEcho Echo each command line back like a modem with ATE1
+        * @param lstUnsolicited Lines sent as soon as the stream opens (boot URCs)
+        * @param strTty Only exec commands mentioning this tty are served
+        """
+        self.dictResponses = dict(dictResponses or {})
+        self.bEcho = bEcho
+        self.lstUnsolicited = list(lstUnsolicited or [])
+        self.strTty = strTty
+        self.lstCommands = []
+
+    def __call__(self, strSerial, strCommand, objSock):
+        if self.strTty not in strCommand:
+            return False
+        for strLine in self.lstUnsolicited:
+            objSock.sendall(f"\r\n{strLine}\r\n".encode("ascii"))
+        byteBuffer = b""
+        while True:
+            byteChunk = objSock.recv(4096)
+            if not byteChunk:
+                return True
+            byteBuffer += byteChunk
+            while b"\r" in byteBuffer:
+                byteLine, byteBuffer = byteBuffer.split(b"\r", 1)
+                strAtCommand = byteLine.strip().decode("ascii", errors="replace")
+                if not strAtCommand:
+                    continue
+                self.lstCommands.append(strAtCommand)
+                if self.bEcho:
+                    objSock.sendall(strAtCommand.encode("ascii") + b"\r\r\n")
+                for objReply in self.dictResponses.get(strAtCommand, ["ERROR"]):
+                    if isinstance(objReply, tuple) and objReply[0] == 'sleep':
+                        time.sleep(objReply[1])
+                        continue
+                    objSock.sendall(f"{objReply}\r\n".encode("ascii"))
+
+def main():
+    objParser = argparse.ArgumentParser(description="CT1 fake adb server (smart-socket protocol)")
+    objParser.add_argument("--port", type=int, default=5037, help="Port on 127.0.0.1 (default: 5037)")
+    objParser.add_argument("--device", action="append", help="Serial of a simulated device (repeatable)")
+    objParser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every device service")
+    objArgs = objParser.parse_args()
+    dictDevices = {strSerial: "device" for strSerial in (objArgs.device or ["FAKE0001"])}
+    objServer = FakeAdbServer(objArgs.port, dictDevices, fLatency=objArgs.latency)
+    nPort = objServer.start()
+    print(f"Fake adb server listening on 127.0.0.1:{nPort} with {', '.join(dictDevices)}", flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        objServer.stop()
+        print(f"Requests served: {len(objServer.lstRequests)}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import random
+import re
+import select
+import sys
+import threading
+import time
+import tty
+
+from uartsession import UART_RESPONSES
+
+class FixtureSimulator:
+    """
+    * Test fixture simulator on a Linux pseudo-terminal
+    * Speaks the REQ_* / RES_*_OK protocol so sendUartCommand, UART macros and
+    * atpfwdlProcess (its upgrade_tool/adb steps stubbed through dictSteps) can run
+    * without a physical fixture; sarfProcess also needs the IQxel and GPIB instruments
+    * Latency, jitter, dropped responses and garbage bytes are configurable
+    """
+    def __init__(self, fLatency=0.005, fJitter=0.0, fDropRate=0.0, fGarbageRate=0.0, nSeed=None,
+                 dictResponses=None, strLineEnding="\r\n"):
+        """
+        * @param fLatency Base delay in seconds before a response is written
+        * @param fJitter Maximum extra delay in seconds, drawn uniformly per response
+        * @param fDropRate Probability (0-1) that a command gets no response
+        * @param fGarbageRate Probability (0-1) that random bytes precede a response
+        * @param nSeed Random seed for reproducible runs
+        * @param dictResponses Command to response mapping, UART_RESPONSES by default
+        * @param strLineEnding Terminator appended to each response
+        """
+        self.fLatency = fLatency
+        self.fJitter = fJitter
+        self.fDropRate = fDropRate
+        self.fGarbageRate = fGarbageRate
+        self.objRandom = random.Random(nSeed)
+        self.dictResponses = dict(dictResponses or UART_RESPONSES)
+        self.strLineEnding = strLineEnding
+        self.objCommandPattern = re.compile(
+            "|".join(re.escape(strCommand) for strCommand in sorted(self.dictResponses, key=len, reverse=True)).encode("ascii")
+        )
+        self.nMasterFd = None
+        self.nSlaveFd = None
+        self.strPortName = None
+        self.objThread = None
+        self.objStopEvent = threading.Event()
+        self.lstReceived = []
+        self.nDropped = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, objExcType, objExcValue, objTraceback):
+        self.stop()
+        return False
+
+    def start(self):
+        """
+        * Create the pseudo-terminal and start serving commands
+        *
+        * @return Device path of the simulated port (e.g. /dev/pts/5)
+        """
+        self.nMasterFd, self.nSlaveFd = os.openpty()
+        tty.setraw(self.nSlaveFd)
+        self.strPortName = os.ttyname(self.nSlaveFd)
+        self.objStopEvent.clear()
+        self.objThread = threading.Thread(target=self.serveLoop, name="FixtureSimulator")
+        self.objThread.daemon = True
+        self.objThread.start()
+        return self.strPortName
+
+    def stop(self):
+        """
+        * Stop serving and close the pseudo-terminal
+        """
+        self.objStopEvent.set()
+        if self.objThread is not None:
+            self.objThread.join(timeout=1.0)
+            self.objThread = None
+        for nFd in (self.nMasterFd, self.nSlaveFd):
+            if nFd is not None:
+                try:
+                    os.close(nFd)
+                except OSError:
+                    pass
+        self.nMasterFd = self.nSlaveFd = None
+
+    def serveLoop(self):
+        """
+        * Read commands from the master side and answer each one in order
+        * Commands carry no terminator, so complete known command names are matched
+        """
+        byteBuffer = b""
+        while not self.objStopEvent.is_set():
+            lstReady, _, _ = select.select([self.nMasterFd], [], [], 0.05)
+            if not lstReady:
+                continue
+            try:
+                byteChunk = os.read(self.nMasterFd, 4096)
+            except OSError:
+                break
+            if not byteChunk:
+                continue
+            byteBuffer += byteChunk
+            while True:
+                objMatch = self.objCommandPattern.search(byteBuffer)
+                if not objMatch:
+                    byteBuffer = byteBuffer[-32:]
+                    break
+                byteBuffer = byteBuffer[objMatch.end():]
+                self.respond(objMatch.group(0).decode("ascii"))
+
+    def respond(self, strCommand):
+        """
+        * Answer one command, applying latency, jitter, drops and garbage
+        *
+        * @param strCommand Command name received from the host
+        """
+        self.lstReceived.append((time.monotonic(), strCommand))
+        fDelay = self.fLatency + (self.objRandom.uniform(0, self.fJitter) if self.fJitter > 0 else 0.0)
+        if fDelay > 0:
+            time.sleep(fDelay)
+        if self.objRandom.random() < self.fDropRate:
+            self.nDropped += 1
+            return
+        byteReply = b""
+        if self.objRandom.random() < self.fGarbageRate:
+            byteReply += bytes(self.objRandom.randint(0x80, 0xff) for _ in range(self.objRandom.randint(1, 8)))
+        byteReply += (self.dictResponses[strCommand] + self.strLineEnding).encode("ascii")
+        try:
+            os.write(self.nMasterFd, byteReply)
+        except OSError:
+            pass
+
+def main():
+    objParser = argparse.ArgumentParser(description="CT1 UART fixture simulator (Linux pty)")
+    objParser.add_argument("--latency", type=float, default=0.005, help="Response delay in seconds (default: 0.005)")
+    objParser.add_argument("--jitter", type=float, default=0.0, help="Maximum extra random delay in seconds")
+    objParser.add_argument("--drop", type=float, default=0.0, help="Probability of not answering a command")
+    objParser.add_argument("--garbage", type=float, default=0.0, help="Probability of garbage bytes before a response")
+    objParser.add_argument("--seed", type=int, help="Random seed")
+    objArgs = objParser.parse_args()
+    objSimulator = FixtureSimulator(objArgs.latency, objArgs.jitter, objArgs.drop, objArgs.garbage, objArgs.seed)
+    strPortName = objSimulator.start()
+    print(f"Fixture simulator listening on {strPortName}", flush=True)
+    print("Drive a fixture sequence against it (tests/test_fixturesim.py runs the ATPFWDL flow):", flush=True)
+    print(f"  python -c \"from common import runUartSequence; "
+          f"print(runUartSequence('{strPortName}', 'atpfwdl_boot'))\"", flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        objSimulator.stop()
+        print(f"Commands received: {len(objSimulator.lstReceived)}, dropped: {objSimulator.nDropped}")
+
+if __name__ == "__main__":
+    sys.exit(main())
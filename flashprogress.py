@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+import re
+import threading
+import time
+
+from eventlog import logEvent
+
+STAGE_EVENT_PATTERN = re.compile(r"^(?P<stage>[A-Z][\w ]*?)\s+(?P<event>Start|Success|Fail(?:ed)?)\b", re.IGNORECASE)
+PERCENT_PATTERN = re.compile(r"^(?P<stage>[A-Z][\w ]*?)\.*\s*\((?P<percent>\d{1,3})%\)")
+BYTES_PATTERN = re.compile(r"^(?P<stage>[A-Z][\w ]*?)\s*Total\((?P<total>\d+)K\),\s*Current\((?P<current>\d+)K\)")
+
+class FlashProgress:
+    """
+    * Structured view of an upgrade_tool UF run built from its output lines
+    * Understands "<Stage> Start/Success/Fail" banners, "<Stage>... (NN%)" redraws
+    * and "<Stage> Total(NK),Current(NK)" counters (nested in a banner, e.g.
+    * Download Image inside Download Firmware); derives bytes/s and ETA (from the
+    * image size when only a percentage is printed), keeps the timing of every
+    * stage and flags a stall when a percentage stage stops moving
+    """
+    def __init__(self, nTotalBytes=None, fStallSeconds=None, strLocationId=None, nEventStep=10):
+        """
+        * @param nTotalBytes Bytes a 100% stage moves (firmware region size), None if unknown
+        * @param fStallSeconds Seconds without progress in a percentage stage before isStalled(), None to disable
+        * @param strLocationId Board location copied into the logged events
+        * @param nEventStep Percentage step between flash_progress events
+        """
+        self.nTotalBytes = nTotalBytes
+        self.fStallSeconds = fStallSeconds
+        self.strLocationId = strLocationId
+        self.nEventStep = nEventStep
+        self.objLock = threading.Lock()
+        self.strBanner = None
+        self.fBannerStart = None
+        self.strStage = None
+        self.fStageStart = None
+        self.nPercent = None
+        self.nBytes = None
+        self.nStageTotal = None
+        self.fRate = None
+        self.fEta = None
+        self.fLastProgress = time.monotonic()
+        self.nLastEventPercent = None
+        self.lstRateSamples = []
+        self.lstStageTimes = []
+
+    def feed(self, strLine):
+        """
+        * Update the state from one output line
+        """
+        strLine = strLine.strip()
+        fNow = time.monotonic()
+        with self.objLock:
+            objMatch = BYTES_PATTERN.match(strLine)
+            if objMatch:
+                self.enterStage(objMatch.group("stage"), fNow)
+                self.nStageTotal = int(objMatch.group("total")) * 1024
+                nBytes = int(objMatch.group("current")) * 1024
+                self.updateProgress(nBytes, nBytes * 100 // self.nStageTotal if self.nStageTotal else None, fNow)
+                return
+            objMatch = PERCENT_PATTERN.match(strLine)
+            if objMatch:
+                self.enterStage(objMatch.group("stage"), fNow)
+                self.nStageTotal = self.nTotalBytes
+                nPercent = int(objMatch.group("percent"))
+                nBytes = self.nTotalBytes * nPercent // 100 if self.nTotalBytes else None
+                self.updateProgress(nBytes, nPercent, fNow)
+                return
+            objMatch = STAGE_EVENT_PATTERN.match(strLine)
+            if objMatch:
+                strBanner = objMatch.group("stage")
+                bOk = objMatch.group("event").lower() == "success"
+                if objMatch.group("event").lower() == "start":
+                    if self.strBanner is not None:
+                        self.endBanner(fNow, True)
+                    self.strBanner = strBanner
+                    self.fBannerStart = fNow
+                    self.fLastProgress = fNow
+                elif strBanner == self.strBanner:
+                    self.endBanner(fNow, bOk)
+
+    def enterStage(self, strStage, fNow):
+        """
+        * Open a percentage stage; it nests inside the current Start/Success banner
+        """
+        if strStage == self.strStage:
+            return
+        if self.strStage is not None:
+            self.endStage(fNow, True)
+        self.strStage = strStage
+        self.fStageStart = fNow
+        self.fLastProgress = fNow
+        self.nPercent = self.nBytes = self.fRate = self.fEta = None
+        self.nLastEventPercent = None
+        self.lstRateSamples = []
+
+    def endStage(self, fNow, bOk):
+        self.recordStage(self.strStage, fNow - self.fStageStart, bOk, self.fRate)
+        self.strStage = None
+
+    def endBanner(self, fNow, bOk):
+        if self.strStage is not None:
+            self.endStage(fNow, bOk)
+        self.recordStage(self.strBanner, fNow - self.fBannerStart, bOk, None)
+        self.strBanner = None
+
+    def recordStage(self, strStage, fDuration, bOk, fRate):
+        self.lstStageTimes.append((strStage, fDuration, bOk))
+        logEvent("flash_stage", stage=strStage, loc=self.strLocationId, ok=bOk, dur=round(fDuration, 3),
+                 bytes_per_s=round(fRate) if fRate else None)
+
+    def updateProgress(self, nBytes, nPercent, fNow):
+        if nPercent is not None and (self.nPercent is None or nPercent > self.nPercent):
+            self.fLastProgress = fNow
+        elif nBytes is not None and (self.nBytes is None or nBytes > self.nBytes):
+            self.fLastProgress = fNow
+        self.nPercent = nPercent
+        self.nBytes = nBytes
+        if nBytes is not None:
+            self.lstRateSamples.append((fNow, nBytes))
+            fSpan = fNow - self.lstRateSamples[0][0]
+            if fSpan > 0:
+                self.fRate = (nBytes - self.lstRateSamples[0][1]) / fSpan
+                if self.fRate > 0 and self.nStageTotal:
+                    self.fEta = max(0.0, (self.nStageTotal - nBytes) / self.fRate)
+            if len(self.lstRateSamples) > 32:
+                del self.lstRateSamples[:16]
+        if nPercent is not None and (self.nLastEventPercent is None
+                                     or nPercent >= self.nLastEventPercent + self.nEventStep or nPercent == 100):
+            if nPercent != self.nLastEventPercent:
+                self.nLastEventPercent = nPercent
+                logEvent("flash_progress", stage=self.strStage, loc=self.strLocationId, percent=nPercent,
+                         bytes_per_s=round(self.fRate) if self.fRate else None,
+                         eta=round(self.fEta, 1) if self.fEta is not None else None)
+
+    def finish(self, bOk):
+        """
+        * Close the stage still open when the command ends
+        """
+        with self.objLock:
+            if self.strBanner is not None:
+                self.endBanner(time.monotonic(), bOk)
+            elif self.strStage is not None:
+                self.endStage(time.monotonic(), bOk)
+
+    def isStalled(self):
+        """
+        * @return True when a percentage stage has not advanced for fStallSeconds
+        """
+        if self.fStallSeconds is None:
+            return False
+        with self.objLock:
+            return self.strStage is not None and time.monotonic() - self.fLastProgress > self.fStallSeconds
+
+    def getSnapshot(self):
+        """
+        * @return Dict with stage, percent, bytes_per_s and eta (None where unknown)
+        """
+        with self.objLock:
+            return {"stage": self.strStage or self.strBanner, "percent": self.nPercent, "bytes_per_s": self.fRate,
+                    "eta": self.fEta}
+
+    def describe(self):
+        """
+        * @return Short progress text, e.g. "Download Image 45% 21.3 MB/s ETA 12 s"
+        """
+        dictSnapshot = self.getSnapshot()
+        if dictSnapshot["stage"] is None:
+            return "starting" if not self.lstStageTimes else self.lstStageTimes[-1][0] + " done"
+        strText = dictSnapshot["stage"]
+        if dictSnapshot["percent"] is not None:
+            strText += f" {dictSnapshot['percent']}%"
+        if dictSnapshot["bytes_per_s"]:
+            strText += f" {dictSnapshot['bytes_per_s'] / 1e6:.1f} MB/s"
+        if dictSnapshot["eta"] is not None:
+            strText += f" ETA {dictSnapshot['eta']:.0f} s"
+        return strText
+
+    def formatStageTimes(self):
+        """
+        * @return One line per finished stage with its duration
+        """
+        return [f"{strStage:<24} {fDuration:>7.1f} s{'' if bOk else '  FAILED'}"
+                for strStage, fDuration, bOk in self.lstStageTimes]
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+import queue
+import re
+import threading
+import time
+
+from eventlog import logEvent
+from flashprogress import FlashProgress
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_PASS = "pass"
+JOB_FAIL = "fail"
+
+DEVICE_LIST_PATTERN = re.compile(
+    r"DevNo=(?P<devno>\d+)\s+Vid=0x(?P<vid>[0-9a-fA-F]+),\s*Pid=0x(?P<pid>[0-9a-fA-F]+),\s*"
+    r"LocationID=(?P<location>\w+)\s+Mode=(?P<mode>\w+)"
+)
+
+class RockusbDevice:
+    """
+    * One board as listed by `upgrade_tool LD`
+    """
+    def __init__(self, nDevNo, nVid, nPid, strLocationId, strMode):
+        """
+        * @param nDevNo Device number in the LD listing (changes between listings)
+        * @param nVid USB vendor id
+        * @param nPid USB product id
+        * @param strLocationId upgrade_tool LocationID (USB port, stable while the board stays plugged)
+        * @param strMode Maskrom or Loader
+        """
+        self.nDevNo = nDevNo
+        self.nVid = nVid
+        self.nPid = nPid
+        self.strLocationId = strLocationId
+        self.strMode = strMode
+
+    def __repr__(self):
+        return f"RockusbDevice(DevNo={self.nDevNo}, LocationID={self.strLocationId}, {self.strMode})"
+
+def parseDeviceList(lstLines):
+    """
+    * Parse `upgrade_tool LD` output
+    *
+    * @param lstLines Output lines of the LD command
+    * @return List of RockusbDevice in listing order
+    """
+    lstDevices = []
+    for strLine in lstLines:
+        objMatch = DEVICE_LIST_PATTERN.search(strLine)
+        if objMatch:
+            lstDevices.append(RockusbDevice(
+                int(objMatch.group("devno")), int(objMatch.group("vid"), 16), int(objMatch.group("pid"), 16),
+                objMatch.group("location"), objMatch.group("mode")
+            ))
+    return lstDevices
+
+class FlashJob:
+    """
+    * State of one board's flash: verdict, timing and the upgrade_tool progress
+    """
+    def __init__(self, objDevice):
+        self.objDevice = objDevice
+        self.strState = JOB_PENDING
+        self.strError = None
+        self.fStart = None
+        self.fEnd = None
+        self.objProgress = FlashProgress(strLocationId=objDevice.strLocationId)
+
+    @property
+    def fDuration(self):
+        if self.fStart is None:
+            return 0.0
+        return (self.fEnd or time.monotonic()) - self.fStart
+
+    def describe(self):
+        """
+        * @return Short progress text, e.g. "Download Image 45% 21.3 MB/s ETA 12 s"
+        """
+        if self.strState != JOB_RUNNING:
+            return self.strState
+        return self.objProgress.describe()
+
+class FlashScheduler:
+    """
+    * Flashes several boards at once from a pool of nMaxParallel worker threads
+    * Workers take boards from a FIFO queue, so flashes start in listing order and
+    * a shared USB host controller or hub is not oversubscribed
+    * Progress of all running boards is printed as one line every fReportInterval
+    """
+    def __init__(self, fnFlash, nMaxParallel=4, fReportInterval=5.0):
+        """
+        * @param fnFlash Callable (RockusbDevice, FlashProgress) -> success, flashing one board
+        *        and feeding its output lines to the FlashProgress
+        * @param nMaxParallel Maximum number of boards flashed at the same time
+        * @param fReportInterval Seconds between progress lines
+        """
+        self.fnFlash = fnFlash
+        self.nMaxParallel = max(1, int(nMaxParallel))
+        self.fReportInterval = fReportInterval
+
+    def runJob(self, objJob):
+        objJob.fStart = time.monotonic()
+        objJob.strState = JOB_RUNNING
+        print(f"[{objJob.objDevice.strLocationId}] Flash started", flush=True)
+        try:
+            bOk = self.fnFlash(objJob.objDevice, objJob.objProgress)
+        except Exception as e:
+            bOk = False
+            objJob.strError = str(e)
+        objJob.fEnd = time.monotonic()
+        objJob.strState = JOB_PASS if bOk else JOB_FAIL
+        print(f"[{objJob.objDevice.strLocationId}] Flash {objJob.strState.upper()} in {objJob.fDuration:.1f} s"
+              + (f": {objJob.strError}" if objJob.strError else ""), flush=True)
+        logEvent("flash_device", loc=objJob.objDevice.strLocationId, devno=objJob.objDevice.nDevNo,
+                 ok=objJob.strState == JOB_PASS, dur=round(objJob.fDuration, 3))
+
+    def workerLoop(self, objQueue):
+        """
+        * Flash queued jobs one after another until the queue is empty
+        """
+        while True:
+            try:
+                objJob = objQueue.get_nowait()
+            except queue.Empty:
+                return
+            self.runJob(objJob)
+
+    def run(self, lstDevices):
+        """
+        * Flash every device and wait for all of them
+        *
+        * @param lstDevices List of RockusbDevice
+        * @return List of FlashJob in the order of lstDevices
+        """
+        lstJobs = [FlashJob(objDevice) for objDevice in lstDevices]
+        objQueue = queue.Queue()
+        for objJob in lstJobs:
+            objQueue.put(objJob)
+        lstThreads = []
+        for nWorker in range(min(self.nMaxParallel, len(lstJobs))):
+            objThread = threading.Thread(target=self.workerLoop, args=(objQueue,), name=f"Flash-{nWorker}")
+            objThread.daemon = True
+            objThread.start()
+            lstThreads.append(objThread)
+        fNextReport = time.monotonic() + self.fReportInterval
+        for objThread in lstThreads:
+            while objThread.is_alive():
+                objThread.join(timeout=max(0.0, min(0.5, fNextReport - time.monotonic())))
+                if time.monotonic() >= fNextReport:
+                    print("Flash progress: " + " | ".join(
+                        f"{objJob.objDevice.strLocationId} {objJob.describe()}" for objJob in lstJobs), flush=True)
+                    fNextReport += self.fReportInterval
+        return lstJobs
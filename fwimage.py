@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+
+RKFW_HEADER = struct.Struct("<4sHIIH5BIIIIIIIII")  # head, head_len, version, code, date, chip, loader/image/extra fields
+RKAF_HEADER = struct.Struct("<4sI34s30s56sIII")   # magic, length, model, id, manufacturer, unknown, version, num_parts
+RKAF_PART = struct.Struct("<32s60sIIIII")         # name, file, nand_size, pos, nand_addr, padded_size, size
+RKAF_HEADER_SIZE = 2048
+RKAF_MAX_PARTS = 16
+MD5_TRAILER_SIZE = 32
+IMAGE_INDEX_NAME = "ct1_image_index.json"
+
+def formatVersion(nVersion):
+    """
+    * @return Rockchip firmware version text, e.g. 0x08010000 -> "8.1.0"
+    """
+    return f"{(nVersion >> 24) & 0xff}.{(nVersion >> 16) & 0xff}.{nVersion & 0xffff}"
+
+def parseVersion(strVersion):
+    lstParts = [int(strPart) for strPart in strVersion.split(".")]
+    return (lstParts[0] << 24) | (lstParts[1] << 16) | lstParts[2]
+
+def decodeText(byteValue):
+    return byteValue.split(b"\0", 1)[0].decode("ascii", errors="replace")
+
+def parseUpdateImage(strPath):
+    """
+    * Parse and sanity-check the RKFW header and the RKAF partition table of a
+    * Rockchip update.img; only the first few KB are read
+    *
+    * @param strPath Image file path
+    * @return Dict with version, chip, build time, region offsets and the partition list
+    * @raise ValueError When the image is truncated or a header is inconsistent
+    """
+    nFileSize = os.path.getsize(strPath)
+    with open(strPath, "rb") as objFile:
+        byteHeader = objFile.read(RKFW_HEADER.size)
+        if len(byteHeader) < RKFW_HEADER.size:
+            raise ValueError(f"file too small for an RKFW header ({nFileSize} bytes)")
+        tupHeader = RKFW_HEADER.unpack(byteHeader)
+        if tupHeader[0] != b"RKFW":
+            raise ValueError(f"bad magic {tupHeader[0]!r}, not a Rockchip update image")
+        (nHeadLen, nVersion, _, nYear, nMonth, nDay, nHour, nMinute, nSecond, nChip,
+         nLoaderOffset, nLoaderLength, nImageOffset, nImageLength) = tupHeader[1:15]
+        if nLoaderOffset < nHeadLen or nLoaderOffset + nLoaderLength > nFileSize:
+            raise ValueError(f"loader region {nLoaderOffset}+{nLoaderLength} outside the {nFileSize} byte file")
+        if nImageOffset < nHeadLen or nImageOffset + nImageLength > nFileSize:
+            raise ValueError(f"firmware region {nImageOffset}+{nImageLength} outside the {nFileSize} byte file "
+                             f"(truncated image?)")
+        objFile.seek(nImageOffset)
+        byteAfp = objFile.read(RKAF_HEADER_SIZE)
+    if len(byteAfp) < RKAF_HEADER_SIZE:
+        raise ValueError("firmware region too small for an RKAF header")
+    tupAfp = RKAF_HEADER.unpack_from(byteAfp)
+    if tupAfp[0] != b"RKAF":
+        raise ValueError(f"bad firmware magic {tupAfp[0]!r} at offset {nImageOffset}")
+    nAfpLength, nParts = tupAfp[1], tupAfp[7]
+    if nAfpLength > nImageLength:
+        raise ValueError(f"RKAF length {nAfpLength} exceeds the firmware region ({nImageLength})")
+    if nParts == 0 or nParts > RKAF_MAX_PARTS:
+        raise ValueError(f"bad partition count {nParts}")
+    lstPartitions = []
+    for nIdx in range(nParts):
+        strName, strFile, nNandSize, nPos, nNandAddr, nPaddedSize, nSize = \
+            RKAF_PART.unpack_from(byteAfp, RKAF_HEADER.size + nIdx * RKAF_PART.size)
+        strName, strFile = decodeText(strName), decodeText(strFile)
+        if strFile not in ("SELF", "RESERVED") and nPos + nSize > nAfpLength:
+            raise ValueError(f"partition {strName} ({nPos}+{nSize}) runs past the RKAF end ({nAfpLength})")
+        lstPartitions.append({
+            "name": strName, "file": strFile, "offset": nImageOffset + nPos, "size": nSize,
+            "flash_address": nNandAddr, "flash_size": nNandSize,
+        })
+    return {
+        "version": formatVersion(nVersion),
+        "firmware_version": formatVersion(tupAfp[6]),
+        "chip": f"0x{nChip:08x}",
+        "model": decodeText(tupAfp[2]),
+        "manufacturer": decodeText(tupAfp[4]),
+        "build_time": f"{nYear:04d}-{nMonth:02d}-{nDay:02d} {nHour:02d}:{nMinute:02d}:{nSecond:02d}",
+        "loader_offset": nLoaderOffset, "loader_length": nLoaderLength,
+        "image_offset": nImageOffset, "image_length": nImageLength,
+        "partitions": lstPartitions,
+    }
+
+def checkImageMd5(strPath, nChunkSize=4 * 1024 * 1024):
+    """
+    * Hash the whole image and compare it with the MD5 trailer rkImageMaker appends
+    *
+    * @return Tuple (computed md5 hex, trailer md5 hex or None when the image has no trailer)
+    """
+    nFileSize = os.path.getsize(strPath)
+    nDataSize = nFileSize - MD5_TRAILER_SIZE
+    objMd5 = hashlib.md5()
+    with open(strPath, "rb") as objFile:
+        nRemaining = nDataSize
+        while nRemaining > 0:
+            byteChunk = objFile.read(min(nChunkSize, nRemaining))
+            if not byteChunk:
+                break
+            objMd5.update(byteChunk)
+            nRemaining -= len(byteChunk)
+        byteTrailer = objFile.read(MD5_TRAILER_SIZE)
+    return objMd5.hexdigest(), parseMd5Trailer(byteTrailer)
+
+def parseMd5Trailer(byteTrailer):
+    """
+    * @return Trailer MD5 hex, or None when the last bytes are not an ASCII MD5
+    """
+    strTrailer = byteTrailer.decode("ascii", errors="replace").lower()
+    if len(strTrailer) != MD5_TRAILER_SIZE or any(c not in "0123456789abcdef" for c in strTrailer):
+        return None
+    return strTrailer
+
+class FirmwareImageIndex:
+    """
+    * Sidecar JSON index of validated images, stored next to them
+    * Entries are keyed by absolute path and only trusted while the file's mtime
+    * and size are unchanged, so the multi-GB checksum runs once per image file
+    """
+    def __init__(self, strIndexPath):
+        """
+        * @param strIndexPath JSON file holding the index
+        """
+        self.strIndexPath = strIndexPath
+        self.dictEntries = None
+        self.objLock = threading.Lock()
+
+    def load(self):
+        if self.dictEntries is None:
+            try:
+                with open(self.strIndexPath, "r", encoding="utf-8") as objFile:
+                    self.dictEntries = json.load(objFile)
+            except (OSError, ValueError):
+                self.dictEntries = {}
+        return self.dictEntries
+
+    def lookup(self, strPath, objStat):
+        """
+        * @return Cached entry for the path, or None if missing or the file changed
+        """
+        with self.objLock:
+            dictEntry = self.load().get(os.path.abspath(strPath))
+        if dictEntry and dictEntry.get("mtime_ns") == objStat.st_mtime_ns and dictEntry.get("size") == objStat.st_size:
+            return dictEntry
+        return None
+
+    def store(self, strPath, dictEntry):
+        """
+        * Add or replace an entry and rewrite the index atomically
+        """
+        with self.objLock:
+            self.load()[os.path.abspath(strPath)] = dictEntry
+            strTempPath = self.strIndexPath + ".tmp"
+            try:
+                with open(strTempPath, "w", encoding="utf-8") as objFile:
+                    json.dump(self.dictEntries, objFile, indent=1, sort_keys=True)
+                os.replace(strTempPath, self.strIndexPath)
+            except OSError as e:
+                print(f"Warning: Could not write image index {self.strIndexPath}: {str(e)}", flush=True)
+
+dictImageIndexes = {}
+objImageIndexesLock = threading.Lock()
+
+def getImageIndex(strImagePath):
+    """
+    * @return FirmwareImageIndex of the directory holding the image
+    """
+    strIndexPath = os.path.join(os.path.dirname(os.path.abspath(strImagePath)), IMAGE_INDEX_NAME)
+    with objImageIndexesLock:
+        if strIndexPath not in dictImageIndexes:
+            dictImageIndexes[strIndexPath] = FirmwareImageIndex(strIndexPath)
+        return dictImageIndexes[strIndexPath]
+
+def getImageInfo(strPath, bVerifyChecksum=True):
+    """
+    * Validate a firmware image and return its metadata, using the sidecar index
+    * The headers are always re-parsed (a few KB), so a wrong or truncated file is
+    * rejected in milliseconds; the full MD5 runs only when the index has no entry
+    * for the current mtime and size
+    *
+    * @param strPath Image file path
+    * @param bVerifyChecksum Hash the image against its MD5 trailer on an index miss
+    * @return Dict with version, chip, md5, size and partitions, or None if invalid
+    """
+    try:
+        objStat = os.stat(strPath)
+        dictInfo = parseUpdateImage(strPath)
+    except (OSError, ValueError) as e:
+        print(f"Error: Invalid firmware image {strPath}: {str(e)}", flush=True)
+        return None
+    objIndex = getImageIndex(strPath)
+    dictEntry = objIndex.lookup(strPath, objStat)
+    if dictEntry is not None:
+        if not dictEntry.get("valid", True):
+            print(f"Error: Invalid firmware image {strPath}: {dictEntry.get('error')} (cached)", flush=True)
+            return None
+        return dictEntry
+    if not bVerifyChecksum:
+        return dict(dictInfo, size=objStat.st_size)
+    fStart = time.monotonic()
+    strMd5, strTrailer = checkImageMd5(strPath)
+    print(f"Indexed firmware image {os.path.basename(strPath)} in {time.monotonic() - fStart:.1f} s", flush=True)
+    return storeImageChecksum(strPath, dictInfo, objStat, strMd5, strTrailer)
+
+def storeImageChecksum(strPath, dictInfo, objStat, strMd5, strTrailer):
+    """
+    * Record an image's computed MD5 in the sidecar index, e.g. one hashed while copying it
+    *
+    * @param strPath Image file path
+    * @param dictInfo Parsed headers from parseUpdateImage
+    * @param objStat os.stat of the file the MD5 was computed over
+    * @param strMd5 MD5 hex of everything before the trailer
+    * @param strTrailer Trailer MD5 hex, None when the image has no trailer
+    * @return Index entry, or None if the MD5 does not match the trailer
+    """
+    dictEntry = dict(dictInfo, mtime_ns=objStat.st_mtime_ns, size=objStat.st_size, md5=strMd5,
+                     md5_trailer=strTrailer, valid=True)
+    if strTrailer is not None and strTrailer != strMd5:
+        dictEntry.update(valid=False, error=f"MD5 mismatch (computed {strMd5}, trailer {strTrailer})")
+    getImageIndex(strPath).store(strPath, dictEntry)
+    if not dictEntry["valid"]:
+        print(f"Error: Invalid firmware image {strPath}: {dictEntry['error']}", flush=True)
+        return None
+    return dictEntry
+
+def hashRegion(objFile, nOffset, nSize, nChunkSize=4 * 1024 * 1024):
+    """
+    * @return SHA-256 hex digest of nSize bytes at nOffset of an open image
+    """
+    objFile.seek(nOffset)
+    objSha = hashlib.sha256()
+    nRemaining = nSize
+    while nRemaining > 0:
+        byteChunk = objFile.read(min(nChunkSize, nRemaining))
+        if not byteChunk:
+            raise ValueError(f"image ends inside the region {nOffset}+{nSize}")
+        objSha.update(byteChunk)
+        nRemaining -= len(byteChunk)
+    return objSha.hexdigest()
+
+def getPartitionHashes(strPath):
+    """
+    * SHA-256 of the loader and of every partition payload, cached in the sidecar index
+    *
+    * @param strPath Image file path (validated with getImageInfo first)
+    * @return Dict {"loader": hex, "partitions": {name: hex}}, or None if the image is invalid
+    """
+    dictInfo = getImageInfo(strPath)
+    if dictInfo is None:
+        return None
+    if "partition_sha256" in dictInfo:
+        return dictInfo["partition_sha256"]
+    fStart = time.monotonic()
+    try:
+        with open(strPath, "rb") as objFile:
+            dictHashes = {
+                "loader": hashRegion(objFile, dictInfo["loader_offset"], dictInfo["loader_length"]),
+                "partitions": {dictPart["name"]: hashRegion(objFile, dictPart["offset"], dictPart["size"])
+                               for dictPart in getFlashablePartitions(dictInfo)},
+            }
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not hash partitions of {strPath}: {str(e)}", flush=True)
+        return None
+    print(f"Hashed {len(dictHashes['partitions'])} partitions of {os.path.basename(strPath)} "
+          f"in {time.monotonic() - fStart:.1f} s", flush=True)
+    if "md5" in dictInfo:
+        getImageIndex(strPath).store(strPath, dict(dictInfo, partition_sha256=dictHashes))
+    return dictHashes
+
+def getFlashablePartitions(dictInfo):
+    """
+    * @return Partitions that carry a payload (not SELF, RESERVED or empty)
+    """
+    return [dictPart for dictPart in dictInfo["partitions"]
+            if dictPart["file"] not in ("SELF", "RESERVED") and dictPart["size"] > 0]
+
+def extractRegion(strPath, nOffset, nSize, strOutPath, nChunkSize=4 * 1024 * 1024):
+    """
+    * Copy one region of the image (loader or partition payload) to its own file
+    """
+    with open(strPath, "rb") as objInput, open(strOutPath, "wb") as objOutput:
+        objInput.seek(nOffset)
+        nRemaining = nSize
+        while nRemaining > 0:
+            byteChunk = objInput.read(min(nChunkSize, nRemaining))
+            if not byteChunk:
+                raise ValueError(f"image ends inside the region {nOffset}+{nSize}")
+            objOutput.write(byteChunk)
+            nRemaining -= len(byteChunk)
+
+def writeUpdateImage(strPath, lstPartitions, strVersion="1.0.0", nChip=0x33353638, byteLoader=b"\0" * 4096,
+                     nAlign=2048):
+    """
+    * Build a minimal RKFW/RKAF update image, for tests and benchmarks
+    *
+    * @param strPath Output path
+    * @param lstPartitions List of (name, data bytes or callable writing the data to a file, size)
+    * @param strVersion Firmware version for both headers
+    * @param nChip Chip code stored in the RKFW header
+    * @param byteLoader Loader blob placed before the RKAF region
+    * @param nAlign Alignment of partition data inside the RKAF region
+    """
+    nVersion = parseVersion(strVersion)
+    nImageOffset = RKFW_HEADER.size + 45 + len(byteLoader)
+    lstEntries = []
+    nPos = RKAF_HEADER_SIZE
+    for strName, objData, nSize in lstPartitions:
+        nPos = (nPos + nAlign - 1) // nAlign * nAlign
+        lstEntries.append((strName, objData, nSize, nPos))
+        nPos += nSize
+    nAfpLength = nPos
+    objMd5 = hashlib.md5()
+    with open(strPath, "wb") as objFile:
+        def write(byteData):
+            objMd5.update(byteData)
+            objFile.write(byteData)
+        objTime = time.gmtime()
+        write(RKFW_HEADER.pack(b"RKFW", RKFW_HEADER.size + 45, nVersion, 0x01030000, objTime.tm_year, objTime.tm_mon,
+                               objTime.tm_mday, objTime.tm_hour, objTime.tm_min, objTime.tm_sec, nChip,
+                               RKFW_HEADER.size + 45, len(byteLoader), nImageOffset, nAfpLength + 4, 0, 0, 0, 0)
+              + b"\0" * 45)
+        write(byteLoader)
+        byteAfp = bytearray(RKAF_HEADER_SIZE)
+        RKAF_HEADER.pack_into(byteAfp, 0, b"RKAF", nAfpLength, b"CT1", b"RK", b"CT1", 0, nVersion, len(lstEntries))
+        nFlashAddress = 0x2000
+        for nIdx, (strName, _, nSize, nPartPos) in enumerate(lstEntries):
+            nSectors = (nSize + 511) // 512
+            RKAF_PART.pack_into(byteAfp, RKAF_HEADER.size + nIdx * RKAF_PART.size, strName.encode("ascii"),
+                                f"Image/{strName}.img".encode("ascii"), nSectors, nPartPos, nFlashAddress,
+                                nSectors * 512, nSize)
+            nFlashAddress += nSectors
+        write(bytes(byteAfp))
+        nWritten = RKAF_HEADER_SIZE
+        for strName, objData, nSize, nPartPos in lstEntries:
+            write(b"\0" * (nPartPos - nWritten))
+            if callable(objData):
+                objData(write)
+            else:
+                write(objData)
+            nWritten = nPartPos + nSize
+        write(b"\0" * 4)  # RKAF CRC slot
+        objFile.write(objMd5.hexdigest().encode("ascii"))
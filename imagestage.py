@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+from eventlog import logEvent
+from fwimage import (MD5_TRAILER_SIZE, getImageIndex, getImageInfo, parseMd5Trailer, parseUpdateImage,
+                     storeImageChecksum)
+
+CACHE_MANIFEST_NAME = "ct1_image_cache.json"
+CACHE_LOCK_NAME = "ct1_image_cache.lock"
+IMAGE_NAME_PATTERN = re.compile(r"^[\w.-]+$")
+
+def copyAndHashImage(strSourcePath, strTargetPath, nSize, nChunkSize=8 * 1024 * 1024, fReportInterval=5.0):
+    """
+    * Copy an image and compute its MD5 in the same pass, so the staged copy never has to be read back
+    *
+    * @param strSourcePath Image on the share
+    * @param strTargetPath Local file to write
+    * @param nSize Expected size from os.stat of the source
+    * @return Tuple (MD5 hex of everything before the trailer, trailer MD5 hex or None)
+    """
+    nDataSize = nSize - MD5_TRAILER_SIZE
+    objMd5 = hashlib.md5()
+    byteTail = b""
+    nCopied = 0
+    fStart = fLastReport = time.monotonic()
+    with open(strSourcePath, "rb") as objInput, open(strTargetPath, "wb") as objOutput:
+        while True:
+            byteChunk = objInput.read(nChunkSize)
+            if not byteChunk:
+                break
+            objOutput.write(byteChunk)
+            if nCopied < nDataSize:
+                objMd5.update(byteChunk[:nDataSize - nCopied])
+            byteTail = (byteTail + byteChunk)[-MD5_TRAILER_SIZE:]
+            nCopied += len(byteChunk)
+            fNow = time.monotonic()
+            if fNow - fLastReport >= fReportInterval:
+                fLastReport = fNow
+                print(f"Staging {os.path.basename(strTargetPath)}: {nCopied * 100 // max(1, nSize)}% "
+                      f"{nCopied / (fNow - fStart) / 1e6:.1f} MB/s", flush=True)
+    if nCopied != nSize:
+        raise ValueError(f"source changed while copying ({nCopied} of {nSize} bytes)")
+    return objMd5.hexdigest(), parseMd5Trailer(byteTail)
+
+class CacheFileLock:
+    """
+    * Exclusive OS file lock shared by every station process using the same cache
+    * directory (fcntl.flock on POSIX, msvcrt.locking on Windows); blocks until acquired
+    """
+    def __init__(self, strPath):
+        """
+        * @param strPath Lock file, created when missing
+        """
+        self.strPath = strPath
+        self.objFile = None
+
+    def __enter__(self):
+        self.objFile = open(self.strPath, "a+b")
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self.objFile.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self.objFile.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        pass  # LK_LOCK gives up after 10 s, keep waiting like flock does
+            else:
+                import fcntl
+                fcntl.flock(self.objFile.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            self.objFile.close()
+            self.objFile = None
+            raise
+        return self
+
+    def __exit__(self, objExcType, objExcValue, objTraceback):
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self.objFile.seek(0)
+                msvcrt.locking(self.objFile.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self.objFile.fileno(), fcntl.LOCK_UN)
+        except OSError:
+            pass
+        finally:
+            self.objFile.close()
+            self.objFile = None
+        return False
+
+class ImageStagingCache:
+    """
+    * Named firmware images copied from a share to local disk, so flashes read local storage
+    * An image is staged once and hashed while it is copied; the copy must match its
+    * MD5 trailer and the source's indexed MD5 when one is known. Later runs reuse it
+    * while the source keeps its size and mtime, or when the share is unreachable.
+    * Staging beyond the size budget evicts the least recently used images first,
+    * except images used within fInUseSeconds, which another station may be flashing
+    * Stations on one PC share the directory: every operation holds an OS file lock
+    * and re-reads the manifest under it
+    """
+    def __init__(self, strCacheDir, nMaxBytes, fInUseSeconds=0.0):
+        """
+        * @param strCacheDir Local directory holding the staged images and the manifest
+        * @param nMaxBytes Size budget of all staged images together
+        * @param fInUseSeconds Images staged or reused this recently are never evicted
+        """
+        self.strCacheDir = os.path.abspath(strCacheDir)
+        self.nMaxBytes = nMaxBytes
+        self.fInUseSeconds = fInUseSeconds
+        self.strManifestPath = os.path.join(self.strCacheDir, CACHE_MANIFEST_NAME)
+        self.dictEntries = None
+        self.objLock = threading.Lock()
+
+    def lock(self):
+        """
+        * @return CacheFileLock of the cache directory; entering it also drops the
+        *         in-memory manifest so the next load() reads what other processes wrote
+        """
+        os.makedirs(self.strCacheDir, exist_ok=True)
+        self.dictEntries = None
+        return CacheFileLock(os.path.join(self.strCacheDir, CACHE_LOCK_NAME))
+
+    def load(self):
+        if self.dictEntries is None:
+            try:
+                with open(self.strManifestPath, "r", encoding="utf-8") as objFile:
+                    self.dictEntries = json.load(objFile)
+            except (OSError, ValueError):
+                self.dictEntries = {}
+            for strName in [strName for strName in self.dictEntries if not os.path.isfile(self.getPath(strName))]:
+                del self.dictEntries[strName]
+        return self.dictEntries
+
+    def save(self):
+        strTempPath = self.strManifestPath + ".tmp"
+        try:
+            with open(strTempPath, "w", encoding="utf-8") as objFile:
+                json.dump(self.dictEntries, objFile, indent=1, sort_keys=True)
+            os.replace(strTempPath, self.strManifestPath)
+        except OSError as e:
+            print(f"Warning: Could not write image cache manifest {self.strManifestPath}: {str(e)}", flush=True)
+
+    def getPath(self, strName):
+        return os.path.join(self.strCacheDir, f"{strName}.img")
+
+    def getTotalBytes(self):
+        return sum(dictEntry["size"] for dictEntry in self.load().values())
+
+    def listImages(self):
+        """
+        * @return List of (name, entry) from the most recently used
+        """
+        with self.objLock, self.lock():
+            return sorted(self.load().items(), key=lambda tupItem: tupItem[1]["last_used"], reverse=True)
+
+    def remove(self, strName):
+        dictEntry = self.load().pop(strName, None)
+        try:
+            os.remove(self.getPath(strName))
+        except OSError:
+            pass
+        return dictEntry
+
+    def evict(self, nNeededBytes):
+        """
+        * Drop least recently used images until nNeededBytes more fit in the budget
+        * Images used within fInUseSeconds are kept even if the budget is then exceeded
+        """
+        fInUseSince = time.time() - self.fInUseSeconds
+        lstByAge = sorted((tupItem for tupItem in self.load().items() if tupItem[1]["last_used"] < fInUseSince),
+                          key=lambda tupItem: tupItem[1]["last_used"])
+        while lstByAge and self.getTotalBytes() + nNeededBytes > self.nMaxBytes:
+            strName, dictEntry = lstByAge.pop(0)
+            self.remove(strName)
+            print(f"Evicted staged image {strName} ({dictEntry['size'] / 1e9:.2f} GB, "
+                  f"last used {time.strftime('%Y-%m-%d %H:%M', time.localtime(dictEntry['last_used']))})", flush=True)
+            logEvent("image_evict", name=strName, size=dictEntry["size"])
+        return self.getTotalBytes() + nNeededBytes <= self.nMaxBytes
+
+    def stage(self, strName, strSourcePath=None):
+        """
+        * Return a verified local copy of the named image, copying it from the source when needed
+        *
+        * @param strName Image name (file name in the cache is <name>.img)
+        * @param strSourcePath Image on the share, None to use only what is already staged
+        * @return Local image path, or None on failure
+        """
+        if not IMAGE_NAME_PATTERN.match(strName):
+            print(f"Error: Invalid image name {strName!r}", flush=True)
+            return None
+        fStart = time.monotonic()
+        with self.objLock, self.lock():
+            strLocalPath = self.getPath(strName)
+            objSourceStat = None
+            if strSourcePath:
+                try:
+                    objSourceStat = os.stat(strSourcePath)
+                except OSError as e:
+                    print(f"Warning: Image source {strSourcePath} unavailable: {str(e)}", flush=True)
+            dictEntry = self.load().get(strName)
+            if dictEntry is not None:
+                bCurrent = objSourceStat is None or (
+                    dictEntry.get("source") == os.path.abspath(strSourcePath)
+                    and dictEntry.get("source_size") == objSourceStat.st_size
+                    and dictEntry.get("source_mtime_ns") == objSourceStat.st_mtime_ns)
+                if bCurrent and getImageInfo(strLocalPath) is not None:
+                    dictEntry["last_used"] = time.time()
+                    self.save()
+                    print(f"Using staged image {strName} (version {dictEntry.get('version')}) from {strLocalPath}",
+                          flush=True)
+                    logEvent("image_stage", name=strName, hit=True, size=dictEntry["size"],
+                             dur=round(time.monotonic() - fStart, 3))
+                    return strLocalPath
+                print(f"Staged image {strName} is {'outdated' if bCurrent is False else 'invalid'}, restaging",
+                      flush=True)
+                self.remove(strName)
+                self.save()
+            if objSourceStat is None:
+                print(f"Error: Image {strName} is not staged and has no reachable source", flush=True)
+                return None
+            nSize = objSourceStat.st_size
+            if nSize > self.nMaxBytes:
+                print(f"Error: Image {strName} ({nSize / 1e9:.2f} GB) exceeds the cache budget "
+                      f"({self.nMaxBytes / 1e9:.2f} GB)", flush=True)
+                return None
+            bFits = self.evict(nSize)
+            self.save()
+            if not bFits or shutil.disk_usage(self.strCacheDir).free < nSize:
+                print(f"Error: Not enough space in {self.strCacheDir} to stage {strName}", flush=True)
+                return None
+            print(f"Staging image {strName} ({nSize / 1e9:.2f} GB) from {strSourcePath}", flush=True)
+            strPartPath = f"{strLocalPath}.{os.getpid()}.part"
+            try:
+                dictInfo = parseUpdateImage(strSourcePath)
+                strMd5, strTrailer = copyAndHashImage(strSourcePath, strPartPath, nSize)
+                dictSource = getImageIndex(strSourcePath).lookup(strSourcePath, objSourceStat)
+                if dictSource is not None and dictSource.get("md5") not in (None, strMd5):
+                    raise ValueError(f"MD5 {strMd5} differs from the source's indexed {dictSource['md5']}")
+                os.replace(strPartPath, strLocalPath)
+                dictImage = storeImageChecksum(strLocalPath, dictInfo, os.stat(strLocalPath), strMd5, strTrailer)
+            except (OSError, ValueError) as e:
+                print(f"Error: Could not stage image {strName}: {str(e)}", flush=True)
+                dictImage = None
+            finally:
+                if os.path.exists(strPartPath):
+                    os.remove(strPartPath)
+            if dictImage is None:
+                if os.path.exists(strLocalPath):
+                    os.remove(strLocalPath)
+                return None
+            fNow = time.time()
+            self.dictEntries[strName] = {
+                "source": os.path.abspath(strSourcePath), "source_size": nSize,
+                "source_mtime_ns": objSourceStat.st_mtime_ns, "size": nSize, "md5": strMd5,
+                "version": dictImage["version"], "staged": fNow, "last_used": fNow,
+            }
+            self.save()
+            fDuration = time.monotonic() - fStart
+            print(f"Staged image {strName} version {dictImage['version']} in {fDuration:.1f} s "
+                  f"({nSize / max(fDuration, 1e-6) / 1e6:.1f} MB/s), cache {self.getTotalBytes() / 1e9:.2f}/"
+                  f"{self.nMaxBytes / 1e9:.2f} GB", flush=True)
+            logEvent("image_stage", name=strName, hit=False, size=nSize, md5=strMd5, dur=round(fDuration, 3))
+            return strLocalPath
+
+dictStagingCaches = {}
+objStagingCachesLock = threading.Lock()
+
+def getImageStagingCache(strCacheDir, nMaxBytes, fInUseSeconds=0.0):
+    """
+    * @return ImageStagingCache of the directory, shared by every caller in the process
+    """
+    strCacheDir = os.path.abspath(strCacheDir)
+    with objStagingCachesLock:
+        if strCacheDir not in dictStagingCaches:
+            dictStagingCaches[strCacheDir] = ImageStagingCache(strCacheDir, nMaxBytes, fInUseSeconds)
+        dictStagingCaches[strCacheDir].nMaxBytes = nMaxBytes
+        dictStagingCaches[strCacheDir].fInUseSeconds = fInUseSeconds
+        return dictStagingCaches[strCacheDir]
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+import codecs
+import shlex
+import threading
+import time
+
+from adbclient import openExecOut
+from streamreader import splitLines, compilePattern
+
+LOGCAT_FINISH = "finish"
+LOGCAT_ERROR = "error"
+LOGCAT_PROGRESS = "progress"
+LOGCAT_TIMEOUT = "timeout"
+LOGCAT_CLOSED = "closed"
+
+class LogcatMonitor:
+    """
+    * Logcat watcher with a dedicated reader thread and a table of patterns
+    * Every line is matched as soon as it arrives; finish and error patterns end
+    * the wait at once, progress patterns only run their callback
+    * The wait uses one deadline on the monotonic clock, so timeouts and the
+    * periodic "still waiting" messages do not depend on line traffic
+    * With device filtering the pattern regexes are also passed to logcat -e,
+    * so non-matching lines never leave the device
+    """
+    def __init__(self, lstAdbPrefix, lstFilterSpecs=None, bDeviceFilter=True, strFormat="time"):
+        """
+        * @param lstAdbPrefix ADB command prefix
+        * @param lstFilterSpecs logcat tag filter specs, e.g. ['CT1Broadcast:D', '*:S']
+        * @param bDeviceFilter Pass the pattern regexes to logcat -e (Android 7+)
+        * @param strFormat logcat -v output format
+        """
+        self.lstAdbPrefix = lstAdbPrefix
+        self.lstFilterSpecs = list(lstFilterSpecs or [])
+        self.bDeviceFilter = bDeviceFilter
+        self.strFormat = strFormat
+        self.lstPatterns = []
+        self.objStream = None
+        self.fnClose = None
+        self.objThread = None
+        self.objDoneEvent = threading.Event()
+        self.strVerdict = None
+        self.strVerdictLine = None
+        self.objVerdictMatch = None
+        self.nLines = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, objExcType, objExcValue, objTraceback):
+        self.stop()
+        return False
+
+    def addPattern(self, objPattern, strKind=LOGCAT_PROGRESS, fnCallback=None):
+        """
+        * Register a pattern; must be called before start()
+        *
+        * @param objPattern Regex string or compiled pattern, searched in each line
+        * @param strKind LOGCAT_FINISH, LOGCAT_ERROR or LOGCAT_PROGRESS
+        * @param fnCallback Optional callable (match, line) run on the reader thread
+        * @return self
+        """
+        self.lstPatterns.append((compilePattern(objPattern), strKind, fnCallback))
+        return self
+
+    def buildCommand(self):
+        """
+        * @return logcat command line run on the device
+        """
+        lstCmd = ["logcat", "-v", self.strFormat]
+        if self.bDeviceFilter and self.lstPatterns:
+            strRegex = "|".join(f"(?:{objRegex.pattern})" for objRegex, _, _ in self.lstPatterns)
+            lstCmd += ["-e", strRegex]
+        lstCmd += self.lstFilterSpecs
+        return " ".join(shlex.quote(strPart) for strPart in lstCmd)
+
+    def start(self):
+        """
+        * Start logcat and the reader thread
+        *
+        * @return self
+        """
+        self.objDoneEvent.clear()
+        self.strVerdict = None
+        self.objStream, self.fnClose = openExecOut(self.lstAdbPrefix, self.buildCommand())
+        self.objThread = threading.Thread(target=self.readLoop, name="LogcatMonitor")
+        self.objThread.daemon = True
+        self.objThread.start()
+        return self
+
+    def stop(self):
+        """
+        * Stop logcat and wait briefly for the reader thread
+        """
+        if self.fnClose is not None:
+            fnClose, self.fnClose = self.fnClose, None
+            try:
+                fnClose()
+            except (OSError, ValueError):
+                pass
+        if self.objThread is not None:
+            self.objThread.join(timeout=1.0)
+            self.objThread = None
+
+    def readLoop(self):
+        objDecoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        strPending = ""
+        try:
+            while not self.objDoneEvent.is_set():
+                byteChunk = self.objStream.read1(65536)
+                if not byteChunk:
+                    break
+                lstParts = splitLines(strPending + objDecoder.decode(byteChunk))
+                strPending = lstParts.pop()
+                for strLine in lstParts:
+                    if strLine and self.feed(strLine):
+                        return
+        except (OSError, ValueError):
+            pass
+        if strPending:
+            self.feed(strPending)
+        self.finish(LOGCAT_CLOSED, None, None)
+
+    def feed(self, strLine):
+        """
+        * Match one logcat line against the pattern table
+        *
+        * @return True when a finish or error pattern matched
+        """
+        self.nLines += 1
+        for objRegex, strKind, fnCallback in self.lstPatterns:
+            objMatch = objRegex.search(strLine)
+            if not objMatch:
+                continue
+            if fnCallback is not None:
+                fnCallback(objMatch, strLine)
+            if strKind in (LOGCAT_FINISH, LOGCAT_ERROR):
+                self.finish(strKind, strLine, objMatch)
+                return True
+        return False
+
+    def finish(self, strVerdict, strLine, objMatch):
+        if self.objDoneEvent.is_set():
+            return
+        self.strVerdict = strVerdict
+        self.strVerdictLine = strLine
+        self.objVerdictMatch = objMatch
+        self.objDoneEvent.set()
+
+    def wait(self, fTimeout, fProgressInterval=30.0, fnOnProgress=None):
+        """
+        * Block until a finish/error pattern matches, logcat ends or the deadline passes
+        *
+        * @param fTimeout Seconds until the deadline
+        * @param fProgressInterval Seconds between progress reports
+        * @param fnOnProgress Callable (remaining seconds) for progress reports;
+        *        prints "Still waiting..." when None
+        * @return Tuple (verdict, matching line): finish, error, closed or timeout
+        """
+        fStart = time.monotonic()
+        fDeadline = fStart + fTimeout
+        fNextReport = fStart + fProgressInterval
+        while True:
+            fNow = time.monotonic()
+            if fNow >= fDeadline:
+                if not self.objDoneEvent.is_set():
+                    return LOGCAT_TIMEOUT, None
+                return self.strVerdict, self.strVerdictLine
+            if self.objDoneEvent.wait(min(fDeadline, fNextReport) - fNow):
+                return self.strVerdict, self.strVerdictLine
+            if time.monotonic() >= fNextReport and fNextReport < fDeadline:
+                fRemaining = fDeadline - fNextReport
+                if fnOnProgress is not None:
+                    fnOnProgress(fRemaining)
+                else:
+                    print(f"Still waiting... {int(round(fRemaining))} seconds remaining", flush=True)
+                fNextReport += fProgressInterval
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+ROCKCHIP_VID = 0x2207
+ROCKUSB_INTERFACE = (0xff, 0x06, 0x05)  # bInterfaceClass/SubClass/Protocol of the rockusb interface
+MODE_MASKROM = "Maskrom"
+MODE_LOADER = "Loader"
+SYSFS_USB_DEVICES = "/sys/bus/usb/devices"
+
+class MaskromDevice:
+    """
+    * One Rockchip rockusb device found in sysfs
+    """
+    def __init__(self, strLocation, nVid, nPid, strMode, nBusNum=None, nDevNum=None, strSerial=None):
+        """
+        * @param strLocation sysfs device name, i.e. bus and port path (e.g. 1-1.2), stable across replugs
+        * @param nVid USB vendor id
+        * @param nPid USB product id (identifies the SoC)
+        * @param strMode MODE_MASKROM or MODE_LOADER
+        * @param nBusNum USB bus number
+        * @param nDevNum USB device number on the bus
+        * @param strSerial USB serial string, if the device reports one
+        """
+        self.strLocation = strLocation
+        self.nVid = nVid
+        self.nPid = nPid
+        self.strMode = strMode
+        self.nBusNum = nBusNum
+        self.nDevNum = nDevNum
+        self.strSerial = strSerial
+
+    def __repr__(self):
+        return f"MaskromDevice({self.strLocation}, {self.nVid:04x}:{self.nPid:04x}, {self.strMode})"
+
+def readSysfsValue(strPath):
+    try:
+        with open(strPath, "r", encoding="ascii", errors="replace") as objFile:
+            return objFile.read().strip()
+    except OSError:
+        return None
+
+def readSysfsHex(strPath):
+    strValue = readSysfsValue(strPath)
+    try:
+        return int(strValue, 16) if strValue else None
+    except ValueError:
+        return None
+
+def readSysfsInt(strPath):
+    strValue = readSysfsValue(strPath)
+    try:
+        return int(strValue) if strValue else None
+    except ValueError:
+        return None
+
+class MaskromDetector:
+    """
+    * Finds Rockchip boards in Maskrom/Loader mode by reading the Linux USB sysfs tree
+    * instead of spawning `upgrade_tool LD`
+    * A device counts when it has the Rockchip VID and a rockusb interface
+    * (class ff/06/05), which keeps ADB-mode Rockchip devices out; the mode comes
+    * from the low bit of bcdUSB (sysfs `version`) the way rkdeveloptool tells
+    * Maskrom from Loader
+    * Waiters wake on udev usb events when pyudev is available and otherwise
+    * rescan the tree every fPollInterval, a few directory reads per device
+    """
+    def __init__(self, strSysfsRoot=SYSFS_USB_DEVICES, nVid=ROCKCHIP_VID, lstPids=None, fPollInterval=0.1,
+                 bUseUdev=True):
+        """
+        * @param strSysfsRoot Directory listing the USB devices and interfaces (a fake tree in tests)
+        * @param nVid USB vendor id to look for
+        * @param lstPids Product ids to accept, None for any product of the vendor
+        * @param fPollInterval Seconds between rescans (a safety net when udev events are used)
+        * @param bUseUdev Wake on udev usb events when pyudev is available
+        """
+        self.strSysfsRoot = strSysfsRoot
+        self.nVid = nVid
+        self.setPids = set(lstPids) if lstPids else None
+        self.fPollInterval = fPollInterval
+        self.bUseUdev = bUseUdev
+        self.objChangeEvent = threading.Event()
+        self.objMonitor = None
+
+    def isAvailable(self):
+        """
+        * @return True when the sysfs tree exists (Linux hosts)
+        """
+        return os.path.isdir(self.strSysfsRoot)
+
+    def notify(self):
+        """
+        * Wake waiters for an immediate rescan (udev callback, fake tree changes)
+        """
+        self.objChangeEvent.set()
+
+    def readDevice(self, strName):
+        """
+        * @param strName sysfs device entry name
+        * @return MaskromDevice, or None if the entry is not a matching rockusb device
+        """
+        strPath = os.path.join(self.strSysfsRoot, strName)
+        if readSysfsHex(os.path.join(strPath, "idVendor")) != self.nVid:
+            return None
+        nPid = readSysfsHex(os.path.join(strPath, "idProduct"))
+        if nPid is None or (self.setPids is not None and nPid not in self.setPids):
+            return None
+        if not self.hasRockusbInterface(strName):
+            return None
+        strVersion = (readSysfsValue(os.path.join(strPath, "version")) or "").replace(".", "")
+        nBcdUsb = int(strVersion, 16) if strVersion.isdigit() else 0
+        return MaskromDevice(
+            strName, self.nVid, nPid,
+            MODE_MASKROM if nBcdUsb & 0x1 else MODE_LOADER,
+            readSysfsInt(os.path.join(strPath, "busnum")),
+            readSysfsInt(os.path.join(strPath, "devnum")),
+            readSysfsValue(os.path.join(strPath, "serial"))
+        )
+
+    def hasRockusbInterface(self, strName):
+        for strEntry in os.listdir(self.strSysfsRoot):
+            if not strEntry.startswith(strName + ":"):
+                continue
+            strPath = os.path.join(self.strSysfsRoot, strEntry)
+            tupInterface = tuple(readSysfsHex(os.path.join(strPath, strAttr)) for strAttr in
+                                 ("bInterfaceClass", "bInterfaceSubClass", "bInterfaceProtocol"))
+            if tupInterface == ROCKUSB_INTERFACE:
+                return True
+        return False
+
+    def scan(self, strMode=MODE_MASKROM):
+        """
+        * Read the sysfs tree once
+        *
+        * @param strMode MODE_MASKROM, MODE_LOADER, or None for both
+        * @return List of MaskromDevice sorted by location
+        """
+        try:
+            lstEntries = os.listdir(self.strSysfsRoot)
+        except OSError:
+            return []
+        lstDevices = []
+        for strName in lstEntries:
+            if ":" in strName or strName.startswith("usb"):
+                continue
+            objDevice = self.readDevice(strName)
+            if objDevice is not None and (strMode is None or objDevice.strMode == strMode):
+                lstDevices.append(objDevice)
+        return sorted(lstDevices, key=lambda objDevice: objDevice.strLocation)
+
+    def startHotplugMonitor(self):
+        """
+        * Set the change event on udev usb device events when pyudev is available
+        """
+        if self.objMonitor is not None or not self.bUseUdev:
+            return
+        try:
+            import pyudev
+        except ImportError:
+            self.objMonitor = False
+            return
+        try:
+            objUdevMonitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            objUdevMonitor.filter_by(subsystem='usb', device_type='usb_device')
+            self.objMonitor = pyudev.MonitorObserver(objUdevMonitor, callback=lambda objDevice: self.notify())
+            self.objMonitor.daemon = True
+            self.objMonitor.start()
+        except Exception as e:
+            print(f"Warning: udev hotplug monitor unavailable: {str(e)}", flush=True)
+            self.objMonitor = False
+
+    def waitForDevices(self, nCount=1, fTimeout=10.0, strMode=MODE_MASKROM):
+        """
+        * Wait until at least nCount devices are in the requested mode
+        *
+        * @param nCount Number of devices to wait for
+        * @param fTimeout Maximum seconds to wait
+        * @param strMode MODE_MASKROM, MODE_LOADER, or None for both
+        * @return List of MaskromDevice found at the end (shorter than nCount on timeout)
+        """
+        self.startHotplugMonitor()
+        fDeadline = time.monotonic() + fTimeout
+        while True:
+            self.objChangeEvent.clear()
+            lstDevices = self.scan(strMode)
+            fRemaining = fDeadline - time.monotonic()
+            if len(lstDevices) >= nCount or fRemaining <= 0:
+                return lstDevices
+            self.objChangeEvent.wait(min(self.fPollInterval, fRemaining))
+
+class FakeUsbSysfs:
+    """
+    * Minimal /sys/bus/usb/devices look-alike in a temporary directory
+    * Holds device entries with the attributes MaskromDetector reads, so the
+    * detector and the station wait can be exercised without hardware
+    """
+    def __init__(self, strRoot=None, objDetector=None):
+        """
+        * @param strRoot Directory to build the tree in, a new temporary directory if None
+        * @param objDetector Optional MaskromDetector notified on every change, like udev would
+        """
+        self.bOwnRoot = strRoot is None
+        self.strRoot = strRoot or tempfile.mkdtemp(prefix="ct1_sysfs_")
+        self.objDetector = objDetector
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, objExcType, objExcValue, objTraceback):
+        self.cleanup()
+        return False
+
+    def writeAttrs(self, strName, dictAttrs):
+        strPath = os.path.join(self.strRoot, strName)
+        os.makedirs(strPath, exist_ok=True)
+        for strAttr, strValue in dictAttrs.items():
+            with open(os.path.join(strPath, strAttr), "w", encoding="ascii") as objFile:
+                objFile.write(f"{strValue}\n")
+
+    def addDevice(self, strLocation, nVid=ROCKCHIP_VID, nPid=0x350a, strMode=MODE_MASKROM, nDevNum=None,
+                  tupInterface=ROCKUSB_INTERFACE):
+        """
+        * Plug a device in
+        *
+        * @param strLocation sysfs device name (e.g. 1-1.2)
+        * @param strMode MODE_MASKROM (bcdUSB 2.01) or MODE_LOADER (bcdUSB 2.00)
+        * @param tupInterface Class/subclass/protocol of interface 1.0
+        """
+        nBusNum = int(strLocation.split("-", 1)[0])
+        self.writeAttrs(f"{strLocation}:1.0", {
+            "bInterfaceClass": f"{tupInterface[0]:02x}",
+            "bInterfaceSubClass": f"{tupInterface[1]:02x}",
+            "bInterfaceProtocol": f"{tupInterface[2]:02x}",
+        })
+        self.writeAttrs(strLocation, {
+            "idVendor": f"{nVid:04x}",
+            "idProduct": f"{nPid:04x}",
+            "version": " 2.01" if strMode == MODE_MASKROM else " 2.00",
+            "busnum": nBusNum,
+            "devnum": nDevNum if nDevNum is not None else len(os.listdir(self.strRoot)) + 1,
+        })
+        if self.objDetector is not None:
+            self.objDetector.notify()
+
+    def removeDevice(self, strLocation):
+        """
+        * Unplug a device
+        """
+        for strEntry in os.listdir(self.strRoot):
+            if strEntry == strLocation or strEntry.startswith(strLocation + ":"):
+                shutil.rmtree(os.path.join(self.strRoot, strEntry), ignore_errors=True)
+        if self.objDetector is not None:
+            self.objDetector.notify()
+
+    def cleanup(self):
+        if self.bOwnRoot:
+            shutil.rmtree(self.strRoot, ignore_errors=True)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+import os
+import threading
+import time
+import serial.tools.list_ports
+
+class PortRegistry:
+    """
+    * Cached index of the serial ports on this host
+    * Enumerates once and indexes ports by device name, USB VID/PID, USB serial
+    * number and physical location (hub/port path, stable across replugs)
+    * Re-enumerates only after a hotplug event, when the cache is older than
+    * fMaxAge, when a cached entry no longer exists, or after a port failed to open
+    """
+    def __init__(self, fMaxAge=60.0):
+        """
+        * @param fMaxAge Seconds before the cached enumeration is considered stale
+        """
+        self.fMaxAge = fMaxAge
+        self.objLock = threading.Lock()
+        self.fRefreshTime = None
+        self.bDirty = True
+        self.lstPorts = []
+        self.dictByDevice = {}
+        self.dictByLocation = {}
+        self.dictBySerial = {}
+        self.dictByVidPid = {}
+        self.objMonitor = None
+
+    def invalidate(self):
+        """
+        * Mark the cache dirty; the next lookup re-enumerates (call on hotplug events)
+        """
+        self.bDirty = True
+
+    def evict(self, strDevice):
+        """
+        * Drop a port from every index and mark the cache dirty
+        *
+        * @param strDevice Device name (e.g. COM3 or /dev/ttyUSB0), case-insensitive
+        """
+        with self.objLock:
+            objPort = self.dictByDevice.pop(strDevice.upper(), None)
+            self.bDirty = True
+            if objPort is None:
+                return
+            self.lstPorts = [objEntry for objEntry in self.lstPorts if objEntry is not objPort]
+            for dictIndex in (self.dictByLocation, self.dictBySerial):
+                for strKey in [strKey for strKey, objEntry in dictIndex.items() if objEntry is objPort]:
+                    del dictIndex[strKey]
+            for tupKey in list(self.dictByVidPid):
+                self.dictByVidPid[tupKey] = [objEntry for objEntry in self.dictByVidPid[tupKey] if objEntry is not objPort]
+                if not self.dictByVidPid[tupKey]:
+                    del self.dictByVidPid[tupKey]
+
+    def reportOpenFailure(self, strDevice):
+        """
+        * Called when opening a port failed: the cached entry may belong to an
+        * unplugged or renumbered adapter, so it is evicted and the next lookup
+        * re-enumerates (the only staleness signal on Windows, which has no monitor)
+        *
+        * @param strDevice Device name that failed to open
+        """
+        self.evict(strDevice)
+
+    def refresh(self):
+        """
+        * Enumerate the serial ports and rebuild all indexes
+        *
+        * @return List of port info objects
+        """
+        lstPorts = list(serial.tools.list_ports.comports())
+        dictByDevice = {}
+        dictByLocation = {}
+        dictBySerial = {}
+        dictByVidPid = {}
+        for objPort in lstPorts:
+            dictByDevice[objPort.device.upper()] = objPort
+            if objPort.location:
+                dictByLocation[objPort.location] = objPort
+            if objPort.serial_number:
+                dictBySerial[objPort.serial_number] = objPort
+            if objPort.vid is not None and objPort.pid is not None:
+                dictByVidPid.setdefault((objPort.vid, objPort.pid), []).append(objPort)
+        with self.objLock:
+            self.lstPorts = lstPorts
+            self.dictByDevice = dictByDevice
+            self.dictByLocation = dictByLocation
+            self.dictBySerial = dictBySerial
+            self.dictByVidPid = dictByVidPid
+            self.fRefreshTime = time.monotonic()
+            self.bDirty = False
+        return lstPorts
+
+    def ensureFresh(self):
+        """
+        * Re-enumerate if the cache is dirty or older than fMaxAge
+        """
+        self.startHotplugMonitor()
+        if self.bDirty or self.fRefreshTime is None or time.monotonic() - self.fRefreshTime > self.fMaxAge:
+            self.refresh()
+
+    def isPresent(self, objPort):
+        """
+        * Cheap check that a cached port still exists: the device node on POSIX,
+        * the SERIALCOMM device map on Windows (lists only ports that are present)
+        """
+        if os.name != 'nt':
+            return os.path.exists(objPort.device)
+        try:
+            import winreg
+            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"HARDWARE\DEVICEMAP\SERIALCOMM") as objKey:
+                nIndex = 0
+                while True:
+                    try:
+                        _, strValue, _ = winreg.EnumValue(objKey, nIndex)
+                    except OSError:
+                        return False
+                    if str(strValue).upper() == objPort.device.upper():
+                        return True
+                    nIndex += 1
+        except OSError:
+            return False
+
+    def find(self, fnLookup):
+        """
+        * Run a lookup against the cache; on a miss or a stale entry the entry is
+        * evicted and the ports are re-enumerated before looking up again
+        *
+        * @param fnLookup Callable returning a port info object or None
+        * @return Port info object or None
+        """
+        self.ensureFresh()
+        objPort = fnLookup()
+        if objPort is None or not self.isPresent(objPort):
+            if objPort is not None:
+                self.evict(objPort.device)
+            self.refresh()
+            objPort = fnLookup()
+        return objPort
+
+    def getByDevice(self, strDevice):
+        """
+        * @param strDevice Device name (e.g. COM3 or /dev/ttyUSB0), case-insensitive
+        * @return Port info object or None
+        """
+        return self.find(lambda: self.dictByDevice.get(strDevice.upper()))
+
+    def getByLocation(self, strLocation):
+        """
+        * @param strLocation USB physical location as reported by pyserial (e.g. 1-1.2:1.0)
+        * @return Port info object or None
+        """
+        return self.find(lambda: self.dictByLocation.get(strLocation))
+
+    def getBySerialNumber(self, strSerialNumber):
+        """
+        * @param strSerialNumber USB serial number of the adapter
+        * @return Port info object or None
+        """
+        return self.find(lambda: self.dictBySerial.get(strSerialNumber))
+
+    def getByVidPid(self, nVid, nPid):
+        """
+        * @param nVid USB vendor id
+        * @param nPid USB product id
+        * @return List of port info objects with that VID/PID (may be empty)
+        """
+        self.find(lambda: (self.dictByVidPid.get((nVid, nPid)) or [None])[0])
+        return list(self.dictByVidPid.get((nVid, nPid), []))
+
+    def startHotplugMonitor(self):
+        """
+        * Invalidate the cache on udev tty events when pyudev is available (Linux)
+        * Without pyudev the registry relies on fMaxAge and miss-driven refreshes
+        """
+        if self.objMonitor is not None or os.name == 'nt':
+            return
+        try:
+            import pyudev
+        except ImportError:
+            self.objMonitor = False
+            return
+        try:
+            objContext = pyudev.Context()
+            objUdevMonitor = pyudev.Monitor.from_netlink(objContext)
+            objUdevMonitor.filter_by(subsystem='tty')
+            self.objMonitor = pyudev.MonitorObserver(objUdevMonitor, callback=lambda objDevice: self.invalidate())
+            self.objMonitor.daemon = True
+            self.objMonitor.start()
+        except Exception as e:
+            print(f"Warning: udev hotplug monitor unavailable: {str(e)}", flush=True)
+            self.objMonitor = False
+
+objPortRegistry = PortRegistry()
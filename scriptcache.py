@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+import hashlib
+import os
+import shlex
+import tempfile
+
+SCRIPT_CACHE_DIR = "/data/local/tmp/ct1_scripts"
+SCRIPT_MISSING_MARKER = "__CT1_SCRIPT_MISSING__"
+SCRIPT_FAIL_MARKER = "__CT1_CMD_FAILED__"
+
+def buildScript(lstCommands, strHeader=None):
+    """
+    * Generate a device shell script from a command list
+    * Each failing command prints a marker line instead of stopping the script,
+    * so one run reports every failure like the per-command calls did
+    *
+    * @param lstCommands Shell command lines; ('sleep', seconds) entries become sleeps
+    * @param strHeader Optional comment placed under the shebang
+    * @return Script text
+    """
+    lstLines = ["#!/system/bin/sh"]
+    if strHeader:
+        lstLines.append(f"# {strHeader}")
+    for objCmd in lstCommands:
+        if isinstance(objCmd, (list, tuple)) and objCmd[0] == 'sleep':
+            lstLines.append(f"sleep {objCmd[1]}")
+            continue
+        lstLines.append(f"{objCmd} || echo {SCRIPT_FAIL_MARKER} {shlex.quote(objCmd)}")
+    return "\n".join(lstLines) + "\n"
+
+def getFailedCommands(strOutput):
+    """
+    * @param strOutput Output of a script made by buildScript
+    * @return List of command lines that failed
+    """
+    lstFailed = []
+    for strLine in strOutput.splitlines():
+        if SCRIPT_FAIL_MARKER not in strLine:
+            continue
+        strQuoted = strLine.split(SCRIPT_FAIL_MARKER, 1)[1].strip()
+        try:
+            lstFailed.append(" ".join(shlex.split(strQuoted)))
+        except ValueError:
+            lstFailed.append(strQuoted)
+    return lstFailed
+
+class DeviceScriptCache:
+    """
+    * Content-addressed store of helper scripts on the DUT
+    * A script lives at <dir>/<name>_<hash>.sh, so an unchanged script is already
+    * on a DUT that ran it before: the existence check and the run are a single
+    * shell round-trip, and the script is pushed only when that check misses
+    """
+    def __init__(self, objShell, fnPush, strCacheDir=SCRIPT_CACHE_DIR):
+        """
+        * @param objShell Shell session with run(command, timeout) -> (status, output)
+        * @param fnPush Callable (local path, remote path) -> success, e.g. adbPush bound to a prefix
+        * @param strCacheDir Device directory holding the cached scripts
+        """
+        self.objShell = objShell
+        self.fnPush = fnPush
+        self.strCacheDir = strCacheDir
+        self.nPushes = 0
+
+    def getRemotePath(self, strName, strContent):
+        """
+        * @return Device path of the script content under its content hash
+        """
+        strHash = hashlib.sha256(strContent.encode("utf-8")).hexdigest()[:16]
+        return f"{self.strCacheDir}/{strName}_{strHash}.sh"
+
+    def push(self, strName, strContent, strRemotePath):
+        """
+        * Replace older versions of the script on the device with this one
+        *
+        * @return Boolean indicating success
+        """
+        self.objShell.run(f"mkdir -p {self.strCacheDir} && rm -f {self.strCacheDir}/{strName}_*.sh")
+        nFd, strLocalPath = tempfile.mkstemp(prefix=f"{strName}_", suffix=".sh")
+        try:
+            with os.fdopen(nFd, "w", encoding="utf-8", newline="\n") as objFile:
+                objFile.write(strContent)
+            bPushed = self.fnPush(strLocalPath, strRemotePath)
+        finally:
+            os.remove(strLocalPath)
+        if bPushed:
+            self.nPushes += 1
+        return bPushed
+
+    def runScript(self, strName, strContent, fTimeout=None):
+        """
+        * Run a script on the device, pushing it first only if it is not cached there
+        *
+        * @param strName Script name used in the device file name
+        * @param strContent Script text
+        * @param fTimeout Timeout in seconds for the run (session default if None)
+        * @return Tuple (exit status or None, output text)
+        """
+        strContent = strContent.replace("\r\n", "\n")
+        strRemotePath = self.getRemotePath(strName, strContent)
+        strRunCmd = f"sh {strRemotePath}"
+        nStatus, strOutput = self.objShell.run(
+            f"if [ -f {strRemotePath} ]; then {strRunCmd}; else echo {SCRIPT_MISSING_MARKER}; fi", fTimeout
+        )
+        if nStatus is None or SCRIPT_MISSING_MARKER not in strOutput:
+            return nStatus, strOutput
+        print(f"Caching {strName} script on device: {strRemotePath}", flush=True)
+        if not self.push(strName, strContent, strRemotePath):
+            return None, f"Failed to push {strName} script to {strRemotePath}"
+        return self.objShell.run(strRunCmd, fTimeout)
+
+    def runScriptFile(self, strLocalPath, fTimeout=None):
+        """
+        * Run a host-side script file through the cache
+        *
+        * @param strLocalPath Path of the script on the host
+        * @return Tuple (exit status or None, output text)
+        """
+        with open(strLocalPath, "r", encoding="utf-8") as objFile:
+            strContent = objFile.read()
+        strName = os.path.splitext(os.path.basename(strLocalPath))[0]
+        return self.runScript(strName, strContent, fTimeout)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from eventlog import logEvent
+from fwimage import extractRegion, getFlashablePartitions
+
+FULL_FLASH_PARTITIONS = ("parameter",)  # a changed partition table always needs the full UF
+
+class FlashRecordStore:
+    """
+    * JSON record of what was last flashed to each device serial: image, version,
+    * loader hash and the SHA-256 of every partition payload
+    """
+    def __init__(self, strPath):
+        """
+        * @param strPath JSON file holding the records
+        """
+        self.strPath = strPath
+        self.dictRecords = None
+        self.objLock = threading.Lock()
+
+    def load(self):
+        if self.dictRecords is None:
+            try:
+                with open(self.strPath, "r", encoding="utf-8") as objFile:
+                    self.dictRecords = json.load(objFile)
+            except (OSError, ValueError):
+                self.dictRecords = {}
+        return self.dictRecords
+
+    def get(self, strSerial):
+        """
+        * @return Record of the serial, or None
+        """
+        with self.objLock:
+            return self.load().get(strSerial)
+
+    def put(self, strSerial, dictRecord):
+        """
+        * Store a record (None removes it) and rewrite the file atomically
+        """
+        with self.objLock:
+            if dictRecord is None:
+                self.load().pop(strSerial, None)
+            else:
+                self.load()[strSerial] = dictRecord
+            strTempPath = self.strPath + ".tmp"
+            try:
+                strDir = os.path.dirname(os.path.abspath(self.strPath))
+                os.makedirs(strDir, exist_ok=True)
+                with open(strTempPath, "w", encoding="utf-8") as objFile:
+                    json.dump(self.dictRecords, objFile, indent=1, sort_keys=True)
+                os.replace(strTempPath, self.strPath)
+            except OSError as e:
+                print(f"Warning: Could not write flash records {self.strPath}: {str(e)}", flush=True)
+
+dictFlashRecordStores = {}
+objFlashRecordStoresLock = threading.Lock()
+
+def getFlashRecordStore(strPath):
+    """
+    * @return FlashRecordStore shared by every caller using the same file
+    """
+    strPath = os.path.abspath(strPath)
+    with objFlashRecordStoresLock:
+        if strPath not in dictFlashRecordStores:
+            dictFlashRecordStores[strPath] = FlashRecordStore(strPath)
+        return dictFlashRecordStores[strPath]
+
+def buildFlashRecord(strImgPath, dictImage, dictHashes):
+    """
+    * @return Record describing a board that now holds the whole image
+    """
+    return {
+        "image": os.path.basename(strImgPath),
+        "version": dictImage["version"],
+        "chip": dictImage["chip"],
+        "loader": dictHashes["loader"],
+        "partitions": dict(dictHashes["partitions"]),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def planSelectiveFlash(dictImage, dictHashes, dictRecord):
+    """
+    * Decide which partitions need writing
+    *
+    * @param dictImage Image metadata from getImageInfo
+    * @param dictHashes Partition hashes from getPartitionHashes
+    * @param dictRecord Flash record of the board, or None
+    * @return Tuple (list of changed partition names or None for a full flash, reason text)
+    """
+    if dictRecord is None:
+        return None, "no flash record for this board"
+    if dictRecord.get("chip") != dictImage["chip"]:
+        return None, f"chip changed ({dictRecord.get('chip')} -> {dictImage['chip']})"
+    if dictRecord.get("loader") != dictHashes["loader"]:
+        return None, "loader changed"
+    dictOld = dictRecord.get("partitions") or {}
+    if set(dictOld) != set(dictHashes["partitions"]):
+        return None, "partition set changed"
+    lstChanged = [strName for strName, strHash in dictHashes["partitions"].items() if dictOld.get(strName) != strHash]
+    for strName in lstChanged:
+        if strName in FULL_FLASH_PARTITIONS:
+            return None, f"{strName} changed"
+    return lstChanged, f"{len(lstChanged)} of {len(dictHashes['partitions'])} partitions changed"
+
+def runSelectiveFlash(strImgPath, dictImage, lstChanged, fnRunTool, dictCommands, strWorkDir=None):
+    """
+    * Write only the changed partitions: download the image's loader to get the
+    * board from Maskrom into loader mode, write each changed partition from a
+    * file extracted out of the image, then reset the board
+    *
+    * @param strImgPath Image file path
+    * @param dictImage Image metadata from getImageInfo
+    * @param lstChanged Names of the partitions to write
+    * @param fnRunTool Callable (step "loader"/"partition"/"reset", upgrade_tool argument string) -> success
+    * @param dictCommands upgrade_tool argument templates: loader ({file}), partition ({name}, {file}), reset
+    * @param strWorkDir Directory for the extracted files, a temporary one if None
+    * @return Boolean indicating every step succeeded
+    """
+    dictParts = {dictPart["name"]: dictPart for dictPart in getFlashablePartitions(dictImage)}
+    strTempDir = tempfile.mkdtemp(prefix="ct1_parts_", dir=strWorkDir)
+    try:
+        strLoaderPath = os.path.join(strTempDir, "loader.bin")
+        extractRegion(strImgPath, dictImage["loader_offset"], dictImage["loader_length"], strLoaderPath)
+        if not fnRunTool("loader", dictCommands["loader"].format(file=strLoaderPath)):
+            print("Error: Could not download the loader for a selective flash", flush=True)
+            return False
+        for strName in lstChanged:
+            dictPart = dictParts[strName]
+            strPartPath = os.path.join(strTempDir, f"{strName}.img")
+            fStart = time.monotonic()
+            extractRegion(strImgPath, dictPart["offset"], dictPart["size"], strPartPath)
+            if not fnRunTool("partition", dictCommands["partition"].format(name=strName, file=strPartPath)):
+                print(f"Error: Writing partition {strName} failed", flush=True)
+                return False
+            logEvent("flash_partition", name=strName, size=dictPart["size"], dur=round(time.monotonic() - fStart, 3))
+            os.remove(strPartPath)
+        return fnRunTool("reset", dictCommands["reset"])
+    except (OSError, ValueError) as e:
+        print(f"Error: Selective flash failed: {str(e)}", flush=True)
+        return False
+    finally:
+        shutil.rmtree(strTempDir, ignore_errors=True)
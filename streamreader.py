@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+import os
+import codecs
+import collections
+import re
+import threading
+
+def splitLines(strText):
+    """
+    * Split decoded text into lines on both LF and CR
+    * upgrade_tool redraws progress with bare CR, so CR is treated as a line break too
+    *
+    * @param strText Decoded text to split
+    * @return List of line fragments; the last item is the unterminated remainder
+    """
+    return strText.replace('\r', '\n').split('\n')
+
+def readStreamLines(objStream, fnOnLine, objEcho=None, nChunkSize=65536, fnOnChunk=None):
+    """
+    * Read a binary stream in bulk chunks until EOF and hand out complete lines
+    * Uses os.read so each call returns whatever is available instead of one byte
+    * Decodes UTF-8 incrementally so multi-byte characters split across reads survive
+    * Echoes each decoded chunk once to the console with a single flush
+    *
+    * @param objStream Binary stream with a file descriptor (e.g. Popen stdout)
+    * @param fnOnLine Callback invoked with each non-empty line (without line ending)
+    * @param objEcho Text stream for live console echo, or None to disable echo
+    * @param nChunkSize Maximum number of bytes requested per read
+    * @param fnOnChunk Optional callback invoked with the byte count of every chunk read
+    * @return Trailing partial line that was not terminated before EOF
+    """
+    nFd = objStream.fileno()
+    objDecoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    strPending = ""
+    while True:
+        byteChunk = os.read(nFd, nChunkSize)
+        if byteChunk and fnOnChunk is not None:
+            fnOnChunk(len(byteChunk))
+        strChunk = objDecoder.decode(byteChunk, final=not byteChunk)
+        if strChunk:
+            if objEcho is not None:
+                objEcho.write(strChunk)
+                objEcho.flush()
+            lstParts = splitLines(strPending + strChunk)
+            strPending = lstParts.pop()
+            for strLine in lstParts:
+                if strLine:
+                    fnOnLine(strLine)
+        if not byteChunk:
+            break
+    return strPending
+
+class OutputMatcher:
+    """
+    * Streaming matcher checked against every output line as it arrives
+    * Success and failure patterns decide the verdict on the first hit
+    * Extract patterns capture their first group into dictValues (first hit wins)
+    """
+    def __init__(self, lstSuccess=None, lstFailure=None, dictExtract=None, fKillGraceSeconds=None):
+        """
+        * @param lstSuccess Regex strings or compiled patterns that mean success
+        * @param lstFailure Regex strings or compiled patterns that mean failure
+        * @param dictExtract Mapping of value name to regex with one capture group
+        * @param fKillGraceSeconds Seconds to let the process exit on its own after a verdict
+        *        before it is killed; None waits for a normal exit
+        """
+        self.lstSuccess = [compilePattern(objPattern) for objPattern in (lstSuccess or [])]
+        self.lstFailure = [compilePattern(objPattern) for objPattern in (lstFailure or [])]
+        self.dictExtract = {strName: compilePattern(objPattern) for strName, objPattern in (dictExtract or {}).items()}
+        self.fKillGraceSeconds = fKillGraceSeconds
+        self.strVerdict = None
+        self.strVerdictLine = None
+        self.dictValues = {}
+        self.objLock = threading.Lock()
+        self.objVerdictEvent = threading.Event()
+
+    def feed(self, strLine):
+        """
+        * Check one output line; safe to call from several reader threads
+        *
+        * @param strLine Output line without line ending
+        """
+        with self.objLock:
+            for strName, objPattern in self.dictExtract.items():
+                if strName not in self.dictValues:
+                    objMatch = objPattern.search(strLine)
+                    if objMatch:
+                        self.dictValues[strName] = objMatch.group(1) if objMatch.groups() else objMatch.group(0)
+            if self.strVerdict is not None:
+                return
+            for strVerdict, lstPatterns in (("failure", self.lstFailure), ("success", self.lstSuccess)):
+                for objPattern in lstPatterns:
+                    if objPattern.search(strLine):
+                        self.strVerdict = strVerdict
+                        self.strVerdictLine = strLine
+                        self.objVerdictEvent.set()
+                        return
+
+    def waitVerdict(self, fTimeout=None):
+        """
+        * Block until a verdict line has been seen or the timeout expires
+        *
+        * @param fTimeout Maximum seconds to wait, None to wait forever
+        * @return True if a verdict is available
+        """
+        return self.objVerdictEvent.wait(fTimeout)
+
+def compilePattern(objPattern):
+    """
+    * Compile a regex string, passing already compiled patterns through
+    *
+    * @param objPattern Regex string or compiled pattern
+    * @return Compiled pattern
+    """
+    if isinstance(objPattern, str):
+        return re.compile(objPattern)
+    return objPattern
+
+class OutputCapture:
+    """
+    * Bounded store for command output lines
+    * Keeps the most recent lines in a fixed-size ring buffer
+    * Optionally appends every line to a spill file holding the full transcript
+    """
+    def __init__(self, nMaxLines=None, strSpillPath=None):
+        """
+        * @param nMaxLines Number of recent lines to keep in memory, None for unbounded
+        * @param strSpillPath File that receives the full transcript, None to disable spilling
+        """
+        self.dqLines = collections.deque(maxlen=nMaxLines)
+        self.nTotalLines = 0
+        self.strSpillPath = strSpillPath
+        self.objSpillFile = None
+        self.objLock = threading.Lock()
+        if strSpillPath:
+            strSpillDir = os.path.dirname(strSpillPath)
+            if strSpillDir and not os.path.exists(strSpillDir):
+                os.makedirs(strSpillDir)
+            self.objSpillFile = open(strSpillPath, "a", encoding="utf-8")
+
+    def append(self, strLine):
+        """
+        * Store one line; safe to call from several reader threads
+        *
+        * @param strLine Output line without line ending
+        """
+        with self.objLock:
+            self.dqLines.append(strLine)
+            self.nTotalLines += 1
+            if self.objSpillFile is not None:
+                self.objSpillFile.write(strLine + "\n")
+
+    def getLines(self):
+        """
+        * @return List of the lines currently held in the ring buffer
+        """
+        with self.objLock:
+            return list(self.dqLines)
+
+    def close(self):
+        """
+        * Close the spill file; the ring buffer stays readable
+        """
+        with self.objLock:
+            if self.objSpillFile is not None:
+                self.objSpillFile.close()
+                self.objSpillFile = None
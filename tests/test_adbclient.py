@@ -0,0 +1,96 @@
+"""
+* AdbClient against the in-process FakeAdbServer
+"""
+import socket
+
+import pytest
+
+from adbclient import AdbClient, AdbError, SYNC_DATA_MAX
+from fakeadbserver import ADB_SERVER_VERSION, FakeAdbServer
+
+@pytest.fixture
+def objServer():
+    with FakeAdbServer(dictDevices={"FAKE0001": "device"},
+                       dictShellResponses={"getprop ro.serialno": "FAKE0001\n", "false": (1, "")}) as objServer:
+        yield objServer
+
+@pytest.fixture
+def objClient(objServer):
+    return AdbClient(nPort=objServer.nPort, fTimeout=5.0)
+
+def test_smart_socket_framing(objServer):
+    with socket.create_connection(("127.0.0.1", objServer.nPort), timeout=5.0) as objSock:
+        objSock.sendall(b"000chost:version")
+        byteReply = b""
+        while len(byteReply) < 12:
+            byteChunk = objSock.recv(12 - len(byteReply))
+            assert byteChunk
+            byteReply += byteChunk
+    assert byteReply == b"OKAY0004" + b"%04x" % ADB_SERVER_VERSION
+    assert objServer.lstRequests == ["host:version"]
+
+def test_version_and_devices(objServer, objClient):
+    objServer.setDeviceState("FAKE0002", "unauthorized")
+    assert objClient.getVersion() == ADB_SERVER_VERSION
+    assert objClient.getDevices() == [("FAKE0001", "device"), ("FAKE0002", "unauthorized")]
+
+def test_shell_v2_exit_status(objServer, objClient):
+    assert objClient.shell("FAKE0001", "getprop ro.serialno") == (0, "FAKE0001")
+    assert objClient.shell("FAKE0001", "false") == (1, "")
+    assert "shell,v2,raw:getprop ro.serialno" in objServer.lstRequests
+
+def test_shell_falls_back_to_v1_with_echoed_status():
+    lstCommands = []
+    def fnShell(strSerial, strCommand):
+        lstCommands.append(strCommand)
+        return 0, "line one\r\nline two\r\n__CT1_RC__3\r\n"
+    with FakeAdbServer(bShellV2=False, fnShell=fnShell) as objServer:
+        objClient = AdbClient(nPort=objServer.nPort, fTimeout=5.0)
+        assert objClient.shell("FAKE0001", "ls /data") == (3, "line one\r\nline two")
+        assert "shell_v2" not in objClient.getFeatures("FAKE0001")
+        assert not any(strRequest.startswith("shell,v2") for strRequest in objServer.lstRequests)
+    assert lstCommands == ["ls /data; echo __CT1_RC__$?"]
+
+def test_sync_push_stat_pull_roundtrip(objServer, objClient, tmp_path):
+    byteData = bytes(range(256)) * (SYNC_DATA_MAX // 128 + 3)  # spans several DATA chunks
+    objLocalPath = tmp_path / "payload.bin"
+    objLocalPath.write_bytes(byteData)
+    assert objClient.push("FAKE0001", str(objLocalPath), "/data/local/tmp/") == len(byteData)
+    assert objServer.dictFiles["/data/local/tmp/payload.bin"] == byteData
+    nMode, nSize, nTime = objClient.stat("FAKE0001", "/data/local/tmp/payload.bin")
+    assert nMode & 0o170000 == 0o100000 and nSize == len(byteData)
+    assert objClient.stat("FAKE0001", "/data/missing")[0] == 0
+    objPulledPath = tmp_path / "pulled.bin"
+    assert objClient.pull("FAKE0001", "/data/local/tmp/payload.bin", str(objPulledPath)) == len(byteData)
+    assert objPulledPath.read_bytes() == byteData
+
+def test_track_devices_follows_state_changes(objServer, objClient):
+    objGenerator = objClient.trackDevices(fTimeout=5.0)
+    try:
+        assert next(objGenerator) == [("FAKE0001", "device")]
+        objServer.setDeviceState("FAKE0002", "offline")
+        assert next(objGenerator) == [("FAKE0001", "device"), ("FAKE0002", "offline")]
+        objServer.setDeviceState("FAKE0001", None)
+        assert next(objGenerator) == [("FAKE0002", "offline")]
+    finally:
+        objGenerator.close()
+
+def test_transport_to_unknown_device_fails(objClient):
+    with pytest.raises(AdbError, match="device 'NOPE' not found"):
+        objClient.shell("NOPE", "true")
+
+def test_transport_any_with_two_devices_fails(objServer, objClient):
+    objServer.setDeviceState("FAKE0002", "device")
+    objClient.dictFeatures[None] = {"shell_v2"}
+    with pytest.raises(AdbError, match="more than one device"):
+        objClient.shell(None, "true")
+
+def test_unknown_host_service_fails(objClient):
+    with pytest.raises(AdbError, match="unknown host service"):
+        objClient.hostQuery("host:bogus")
+
+def test_pull_missing_file_fails_without_leaving_partial_file(objClient, tmp_path):
+    objLocalPath = tmp_path / "missing.bin"
+    with pytest.raises(AdbError, match="No such file"):
+        objClient.pull("FAKE0001", "/data/missing", str(objLocalPath))
+    assert list(tmp_path.iterdir()) == []
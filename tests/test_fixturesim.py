@@ -0,0 +1,77 @@
+"""
+* ATPFWDL station flow against the pty fixture simulator
+* The upgrade_tool and adb steps are stubbed through dictSteps; every fixture
+* command goes over a real serial port to FixtureSimulator
+"""
+import os
+
+import pytest
+
+pytest.importorskip("serial")
+pytest.importorskip("pyvisa")
+if os.name != "posix":
+    pytest.skip("FixtureSimulator needs a Linux pseudo-terminal", allow_module_level=True)
+
+from fixturesim import FixtureSimulator
+from ATPFWDL import atpfwdlProcess
+
+BOOT_COMMANDS = ["REQ_INIT", "REQ_BOOT_ON", "REQ_POWER_ON", "REQ_DC_IN", "REQ_BOOT_OFF"]
+
+def makeSteps(lstCalls, bFlashOk=True):
+    def record(strName, bResult):
+        def step(*lstArgs, **dictArgs):
+            lstCalls.append((strName, lstArgs))
+            return bResult
+        return step
+    return {
+        "wait_maskrom": record("wait_maskrom", True),
+        "flash": record("flash", bFlashOk),
+        "wait_boot_ready": record("wait_boot_ready", True),
+        "wait_test_completion": record("wait_test_completion", True),
+    }
+
+@pytest.fixture
+def objSimulator(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # built-in UART_SEQUENCES, no CT1.yaml overrides
+    with FixtureSimulator(fLatency=0.002) as objSimulator:
+        yield objSimulator
+
+def getCommands(objSimulator):
+    return [strCommand for fTime, strCommand in objSimulator.lstReceived]
+
+def test_atpfwdl_runs_against_simulator(objSimulator):
+    lstCalls = []
+    bResult = atpfwdlProcess(objSimulator.strPortName, "/opt/upgrade_tool", "update.img", "SN123", "dev1",
+                             dictSteps=makeSteps(lstCalls))
+    assert bResult is True
+    assert getCommands(objSimulator) == BOOT_COMMANDS + ["REQ_INIT"]
+    assert lstCalls == [
+        ("wait_maskrom", ("/opt/upgrade_tool",)),
+        ("flash", ("/opt/upgrade_tool", "update.img", "SN123")),
+        ("wait_boot_ready", ("dev1", "boot_ready_flash", 150)),
+        ("wait_test_completion", ("SN123", "ATPFWDL", "dev1")),
+    ]
+
+def test_atpfwdl_flash_failure_stops_flow_and_resets_fixture(objSimulator):
+    lstCalls = []
+    bResult = atpfwdlProcess(objSimulator.strPortName, "/opt/upgrade_tool", "update.img", "SN123",
+                             dictSteps=makeSteps(lstCalls, bFlashOk=False))
+    assert bResult is False
+    assert [strName for strName, lstArgs in lstCalls] == ["wait_maskrom", "flash"]
+    assert getCommands(objSimulator) == BOOT_COMMANDS + ["REQ_INIT"]
+
+def test_atpfwdl_boot_sequence_tolerates_garbage_and_jitter(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    lstCalls = []
+    with FixtureSimulator(fLatency=0.002, fJitter=0.01, fGarbageRate=1.0, nSeed=7) as objSimulator:
+        bResult = atpfwdlProcess(objSimulator.strPortName, "/opt/upgrade_tool", "update.img", "SN123",
+                                 dictSteps=makeSteps(lstCalls))
+    assert bResult is True
+    assert getCommands(objSimulator) == BOOT_COMMANDS + ["REQ_INIT"]
+
+def test_sarf_early_failure_cleans_up_before_gpib_is_opened(objSimulator, monkeypatch):
+    import SARF
+    monkeypatch.setattr(SARF, "waitForBootReady", lambda *lstArgs: False)
+    bResult = SARF.sarfProcess(objSimulator.strPortName, "/opt/IQxel", "SN123")
+    assert bResult is False
+    assert getCommands(objSimulator) == ["REQ_INIT", "REQ_POWER_ON", "REQ_DC_IN", "REQ_INIT"]
@@ -0,0 +1,50 @@
+"""
+* FlashScheduler worker pool: bounded concurrency and listing-order starts
+"""
+import threading
+import time
+
+from flashscheduler import FlashScheduler, RockusbDevice, JOB_FAIL, JOB_PASS
+
+def makeDevices(nCount):
+    return [RockusbDevice(nIdx, 0x2207, 0x350a, f"{nIdx + 1:03d}", "Maskrom") for nIdx in range(nCount)]
+
+def test_flashes_start_in_listing_order_within_the_parallel_limit():
+    lstStarted = []
+    dictState = {"running": 0, "peak": 0}
+    objLock = threading.Lock()
+
+    def fnFlash(objDevice, objProgress):
+        with objLock:
+            lstStarted.append(objDevice.strLocationId)
+            dictState["running"] += 1
+            dictState["peak"] = max(dictState["peak"], dictState["running"])
+        time.sleep(0.02 * (len(lstStarted) % 3 + 1))
+        with objLock:
+            dictState["running"] -= 1
+        return objDevice.strLocationId != "004"
+
+    lstDevices = makeDevices(9)
+    lstJobs = FlashScheduler(fnFlash, nMaxParallel=3, fReportInterval=60).run(lstDevices)
+    assert sorted(lstStarted[:3]) == ["001", "002", "003"]  # the first three workers take the head of the queue
+    assert sorted(lstStarted) == [objDevice.strLocationId for objDevice in lstDevices]
+    assert dictState["peak"] == 3
+    assert [objJob.objDevice for objJob in lstJobs] == lstDevices
+    assert [objJob.strState for objJob in lstJobs] == [JOB_FAIL if nIdx == 3 else JOB_PASS for nIdx in range(9)]
+
+def test_single_worker_flashes_in_listing_order():
+    lstStarted = []
+    lstDevices = makeDevices(5)
+    FlashScheduler(lambda objDevice, objProgress: lstStarted.append(objDevice) is None, nMaxParallel=1,
+                   fReportInterval=60).run(lstDevices)
+    assert lstStarted == lstDevices
+
+def test_flash_exception_fails_only_that_board():
+    def fnFlash(objDevice, objProgress):
+        if objDevice.strLocationId == "002":
+            raise RuntimeError("USB reset")
+        return True
+
+    lstJobs = FlashScheduler(fnFlash, nMaxParallel=1, fReportInterval=60).run(makeDevices(3))
+    assert [objJob.strState for objJob in lstJobs] == [JOB_PASS, JOB_FAIL, JOB_PASS]
+    assert lstJobs[1].strError == "USB reset"
@@ -0,0 +1,72 @@
+"""
+* ImageStagingCache shared by several station processes on one PC
+"""
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from fwimage import writeUpdateImage
+from imagestage import CACHE_LOCK_NAME, CACHE_MANIFEST_NAME, ImageStagingCache
+
+IMAGE_PARTITION_BYTES = 64 * 1024
+
+@pytest.fixture
+def objShareDir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    objShareDir = tmp_path / "share"
+    objShareDir.mkdir()
+    for strName, byteFill in (("a", b"A"), ("b", b"B"), ("c", b"C")):
+        writeUpdateImage(str(objShareDir / f"{strName}.img"),
+                         [("boot", byteFill * IMAGE_PARTITION_BYTES, IMAGE_PARTITION_BYTES)])
+    return objShareDir
+
+def getImageBytes(objShareDir):
+    return os.path.getsize(objShareDir / "a.img")
+
+def test_manifest_is_reread_for_every_stage(objShareDir, tmp_path):
+    strCacheDir = str(tmp_path / "cache")
+    nBudget = 10 * getImageBytes(objShareDir)
+    objStationA = ImageStagingCache(strCacheDir, nBudget)
+    objStationB = ImageStagingCache(strCacheDir, nBudget)  # a second process with its own manifest copy
+    assert objStationA.listImages() == []
+    assert objStationB.stage("b", str(objShareDir / "b.img"))
+    assert objStationA.stage("a", str(objShareDir / "a.img"))
+    assert sorted(strName for strName, dictEntry in objStationA.listImages()) == ["a", "b"]
+    assert sorted(strName for strName, dictEntry in ImageStagingCache(strCacheDir, nBudget).listImages()) == ["a", "b"]
+    assert os.path.isfile(os.path.join(strCacheDir, CACHE_MANIFEST_NAME))
+
+def test_images_in_use_are_not_evicted(objShareDir, tmp_path):
+    strCacheDir = str(tmp_path / "cache")
+    nBudget = 2 * getImageBytes(objShareDir)
+    objStationA = ImageStagingCache(strCacheDir, nBudget, fInUseSeconds=3600)
+    objStationB = ImageStagingCache(strCacheDir, nBudget, fInUseSeconds=3600)
+    strPathA = objStationA.stage("a", str(objShareDir / "a.img"))
+    assert objStationB.stage("b", str(objShareDir / "b.img"))
+    assert objStationB.stage("c", str(objShareDir / "c.img")) is None  # a and b may still be flashing
+    assert os.path.isfile(strPathA)
+    objStationB.fInUseSeconds = 0.0
+    assert objStationB.stage("c", str(objShareDir / "c.img"))
+    assert not os.path.exists(strPathA)  # least recently used once nothing is in use
+    assert sorted(strName for strName, dictEntry in objStationA.listImages()) == ["b", "c"]
+
+@pytest.mark.skipif(os.name != "posix", reason="holder script uses fcntl")
+def test_stage_waits_for_another_process_holding_the_lock(objShareDir, tmp_path):
+    objCacheDir = tmp_path / "cache"
+    objCacheDir.mkdir()
+    strScript = ("import fcntl, sys, time\n"
+                 "objFile = open(sys.argv[1], 'a+b')\n"
+                 "fcntl.flock(objFile.fileno(), fcntl.LOCK_EX)\n"
+                 "print('locked', flush=True)\n"
+                 "time.sleep(0.5)\n")
+    objHolder = subprocess.Popen([sys.executable, "-c", strScript, str(objCacheDir / CACHE_LOCK_NAME)],
+                                 stdout=subprocess.PIPE, text=True)
+    try:
+        assert objHolder.stdout.readline().strip() == "locked"
+        fStart = time.monotonic()
+        assert ImageStagingCache(str(objCacheDir), 10 * getImageBytes(objShareDir)).stage("a", str(objShareDir / "a.img"))
+        assert time.monotonic() - fStart >= 0.3
+    finally:
+        objHolder.wait()
@@ -0,0 +1,63 @@
+"""
+* LogcatMonitor fed by FakeAdbServer: the completion wait ends on the finish
+* line or, with the ATP failure patterns registered, at once on a crash line
+"""
+import time
+
+import pytest
+
+pytest.importorskip("serial")
+pytest.importorskip("pyvisa")
+
+import adbclient
+from adbclient import AdbClient
+from common import ATP_FAILURE_PATTERNS
+from fakeadbserver import FakeAdbServer
+from logcatmonitor import LogcatMonitor, LOGCAT_ERROR, LOGCAT_FINISH
+
+CRASH_LINES = [
+    "10-16 10:00:01.000 E/AndroidRuntime( 2211): FATAL EXCEPTION: main\n",
+    "10-16 10:00:01.000 E/AndroidRuntime( 2211): Process: com.rtk.ct1atptest, PID: 2211\n",
+    "10-16 10:00:01.001 E/AndroidRuntime( 2211): java.lang.NullPointerException\n",
+]
+
+def serveLogcat(lstLines, fHold=30.0):
+    def fnShell(strSerial, strCommand):
+        def iterOutput():
+            for strLine in lstLines:
+                yield strLine
+            time.sleep(fHold)  # logcat keeps running after the last line
+        return 0, iterOutput()
+    return FakeAdbServer(fnShell=fnShell)
+
+def runMonitor(objServer, monkeypatch, fTimeout=10.0):
+    monkeypatch.setattr(adbclient, "objAdbClient", AdbClient(nPort=objServer.nPort, fTimeout=5.0))
+    monkeypatch.setattr(adbclient, "bAdbClientChecked", True)
+    with LogcatMonitor(["adb", "-s", "FAKE0001"], ['CT1Broadcast:D', 'AndroidRuntime:E', '*:S']) as objMonitor:
+        objMonitor.addPattern(r"ATP Test Finish!!", LOGCAT_FINISH)
+        for strPattern in ATP_FAILURE_PATTERNS:
+            objMonitor.addPattern(strPattern, LOGCAT_ERROR)
+        objMonitor.start()
+        fStart = time.monotonic()
+        strVerdict, strLine = objMonitor.wait(fTimeout)
+        return strVerdict, strLine, time.monotonic() - fStart
+
+def test_crash_of_atp_app_ends_wait_early(monkeypatch):
+    with serveLogcat(CRASH_LINES) as objServer:
+        strVerdict, strLine, fElapsed = runMonitor(objServer, monkeypatch)
+    assert strVerdict == LOGCAT_ERROR
+    assert "Process: com.rtk.ct1atptest" in strLine
+    assert fElapsed < 5.0
+
+def test_atp_fail_marker_ends_wait_early(monkeypatch):
+    with serveLogcat(["10-16 10:00:02.000 D/CT1Broadcast( 2211): ATP Test Fail: WIFI\n"]) as objServer:
+        strVerdict, strLine, fElapsed = runMonitor(objServer, monkeypatch)
+    assert strVerdict == LOGCAT_ERROR
+    assert fElapsed < 5.0
+
+def test_other_app_crash_does_not_end_wait(monkeypatch):
+    lstLines = [strLine.replace("com.rtk.ct1atptest", "com.example.other") for strLine in CRASH_LINES]
+    lstLines.append("10-16 10:00:03.000 D/CT1Broadcast( 2211): ATP Test Finish!!\n")
+    with serveLogcat(lstLines) as objServer:
+        strVerdict, strLine, fElapsed = runMonitor(objServer, monkeypatch)
+    assert strVerdict == LOGCAT_FINISH
@@ -0,0 +1,80 @@
+"""
+* MaskromDetector against a FakeUsbSysfs tree
+"""
+import threading
+import time
+
+import pytest
+
+from maskromdetector import FakeUsbSysfs, MaskromDetector, MODE_LOADER, MODE_MASKROM
+
+ADB_INTERFACE = (0xff, 0x42, 0x01)
+
+@pytest.fixture
+def objSysfs():
+    with FakeUsbSysfs() as objSysfs:
+        yield objSysfs
+
+def makeDetector(objSysfs, **dictArgs):
+    dictArgs.setdefault("bUseUdev", False)
+    objDetector = MaskromDetector(objSysfs.strRoot, **dictArgs)
+    objSysfs.objDetector = objDetector
+    return objDetector
+
+def getLocations(lstDevices):
+    return [objDevice.strLocation for objDevice in lstDevices]
+
+def test_mode_comes_from_bcdusb_low_bit(objSysfs):
+    objDetector = makeDetector(objSysfs)
+    objSysfs.addDevice("1-1.2", strMode=MODE_MASKROM, nDevNum=5)
+    objSysfs.addDevice("1-1.3", strMode=MODE_LOADER)
+    assert getLocations(objDetector.scan(MODE_MASKROM)) == ["1-1.2"]
+    assert getLocations(objDetector.scan(MODE_LOADER)) == ["1-1.3"]
+    lstAll = objDetector.scan(None)
+    assert [(objDevice.strLocation, objDevice.strMode) for objDevice in lstAll] == \
+        [("1-1.2", MODE_MASKROM), ("1-1.3", MODE_LOADER)]
+    assert (lstAll[0].nBusNum, lstAll[0].nDevNum, lstAll[0].nPid) == (1, 5, 0x350a)
+
+def test_adb_mode_and_foreign_devices_are_excluded(objSysfs):
+    objDetector = makeDetector(objSysfs)
+    objSysfs.addDevice("1-1.1", strMode=MODE_MASKROM, tupInterface=ADB_INTERFACE)  # Rockchip VID, adb interface
+    objSysfs.addDevice("1-1.4", nVid=0x18d1, strMode=MODE_MASKROM)  # rockusb interface, other vendor
+    objSysfs.addDevice("1-1.2", strMode=MODE_MASKROM)
+    assert getLocations(objDetector.scan(None)) == ["1-1.2"]
+
+def test_pid_filter(objSysfs):
+    objDetector = makeDetector(objSysfs, lstPids=[0x350a])
+    objSysfs.addDevice("1-1.2", nPid=0x350a)
+    objSysfs.addDevice("1-1.3", nPid=0x330c)
+    assert getLocations(objDetector.scan()) == ["1-1.2"]
+    assert getLocations(MaskromDetector(objSysfs.strRoot, bUseUdev=False).scan()) == ["1-1.2", "1-1.3"]
+
+def test_wait_wakes_on_notify_mid_wait(objSysfs):
+    objDetector = makeDetector(objSysfs, fPollInterval=30.0)  # only notify() can wake it in time
+    objSysfs.addDevice("1-1.2")
+    objTimer = threading.Timer(0.2, objSysfs.addDevice, args=("1-1.3",))
+    objTimer.start()
+    fStart = time.monotonic()
+    try:
+        lstDevices = objDetector.waitForDevices(2, fTimeout=10.0)
+    finally:
+        objTimer.cancel()
+    assert getLocations(lstDevices) == ["1-1.2", "1-1.3"]
+    assert time.monotonic() - fStart < 2.0
+
+def test_wait_returns_found_devices_on_timeout(objSysfs):
+    objDetector = makeDetector(objSysfs, fPollInterval=0.05)
+    objSysfs.addDevice("1-1.2")
+    objSysfs.addDevice("1-1.3", strMode=MODE_LOADER)
+    fStart = time.monotonic()
+    lstDevices = objDetector.waitForDevices(2, fTimeout=0.3)
+    fElapsed = time.monotonic() - fStart
+    assert getLocations(lstDevices) == ["1-1.2"]
+    assert 0.3 <= fElapsed < 2.0
+
+def test_removed_device_disappears(objSysfs):
+    objDetector = makeDetector(objSysfs)
+    objSysfs.addDevice("1-1.2")
+    objSysfs.removeDevice("1-1.2")
+    assert objDetector.scan() == []
+    assert objDetector.waitForDevices(1, fTimeout=0.1) == []
@@ -0,0 +1,51 @@
+"""
+* PortRegistry eviction and re-enumeration on stale entries and open failures
+"""
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("serial")
+
+import portregistry
+from portregistry import PortRegistry
+
+def makePort(strDevice, strLocation, strSerial="A1", nVid=0x1A86, nPid=0x7523):
+    return SimpleNamespace(device=strDevice, location=strLocation, serial_number=strSerial,
+                           vid=nVid, pid=nPid, description="USB Serial")
+
+@pytest.fixture
+def objRegistry(monkeypatch):
+    dictState = {"ports": [], "calls": 0}
+    def comports():
+        dictState["calls"] += 1
+        return list(dictState["ports"])
+    monkeypatch.setattr(portregistry.serial.tools.list_ports, "comports", comports)
+    objRegistry = PortRegistry(fMaxAge=3600)
+    objRegistry.objMonitor = False
+    objRegistry.dictState = dictState
+    return objRegistry
+
+def test_open_failure_evicts_and_next_lookup_reenumerates(objRegistry, monkeypatch):
+    monkeypatch.setattr(objRegistry, "isPresent", lambda objPort: True)  # no cheap check, as on Windows
+    objRegistry.dictState["ports"] = [makePort("COM3", "1-1.2:1.0")]
+    assert objRegistry.getByLocation("1-1.2:1.0").device == "COM3"
+    objRegistry.dictState["ports"] = [makePort("COM7", "1-1.2:1.0")]
+    assert objRegistry.getByLocation("1-1.2:1.0").device == "COM3"  # still cached
+    objRegistry.reportOpenFailure("com3")
+    assert objRegistry.getByDevice("COM3") is None
+    assert objRegistry.getByLocation("1-1.2:1.0").device == "COM7"
+    assert objRegistry.getBySerialNumber("A1").device == "COM7"
+    assert [objPort.device for objPort in objRegistry.getByVidPid(0x1A86, 0x7523)] == ["COM7"]
+
+def test_stale_entry_is_evicted_before_lookup_again(objRegistry, monkeypatch):
+    setPresent = {"COM3"}
+    monkeypatch.setattr(objRegistry, "isPresent", lambda objPort: objPort.device in setPresent)
+    objRegistry.dictState["ports"] = [makePort("COM3", "1-1.2:1.0")]
+    assert objRegistry.getByLocation("1-1.2:1.0").device == "COM3"
+    setPresent.clear()
+    objRegistry.dictState["ports"] = []
+    nCalls = objRegistry.dictState["calls"]
+    assert objRegistry.getByLocation("1-1.2:1.0") is None
+    assert objRegistry.dictState["calls"] == nCalls + 1
+    assert "COM3" not in objRegistry.dictByDevice
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+import sys
+import threading
+import time
+import serial
+from eventlog import logEvent
+from portregistry import objPortRegistry
+
+UART_RESPONSES = {
+    "REQ_DC_IN": "RES_DC_IN_OK",
+    "REQ_DC_OUT": "RES_DC_OUT_OK",
+    "REQ_POWER_ON": "RES_POWER_ON_OK",
+    "REQ_POWER_OFF": "RES_POWER_OFF_OK",
+    "REQ_BOOT_ON": "RES_BOOT_ON_OK",
+    "REQ_BOOT_OFF": "RES_BOOT_OFF_OK",
+    "REQ_INIT": "RES_INIT_OK",
+}
+
+UART_SEQUENCES = {
+    "atpfwdl_boot": [
+        {"command": "REQ_INIT", "settle": 0.5},
+        {"command": "REQ_BOOT_ON", "settle": 0.5},
+        {"command": "REQ_POWER_ON", "settle": 0.5},
+        {"command": "REQ_DC_IN", "settle": 0},
+    ],
+    "atpfwdl_boot_off": [
+        {"command": "REQ_BOOT_OFF", "settle": 1},
+    ],
+    "sarf_power_on": [
+        {"command": "REQ_INIT", "settle": 0.5},
+        {"command": "REQ_POWER_ON", "settle": 1},
+        {"command": "REQ_DC_IN", "settle": 0},
+    ],
+}  # Built-in macros, overridden by the uart_sequences section of CT1.yaml
+
+dictActiveSessions = {}
+objRegistryLock = threading.Lock()
+
+def getActiveSession(strComPort):
+    """
+    * Get the open UART session for a port, if a station has one running
+    *
+    * @param strComPort COM port device name
+    * @return UartSession object or None
+    """
+    with objRegistryLock:
+        return dictActiveSessions.get(strComPort)
+
+class UartSession:
+    """
+    * Persistent UART connection to the test fixture
+    * Keeps the serial port open for a whole station run instead of per command
+    * Serializes command/response transactions so concurrent callers are safe
+    * Reopens the port automatically when the fixture drops off the bus
+    * Used as a context manager; while open, sendUartCommand routes through it
+    """
+    def __init__(self, strComPort, nBaudrate=115200, nTimeout=5, nReconnectAttempts=3, fReconnectDelay=0.5,
+                 fReadTimeout=0.02, fQuietPeriod=0.1):
+        """
+        * @param strComPort COM port device name
+        * @param nBaudrate Communication baudrate
+        * @param nTimeout Default response timeout in seconds
+        * @param nReconnectAttempts Number of reopen attempts after a port error
+        * @param fReconnectDelay Seconds to wait between reopen attempts
+        * @param fReadTimeout Timeout of each blocking serial read in seconds
+        * @param fQuietPeriod Silence that ends a response when no token is expected
+        """
+        self.strComPort = strComPort
+        self.nBaudrate = nBaudrate
+        self.nTimeout = nTimeout
+        self.nReconnectAttempts = nReconnectAttempts
+        self.fReconnectDelay = fReconnectDelay
+        self.fReadTimeout = fReadTimeout
+        self.fQuietPeriod = fQuietPeriod
+        self.objSerial = None
+        self.objLock = threading.RLock()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, objExcType, objExcValue, objTraceback):
+        self.close()
+        return False
+
+    def open(self):
+        """
+        * Open the serial port and register the session for its COM port
+        *
+        * @return self
+        """
+        with self.objLock:
+            if self.objSerial is None or not self.objSerial.is_open:
+                print(f"Opening UART session on {self.strComPort}", flush=True)
+                try:
+                    self.objSerial = serial.Serial(self.strComPort, self.nBaudrate, timeout=self.fReadTimeout)
+                except serial.SerialException:
+                    objPortRegistry.reportOpenFailure(self.strComPort)
+                    raise
+        with objRegistryLock:
+            dictActiveSessions[self.strComPort] = self
+        return self
+
+    def close(self):
+        """
+        * Close the serial port and unregister the session
+        """
+        with objRegistryLock:
+            if dictActiveSessions.get(self.strComPort) is self:
+                del dictActiveSessions[self.strComPort]
+        with self.objLock:
+            if self.objSerial is not None:
+                try:
+                    self.objSerial.close()
+                except serial.SerialException:
+                    pass
+                self.objSerial = None
+
+    def reconnect(self):
+        """
+        * Reopen the serial port after the fixture dropped
+        *
+        * @return Boolean indicating whether the port is open again
+        """
+        with self.objLock:
+            for nAttempt in range(1, self.nReconnectAttempts + 1):
+                try:
+                    if self.objSerial is not None:
+                        self.objSerial.close()
+                except serial.SerialException:
+                    pass
+                self.objSerial = None
+                time.sleep(self.fReconnectDelay)
+                try:
+                    print(f"Reconnecting UART {self.strComPort} (attempt {nAttempt}/{self.nReconnectAttempts})", flush=True)
+                    self.objSerial = serial.Serial(self.strComPort, self.nBaudrate, timeout=self.fReadTimeout)
+                    return True
+                except serial.SerialException as e:
+                    objPortRegistry.reportOpenFailure(self.strComPort)
+                    print(f"Reconnect failed: {str(e)}", flush=True)
+            return False
+
+    def transact(self, strCommand, nTimeout=None, bWaitForResponse=True, strExpectedResponse=None):
+        """
+        * Write one command and collect the fixture response
+        * Uses short blocking reads, so it returns as soon as the expected token arrives
+        * Without an expected token it returns once the line has been quiet for fQuietPeriod
+        *
+        * @param strCommand Command to send
+        * @param nTimeout Response timeout in seconds (session default if None)
+        * @param bWaitForResponse Whether to wait for device response
+        * @param strExpectedResponse Response token that completes the transaction
+        * @return Response text received from the fixture
+        """
+        if nTimeout is None:
+            nTimeout = self.nTimeout
+        objSer = self.objSerial
+        objSer.reset_input_buffer()
+        objSer.write((strCommand).encode('utf-8'))
+        strResponse = ""
+        if bWaitForResponse:
+            fDeadline = time.monotonic() + nTimeout
+            fLastData = None
+            while time.monotonic() < fDeadline:
+                objData = objSer.read(max(1, objSer.in_waiting))
+                if objData:
+                    strDataStr = objData.decode('utf-8', errors='replace')
+                    strResponse += strDataStr
+                    sys.stdout.write(strDataStr)
+                    sys.stdout.flush()
+                    fLastData = time.monotonic()
+                    if strExpectedResponse and strExpectedResponse in strResponse:
+                        break
+                elif not strExpectedResponse and fLastData is not None \
+                        and time.monotonic() - fLastData >= self.fQuietPeriod:
+                    break
+        return strResponse
+
+    def sendCommand(self, strCommand, nTimeout=None, bWaitForResponse=True, strExpectedResponse=None):
+        """
+        * Send a command and return the response, reconnecting once on a port error
+        *
+        * @param strCommand Command to send
+        * @param nTimeout Response timeout in seconds (session default if None)
+        * @param bWaitForResponse Whether to wait for device response
+        * @param strExpectedResponse Response token that completes the transaction,
+        *        looked up in UART_RESPONSES when None
+        * @return Response text received from the fixture
+        """
+        if strExpectedResponse is None:
+            strExpectedResponse = UART_RESPONSES.get(strCommand)
+        with self.objLock:
+            if self.objSerial is None:
+                self.open()
+            try:
+                return self.transact(strCommand, nTimeout, bWaitForResponse, strExpectedResponse)
+            except (serial.SerialException, OSError) as e:
+                print(f"UART error on {self.strComPort}: {str(e)}", flush=True)
+                if not self.reconnect():
+                    raise serial.SerialException(f"Could not reconnect to {self.strComPort}")
+                return self.transact(strCommand, nTimeout, bWaitForResponse, strExpectedResponse)
+
+def parseUartMacro(lstEntries):
+    """
+    * Normalize macro entries into (command, expected ack, settle seconds) tuples
+    * Entries may be dicts {command, ack, settle} as written in CT1.yaml, tuples or plain commands
+    * A missing ack falls back to UART_RESPONSES
+    *
+    * @param lstEntries Ordered macro entries
+    * @return List of (strCommand, strExpectedResponse, fSettleSeconds) tuples
+    """
+    lstSteps = []
+    for objEntry in lstEntries:
+        if isinstance(objEntry, dict):
+            strCommand = objEntry["command"]
+            strAck = objEntry.get("ack")
+            fSettle = float(objEntry.get("settle", 0) or 0)
+        elif isinstance(objEntry, (list, tuple)):
+            strCommand = objEntry[0]
+            strAck = objEntry[1] if len(objEntry) > 1 else None
+            fSettle = float(objEntry[2]) if len(objEntry) > 2 else 0.0
+        else:
+            strCommand, strAck, fSettle = str(objEntry), None, 0.0
+        lstSteps.append((strCommand, strAck or UART_RESPONSES.get(strCommand), fSettle))
+    return lstSteps
+
+def runUartMacro(objSession, lstEntries, nTimeout=None):
+    """
+    * Run an ordered fixture command sequence over an open session
+    * Each command is sent as soon as the previous ack has arrived and that step's
+    * minimum settle time has passed, instead of after a fixed sleep
+    * Stops at the first step whose ack does not arrive
+    *
+    * @param objSession Open UartSession
+    * @param lstEntries Macro entries accepted by parseUartMacro
+    * @param nTimeout Per-step response timeout in seconds (session default if None)
+    * @return Tuple (success status, list of per-step timing dicts)
+    """
+    lstTimings = []
+    fNextSendTime = time.monotonic()
+    for strCommand, strAck, fSettle in parseUartMacro(lstEntries):
+        fWait = fNextSendTime - time.monotonic()
+        if fWait > 0:
+            time.sleep(fWait)
+        print(f"Sending UART command: {strCommand}", flush=True)
+        fSendTime = time.monotonic()
+        strResponse = objSession.sendCommand(strCommand, nTimeout, True, strAck)
+        fLatency = time.monotonic() - fSendTime
+        bOk = not strAck or strAck in strResponse
+        dictTiming = {"command": strCommand, "ack": strAck, "ok": bOk, "latency": round(fLatency, 4), "settle": fSettle}
+        lstTimings.append(dictTiming)
+        logEvent("uart_step", **dictTiming)
+        if not bOk:
+            print(f"\nError: {strCommand} command failed, expected '{strAck}' ({fLatency * 1000:.0f} ms)", flush=True)
+            return False, lstTimings
+        print(f"\nSuccess: {strAck or strCommand} in {fLatency * 1000:.0f} ms", flush=True)
+        fNextSendTime = time.monotonic() + fSettle
+    fWait = fNextSendTime - time.monotonic()
+    if fWait > 0:
+        time.sleep(fWait)
+    return True, lstTimings